@@ -0,0 +1,280 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Headless batch runner for saved projects (config.ini).
+
+Runs every enabled page of the projects with the stored parameters, writes
+the results and compares them against golden outputs and/or the reference
+data of the pages. No Qt display is needed.
+
+    python src/batch_runner.py demo/*/config.ini --golden golden --jobs 8
+
+Exit status: 0 if every check passed, 1 if a result regressed, 2 if a
+simulation failed or a project could not be read.
+"""
+
+import os
+import sys
+import csv
+import argparse
+import configparser
+import multiprocessing
+import concurrent.futures
+import numpy as np
+
+import ngspice_con
+import ngspice_pool
+from path_utils import resolvePath
+from remote_worker import RemoteExecutor
+from result_compare import compareGolden, compareData, DEFAULT_RTOL, DEFAULT_ATOL
+from run_limits import RunLimits, SimulationError
+
+# Exit statuses
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+
+# Results of a check
+PASS = 'PASS'
+FAIL = 'FAIL'
+ERROR = 'ERROR'
+SKIP = 'SKIP'
+
+
+def loadProject(file_name):
+    """Reads a settings file saved by the GUI and returns the parameters and
+    the enabled pages as a list of dicts with 'section', 'title', 'script',
+    'data', 'timeout', 'log_x' and 'log_y'."""
+    project_dir = os.path.dirname(os.path.abspath(file_name)).replace('\\', '/')
+    extra_aliases = {'<PROJECTDIR>': project_dir}
+
+    config = configparser.ConfigParser()
+    if not config.read(file_name):
+        raise OSError(f"Failed to read '{file_name}'")
+
+    # Same key handling as MainWindow.loadSettings()
+    param_dict = {}
+    if 'Parameters' in config:
+        for key in config['Parameters']:
+            param_dict[key] = config.getfloat('Parameters', key)
+
+    pages = []
+    for section in config.sections():
+        if not section.startswith('Page-'):
+            continue
+        if not config.getboolean(section, 'Enabled', fallback=True):
+            continue
+        script = config.get(section, 'ScriptFile', fallback='').strip()
+        if not script:
+            continue
+        data = config.get(section, 'DataFile', fallback='').strip()
+        pages.append({\
+                'section'   : section,\
+                'title'     : config.get(section, 'Title', fallback=section).strip(),\
+                'script'    : resolvePath(script, extra_aliases),\
+                'data'      : resolvePath(data, extra_aliases) if data else '',\
+                'timeout'   : config.getfloat(section, 'Timeout', fallback=0.0),\
+                'log_x'     : config.getboolean(section, 'LogScaleX', fallback=False),\
+                'log_y'     : config.getboolean(section, 'LogScaleY', fallback=False),\
+                })
+    return param_dict, pages
+
+
+def projectName(file_name):
+    return os.path.basename(os.path.dirname(os.path.abspath(file_name)))
+
+
+class BatchRunner:
+    """Runs the pages of several projects on a pool of worker processes."""
+
+
+    def __init__(self, jobs=None, backend='Subprocess', output_format='Text', limits=None,\
+            workers=None):
+        self.__jobs = jobs or os.cpu_count() or 1
+        self.__backend = backend
+        self.__output_format = output_format
+        self.__limits = limits or RunLimits()
+        self.__workers = list(workers or []) # Addresses of remote workers
+
+
+    def executor(self):
+        if self.__workers:
+            executor = RemoteExecutor(self.__workers)
+            if executor.alive():
+                return executor
+            print("Warning: no remote worker could be reached, simulating locally.")
+        if self.__backend == 'Pool':
+            # One worker pool in this process keeps each script in its own worker
+            ngspice_pool.setMaxWorkers(self.__jobs)
+            return concurrent.futures.ThreadPoolExecutor(max_workers=self.__jobs)
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.__jobs,\
+                mp_context=multiprocessing.get_context('spawn'))
+
+
+    def run(self, projects):
+        """Simulates the pages of the projects, given as a list of
+        (name, param_dict, pages) tuples. Yields (name, page, data, message)
+        as the runs finish, with data None if the run failed."""
+        with self.executor() as executor:
+            futures = {}
+            for name, param_dict, pages in projects:
+                for page in pages:
+                    limits = self.__limits.copy(\
+                            timeout=page['timeout'] if page['timeout'] > 0 else None)
+                    future = executor.submit(ngspice_con.simulate,\
+                            page['script'], param_dict,\
+                            self.__backend, self.__output_format, limits)
+                    futures[future] = (name, page)
+
+            for future in concurrent.futures.as_completed(futures):
+                name, page = futures[future]
+                try:
+                    data, diagnostics = future.result()
+                    message = '' if data is not None else 'Simulation failed'
+                except SimulationError as e:
+                    data, message = None, str(e)
+                except Exception as e:
+                    data, message = None, f'Simulation failed: {e}'
+                yield name, page, data, message
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(prog='batch_runner',\
+            description='Runs saved MODELngspicer projects without a display '\
+            'and checks the results for regressions.')
+    parser.add_argument('projects', nargs='+',\
+            help='config.ini files, or directories containing one')
+    parser.add_argument('-j', '--jobs', type=int, default=None,\
+            help='number of parallel ngspice runs (default: number of CPUs)')
+    parser.add_argument('-o', '--output', default='',\
+            help='directory to write the results to, as <project>/<page>.txt')
+    parser.add_argument('-g', '--golden', default='',\
+            help='directory of golden outputs laid out like --output')
+    parser.add_argument('--update-golden', action='store_true',\
+            help='write the results to the --golden directory instead of comparing')
+    parser.add_argument('--rtol', type=float, default=DEFAULT_RTOL,\
+            help=f'relative tolerance against golden outputs (default: {DEFAULT_RTOL:g})')
+    parser.add_argument('--atol', type=float, default=DEFAULT_ATOL,\
+            help=f'absolute tolerance against golden outputs (default: {DEFAULT_ATOL:g})')
+    parser.add_argument('--data-rtol', type=float, default=0.0,\
+            help='maximum RMS relative error against the reference data of the '\
+            'pages (default: no comparison)')
+    parser.add_argument('--timeout', type=float, default=0.0,\
+            help='timeout of each run in seconds, unless set on the page (default: none)')
+    parser.add_argument('--backend', choices=ngspice_con.BACKENDS, default='Subprocess',\
+            help='simulator backend (default: Subprocess)')
+    parser.add_argument('--binary', action='store_true',\
+            help='let ngspice write binary rawfiles')
+    parser.add_argument('-w', '--worker', action='append', default=[],\
+            help='address (host:port or unix:path) of a remote worker to run the '\
+            'simulations on, with the token of the MODELNGSPICER_TOKEN variable; '\
+            'may be given several times')
+    parser.add_argument('--report', default='',\
+            help='CSV file to write the result of every check to')
+    return parser.parse_args(argv)
+
+
+def projectFile(path):
+    return os.path.join(path, 'config.ini') if os.path.isdir(path) else path
+
+
+def checkPage(args, name, page, data, message):
+    """Writes and checks the result of a page. Returns (status, detail)."""
+    if data is None:
+        return ERROR, message
+
+    relative = os.path.join(name, page['section'] + '.txt')
+    if args.output:
+        file_name = os.path.join(args.output, relative)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        np.savetxt(file_name, data)
+
+    details = []
+    status = SKIP
+    if args.golden:
+        golden_file = os.path.join(args.golden, relative)
+        if args.update_golden:
+            os.makedirs(os.path.dirname(golden_file), exist_ok=True)
+            np.savetxt(golden_file, data)
+            status = PASS
+            details.append('golden updated')
+        elif not os.path.isfile(golden_file):
+            return ERROR, f"golden output '{golden_file}' not found"
+        else:
+            passed, worst = compareGolden(data, np.loadtxt(golden_file, ndmin=2),\
+                    args.rtol, args.atol)
+            status = PASS if passed else FAIL
+            details.append(f'golden error {worst:.3g} x tolerance')
+
+    if args.data_rtol > 0 and page['data']:
+        try:
+            reference = np.loadtxt(page['data'], ndmin=2)
+        except (OSError, ValueError) as e:
+            return ERROR, f"failed to load the reference data: {e}"
+        passed, worst = compareData(data, reference, args.data_rtol, args.atol,\
+                page['log_x'], page['log_y'])
+        status = FAIL if not passed or status == FAIL else PASS
+        details.append(f'data RMS relative error {worst:.3g}')
+
+    return status, ', '.join(details)
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+
+    exit_code = EXIT_OK
+    projects = []
+    for path in args.projects:
+        file_name = projectFile(path)
+        try:
+            param_dict, pages = loadProject(file_name)
+        except (OSError, ValueError, configparser.Error) as e:
+            print(f"Error: {e}")
+            exit_code = EXIT_ERROR
+            continue
+        projects.append((projectName(file_name), param_dict, pages))
+
+    runner = BatchRunner(args.jobs, args.backend, 'Binary' if args.binary else 'Text',\
+            RunLimits(timeout=args.timeout), args.worker)
+    counts = {PASS: 0, FAIL: 0, ERROR: 0, SKIP: 0}
+    rows = []
+    for name, page, data, message in runner.run(projects):
+        try:
+            status, detail = checkPage(args, name, page, data, message)
+        except (OSError, ValueError) as e:
+            status, detail = ERROR, str(e)
+        counts[status] += 1
+        rows.append([name, page['section'], page['title'], status, detail])
+        print(f"{status:5s} {name} / {page['title']}" + (f": {detail}" if detail else ''),\
+                flush=True)
+
+    print(f"{counts[PASS]} passed, {counts[FAIL]} failed, "\
+            f"{counts[ERROR]} errors, {counts[SKIP]} not checked")
+
+    if args.report:
+        with open(args.report, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Project', 'Section', 'Title', 'Status', 'Detail'])
+            writer.writerows(rows)
+
+    if counts[ERROR]:
+        exit_code = EXIT_ERROR
+    elif counts[FAIL] and exit_code == EXIT_OK:
+        exit_code = EXIT_REGRESSION
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+# Relative step of the forward-difference Jacobian, in the transformed space
+DEFAULT_DIFF_STEP = 1e-3
+
+# Damping factors tried in parallel at every iteration, relative to the current one
+DAMPING_FACTORS = [0.1, 1.0, 10.0]
+
+
+class FitParameter:
+    """A free parameter of a fit. Positive parameters are fitted in log
+    space, so that a step changes them by a factor rather than an amount,
+    which suits values spanning decades such as `is` or `cjo`."""
+
+
+    def __init__(self, name, value, lower=-np.inf, upper=np.inf, log=None):
+        if log is None:
+            log = value > 0 and lower >= 0
+        if log and (value <= 0 or upper <= 0):
+            raise ValueError(f"'{name}': a log-space parameter must be positive.")
+        if lower > upper:
+            raise ValueError(f"'{name}': the lower bound exceeds the upper bound.")
+        self.__name = name
+        self.__value = min(max(value, lower), upper)
+        self.__lower = lower
+        self.__upper = upper
+        self.__log = log
+
+
+    def name(self):
+        return self.__name
+
+
+    def value(self):
+        return self.__value
+
+
+    def lower(self):
+        return self.__lower
+
+
+    def upper(self):
+        return self.__upper
+
+
+    def log(self):
+        return self.__log
+
+
+    def toInternal(self, value):
+        return np.log(value) if self.__log else value
+
+
+    def fromInternal(self, x):
+        value = float(np.exp(x)) if self.__log else float(x)
+        return min(max(value, self.__lower), self.__upper)
+
+
+    def internalBounds(self):
+        if self.__log:
+            lower = np.log(self.__lower) if self.__lower > 0 else -np.inf
+            return lower, np.log(self.__upper)
+        return self.__lower, self.__upper
+
+
+class LevenbergMarquardt:
+    """Bounded Levenberg-Marquardt least-squares optimizer.
+
+    `evaluate` takes a list of parameter vectors (in the parameters' own
+    units) and returns the list of their residual vectors, None for a failed
+    evaluation. All vectors of a Jacobian, and the trial steps of several
+    damping factors, are passed in one call so that they can be evaluated
+    in parallel."""
+
+
+    def __init__(self, evaluate, parameters, max_iterations=50, tolerance=1e-6,\
+            damping=1e-2, diff_step=DEFAULT_DIFF_STEP):
+        self.__evaluate = evaluate
+        self.__parameters = list(parameters)
+        self.__max_iterations = max_iterations
+        self.__tolerance = tolerance
+        self.__damping = damping
+        self.__diff_step = diff_step
+        self.__stopped = False
+
+        bounds = [p.internalBounds() for p in self.__parameters]
+        self.__lower = np.array([b[0] for b in bounds])
+        self.__upper = np.array([b[1] for b in bounds])
+
+
+    def stop(self):
+        """Makes run() return after the current evaluation. Thread-safe."""
+        self.__stopped = True
+
+
+    def values(self, x):
+        return [p.fromInternal(xi) for p, xi in zip(self.__parameters, x)]
+
+
+    def __cost(self, residuals):
+        return np.inf if residuals is None else 0.5 * float(np.dot(residuals, residuals))
+
+
+    def run(self, callback=None):
+        """Runs the optimization and returns (values, cost, message).
+        `callback(iteration, values, cost, damping)` is called after every
+        accepted step."""
+        x = np.clip(np.array([p.toInternal(p.value()) for p in self.__parameters]),\
+                self.__lower, self.__upper)
+        residuals = self.__evaluate([self.values(x)])[0]
+        if residuals is None:
+            return self.values(x), np.inf, 'Simulation failed at the initial point'
+        cost = self.__cost(residuals)
+        damping = self.__damping
+
+        for iteration in range(1, self.__max_iterations + 1):
+            if self.__stopped:
+                return self.values(x), cost, 'Stopped'
+
+            # Forward-difference Jacobian, stepping away from the nearer bound
+            steps = self.__diff_step * np.maximum(np.abs(x), 1.0)
+            steps = np.where(x + steps > self.__upper, -steps, steps)
+            trials = []
+            for i in range(len(x)):
+                trial = x.copy()
+                trial[i] += steps[i]
+                trials.append(self.values(trial))
+            columns = self.__evaluate(trials)
+            if self.__stopped:
+                return self.values(x), cost, 'Stopped'
+            if any(column is None for column in columns):
+                return self.values(x), cost, 'Simulation failed while computing the Jacobian'
+            jacobian = np.column_stack([(column - residuals) / step\
+                    for column, step in zip(columns, steps)])
+
+            # Damped Gauss-Newton steps for several damping factors at once
+            jtj = jacobian.T @ jacobian
+            gradient = jacobian.T @ residuals
+            scale = np.diag(jtj).copy()
+            scale[scale <= 0] = 1.0
+            candidates = []
+            for factor in DAMPING_FACTORS:
+                try:
+                    delta = np.linalg.solve(jtj + damping * factor * np.diag(scale), -gradient)
+                except np.linalg.LinAlgError:
+                    continue
+                candidates.append((factor, np.clip(x + delta, self.__lower, self.__upper)))
+            if not candidates:
+                return self.values(x), cost, 'Singular Jacobian'
+
+            results = self.__evaluate([self.values(c) for f, c in candidates])
+            costs = [self.__cost(r) for r in results]
+            best = int(np.argmin(costs))
+            if self.__stopped:
+                return self.values(x), cost, 'Stopped'
+
+            if costs[best] < cost:
+                factor, x_new = candidates[best]
+                improvement = (cost - costs[best]) / max(cost, np.finfo(float).tiny)
+                step_size = float(np.max(np.abs(x_new - x)))
+                x, residuals, cost = x_new, results[best], costs[best]
+                damping = max(damping * factor / 3.0, 1e-12)
+                if callback is not None:
+                    callback(iteration, self.values(x), cost, damping)
+                if improvement < self.__tolerance or step_size < self.__tolerance:
+                    return self.values(x), cost, 'Converged'
+            else:
+                damping *= 10.0 * max(DAMPING_FACTORS)
+                if damping > 1e12:
+                    return self.values(x), cost, 'No further improvement'
+
+        return self.values(x), cost, 'Maximum number of iterations reached'
@@ -0,0 +1,125 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+
+from spice_script import MODEL_FILE, stripComment, includedFile
+
+
+class ScriptDependencies:
+    """Parameters a script depends on, found by parsing the script and the
+    files it includes.
+
+    If the parameter file is included in a '.model' card, every parameter is
+    a model parameter and the script depends on all of them. If it is
+    included in a '.param' card, the script depends on the parameters it
+    references by name. If it is not included at all, parameters cannot
+    affect the script."""
+
+
+    def __init__(self, script_name):
+        self.__script_name = os.path.abspath(script_name)
+        self.__files = {}       # File name -> mtime when parsed
+        self.__all = False      # True if every parameter is a model parameter
+        self.__included = False # True if the parameter file is included
+        self.__names = set()    # Lower-case identifiers used outside the parameter file
+        self.__parse(self.__script_name)
+
+
+    def files(self):
+        return list(self.__files)
+
+
+    def upToDate(self):
+        """Returns False if the script or one of its includes changed since parsing."""
+        for file_name, mtime in self.__files.items():
+            try:
+                if os.path.getmtime(file_name) != mtime:
+                    return False
+            except OSError:
+                if mtime is not None:
+                    return False
+        return True
+
+
+    def dependsOn(self, key):
+        if not self.__included:
+            return False
+        return self.__all or key.lower() in self.__names
+
+
+    def __parse(self, file_name):
+        if file_name in self.__files:
+            return
+        try:
+            self.__files[file_name] = os.path.getmtime(file_name)
+            with open(file_name, 'r') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            self.__files[file_name] = None
+            return
+
+        working_dir = os.path.dirname(file_name)
+        card = None
+        for line in lines:
+            stripped = stripComment(line).strip()
+            if not stripped or stripped.startswith('*'):
+                continue
+
+            included = includedFile(stripped)
+            if included is not None:
+                if os.path.basename(included) == MODEL_FILE:
+                    self.__included = True
+                    if card == 'model':
+                        self.__all = True
+                else:
+                    self.__parse(os.path.normpath(os.path.join(working_dir, included)))
+                continue
+
+            if not stripped.startswith('+'):
+                keyword = stripped.split()[0].lower()
+                card = 'model' if keyword == '.model' else None
+            self.__names.update(name.lower()\
+                    for name in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', stripped))
+
+
+class DependencyIndex:
+    """Index from parameters to the scripts that depend on them. The entry
+    of a script is rebuilt when the script or one of its includes changes."""
+
+
+    def __init__(self):
+        self.__entries = {}
+
+
+    def dependencies(self, script_name):
+        script_name = os.path.abspath(script_name)
+        entry = self.__entries.get(script_name)
+        if entry is None or not entry.upToDate():
+            entry = ScriptDependencies(script_name)
+            self.__entries[script_name] = entry
+        return entry
+
+
+    def dependsOn(self, script_name, key):
+        """Returns True if the script may be affected by the parameter `key`."""
+        if not script_name:
+            return False
+        return self.dependencies(script_name).dependsOn(key)
+
+
+    def clear(self):
+        self.__entries.clear()
@@ -0,0 +1,133 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+from PySide6 import QtCore, QtGui, QtWidgets
+from PySide6.QtCore import Signal, Slot, Qt
+import sys, os
+
+from simulation_scheduler import SimulationScheduler
+from ui_manager import UIManager
+
+# Columns of the page table
+COLUMNS = ['Page', 'Backend', 'Elapsed (s)', 'Analysis (s)', 'Iterations', 'Rejected', 'Warnings']
+
+
+class DiagnosticsViewer(QtWidgets.QMainWindow):
+    """Singleton window listing the statistics of the latest run of every
+    page, with the full ngspice output of the selected page."""
+
+
+    _inst = None
+
+    def __new__(cls):
+        if cls._inst is None:
+            cls._inst = super(DiagnosticsViewer, cls).__new__(cls)
+            cls._inst.__initialized = False
+
+        return cls._inst
+
+
+    def __init__(self):
+        if self.__initialized:
+            return
+
+        super().__init__()
+        self.__pages = []
+        self.setWindowTitle('Diagnostics')
+        self.resize(700, 500)
+
+        # Table of pages
+        self.__table = QtWidgets.QTableWidget(0, len(COLUMNS))
+        self.__table.setHorizontalHeaderLabels(COLUMNS)
+        self.__table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.__table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.__table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.__table.verticalHeader().setVisible(False)
+        self.__table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.__table.itemSelectionChanged.connect(self.updateOutput)
+
+        # Output of the selected page
+        self.__output_edit = QtWidgets.QPlainTextEdit()
+        self.__output_edit.setReadOnly(True)
+        self.__output_edit.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        self.__output_edit.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+
+        splitter = QtWidgets.QSplitter(Qt.Vertical)
+        splitter.addWidget(self.__table)
+        splitter.addWidget(self.__output_edit)
+        splitter.setSizes([200, 300])
+        self.setCentralWidget(splitter)
+
+        ui_manager = UIManager()
+        ui_manager.applyTheme(self)
+        ui_manager.themeChanged.connect(lambda: ui_manager.applyTheme(self))
+
+        SimulationScheduler().diagnosticsChanged.connect(self.updatePage)
+        self.__initialized = True
+
+
+    def setCurrentPage(self, panel):
+        self.updatePage(panel)
+        self.__table.selectRow(self.__pages.index(panel))
+
+
+    @Slot(object)
+    def updatePage(self, panel):
+        if panel not in self.__pages:
+            self.__pages.append(panel)
+            self.__table.insertRow(self.__table.rowCount())
+        row = self.__pages.index(panel)
+
+        diagnostics = panel.diagnostics()
+        values = [panel.windowTitle()] + [''] * (len(COLUMNS) - 1)
+        if diagnostics is not None:
+            values[1:] = [\
+                    diagnostics.backend(),\
+                    f'{diagnostics.elapsed():.3f}',\
+                    self.__format(diagnostics.analysisTime()),\
+                    self.__format(diagnostics.iterations()),\
+                    self.__format(diagnostics.rejectedTimepoints()),\
+                    str(len(diagnostics.warnings())),\
+                    ]
+        for column, value in enumerate(values):
+            self.__table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+
+        if self.__table.currentRow() == row:
+            self.updateOutput()
+
+
+    @staticmethod
+    def __format(value):
+        return '' if value is None else f'{value:g}'
+
+
+    @Slot()
+    def updateOutput(self):
+        row = self.__table.currentRow()
+        if row < 0 or row >= len(self.__pages):
+            self.__output_edit.clear()
+            return
+
+        diagnostics = self.__pages[row].diagnostics()
+        if diagnostics is None:
+            self.__output_edit.setPlainText('No simulation has run on this page yet.')
+            return
+
+        # Warnings first, as they are what to look for in a slow or failed run
+        lines = [f'Summary: {diagnostics.summary()}', '']
+        if diagnostics.warnings():
+            lines += ['Warnings:'] + ['  ' + line for line in diagnostics.warnings()] + ['']
+        lines += ['Output:'] + diagnostics.output()
+        self.__output_edit.setPlainText('\n'.join(lines))
@@ -0,0 +1,272 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+# Added to the reference values the relative errors are divided by
+DEFAULT_ATOL = 1e-15
+
+
+class FitMetrics:
+    """Goodness of fit of simulated curves against reference data, kept as
+    sums of squares so that the metrics of several columns or pages can be
+    merged exactly."""
+
+
+    def __init__(self, points=0, square_error=0.0, square_relative=0.0,\
+            log_points=0, square_log=0.0):
+        self.__points = points
+        self.__square_error = square_error
+        self.__square_relative = square_relative
+        self.__log_points = log_points
+        self.__square_log = square_log
+        self.__columns = []
+
+
+    def points(self):
+        """Returns the number of reference points compared."""
+        return self.__points
+
+
+    def columns(self):
+        """Returns the FitMetrics of each column."""
+        return list(self.__columns)
+
+
+    def rms(self):
+        """Returns the RMS of the absolute errors, in the units of the data."""
+        return np.sqrt(self.__square_error / self.__points) if self.__points else np.nan
+
+
+    def relativeRms(self):
+        """Returns the RMS of the errors relative to the reference values."""
+        return np.sqrt(self.__square_relative / self.__points) if self.__points else np.nan
+
+
+    def logRms(self):
+        """Returns the RMS of the errors in decades, over the points where
+        both values are non-zero."""
+        return np.sqrt(self.__square_log / self.__log_points) if self.__log_points else np.nan
+
+
+    def merge(self, other):
+        """Adds the points of another FitMetrics to this one."""
+        self.__points += other.__points
+        self.__square_error += other.__square_error
+        self.__square_relative += other.__square_relative
+        self.__log_points += other.__log_points
+        self.__square_log += other.__square_log
+
+
+    def addColumn(self, column):
+        self.merge(column)
+        self.__columns.append(column)
+
+
+    def summary(self):
+        if not self.__points:
+            return ''
+        return f'Rel. RMS {self.relativeRms():.3G}, Log RMS {self.logRms():.3G} dec'
+
+
+    def details(self):
+        """Returns the metrics of every column, one per line."""
+        lines = []
+        for i, column in enumerate(self.__columns or [self]):
+            lines.append(f'Column {i + 1}: RMS {column.rms():.3E}, '\
+                    f'Rel. RMS {column.relativeRms():.3G}, '\
+                    f'Log RMS {column.logRms():.3G} dec '\
+                    f'({column.points()} points)')
+        return '\n'.join(lines)
+
+
+def merge(metrics):
+    """Returns the FitMetrics of all the given ones together, skipping None."""
+    total = FitMetrics()
+    for m in metrics:
+        if m is not None:
+            total.merge(m)
+    return total
+
+
+class Interpolator:
+    """Linear interpolation of simulated curves onto the x values of reference
+    data. The bracketing indices found by searchsorted and the weights are
+    cached and reused as long as the simulated x values do not change, which
+    is the case for every parameter edit of a .dc or .ac analysis. On a log
+    x axis the interpolation is done in log(x). Reference points outside the
+    simulated range are left out."""
+
+
+    def __init__(self, x_new, log_x=False):
+        self.__log_x = log_x
+        self.__x_new = self.__transform(np.asarray(x_new, dtype=float))
+        self.__x = None
+        self.__order = None
+        self.__index = None
+        self.__weight = None
+        self.__valid = None
+
+
+    def logX(self):
+        return self.__log_x
+
+
+    def xNew(self):
+        return self.__x_new
+
+
+    def __transform(self, x):
+        if not self.__log_x:
+            return x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(x > 0, np.log(np.where(x > 0, x, 1.0)), np.nan)
+
+
+    def __prepare(self, x):
+        if self.__x is not None and self.__x.shape == x.shape and np.array_equal(self.__x, x):
+            return
+
+        # Simulated points usable on this axis, in increasing order
+        self.__x = x.copy()
+        t = self.__transform(x)
+        order = np.flatnonzero(np.isfinite(t))
+        if np.any(t[order][1:] < t[order][:-1]):
+            order = order[np.argsort(t[order], kind='stable')]
+        self.__order = None if len(order) == len(t) and np.all(order[1:] > order[:-1]) else order
+        t = t[order]
+
+        if len(t) < 2:
+            self.__index = np.ones(len(self.__x_new), dtype=int)
+            self.__weight = np.zeros(len(self.__x_new))
+            self.__valid = np.zeros(len(self.__x_new), dtype=bool)
+            return
+
+        index = np.clip(np.searchsorted(t, self.__x_new, side='right'), 1, len(t) - 1)
+        x0, x1 = t[index - 1], t[index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(x1 > x0, (self.__x_new - x0) / (x1 - x0), 0.0)
+
+        self.__index = index
+        self.__weight = weight
+        self.__valid = np.isfinite(self.__x_new) & (self.__x_new >= t[0]) & (self.__x_new <= t[-1])
+
+
+    def __call__(self, x, y):
+        """Interpolates the columns of `y` (points x columns) given at `x`.
+        Returns (values, valid) where `valid` masks the reference points
+        inside the simulated range."""
+        self.__prepare(np.asarray(x, dtype=float))
+        y = np.asarray(y, dtype=float)
+        if self.__order is not None:
+            y = y[self.__order]
+        if len(y) < 2:
+            return np.full((len(self.__x_new), y.shape[1]), np.nan), self.__valid
+        w = self.__weight[:, None]
+        return y[self.__index - 1] * (1.0 - w) + y[self.__index] * w, self.__valid
+
+
+class FitEvaluator:
+    """Computes the FitMetrics and the residuals of simulation results
+    against the reference data of a page. This is the one comparison of a
+    result with reference data, used by the pages, the fit, the sweep, the
+    sensitivity analysis and the batch runner. The Interpolator is kept
+    while the reference x values and the axis scales stay the same."""
+
+
+    def __init__(self, atol=DEFAULT_ATOL):
+        self.__atol = atol
+        self.__interpolator = None
+        self.__reference_x = None
+
+
+    def interpolator(self, reference_x, log_x=False):
+        interpolator = self.__interpolator
+        if interpolator is None or interpolator.logX() != log_x\
+                or not np.array_equal(self.__reference_x, reference_x):
+            self.__reference_x = np.array(reference_x, dtype=float)
+            interpolator = self.__interpolator = Interpolator(reference_x, log_x)
+        return interpolator
+
+
+    def __interpolate(self, data, reference, log_x, log_y):
+        """Returns (values, measured, valid) of the y columns of `data`
+        interpolated onto the reference points, or None."""
+        if data is None or reference is None:
+            return None
+        data = np.atleast_2d(data)
+        reference = np.atleast_2d(reference)
+        columns = min(data.shape[1], reference.shape[1])
+        if columns < 2 or data.ndim != 2 or len(data) < 2 or len(reference) == 0:
+            return None
+
+        interpolator = self.interpolator(reference[:, 0], log_x)
+        y = data[:, 1:columns]
+        sign = np.sign(y[0])
+        if log_y and np.all(y * sign > 0):
+            # Geometric interpolation of curves that keep their sign
+            values, valid = interpolator(data[:, 0], np.log(y * sign))
+            values = sign * np.exp(values)
+        else:
+            values, valid = interpolator(data[:, 0], y)
+        return values, reference[:, 1:columns], valid
+
+
+    def residuals(self, data, reference, log_x=False, log_y=False):
+        """Returns the relative errors of `data` against `reference`, column
+        after column, or None if they cannot be compared. The reference points
+        outside the simulated range count as matched, so that the vector keeps
+        its length from one result to the next; its sum of squares is that of
+        the relative RMS of evaluate()."""
+        interpolated = self.__interpolate(data, reference, log_x, log_y)
+        if interpolated is None:
+            return None
+        values, measured, valid = interpolated
+        if not np.any(valid):
+            return None
+        relative = (values - measured) / (self.__atol + np.abs(measured))
+        relative[~valid] = 0.0
+        return relative.T.ravel()
+
+
+    def evaluate(self, data, reference, log_x=False, log_y=False):
+        """Returns the FitMetrics of `data` against `reference`, both arrays of
+        x and one or more y columns, or None if they cannot be compared. On a
+        log y axis the curves are interpolated in log|y|."""
+        interpolated = self.__interpolate(data, reference, log_x, log_y)
+        if interpolated is None:
+            return None
+        values, measured, valid = interpolated
+        columns = measured.shape[1] + 1
+        measured = measured[valid]
+        values = values[valid]
+        error = values - measured
+        relative = error / (self.__atol + np.abs(measured))
+        both = (values != 0) & (measured != 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            decades = np.where(both,\
+                    np.log10(np.abs(values) / np.where(both, np.abs(measured), 1.0)), 0.0)
+
+        # Column sums in one pass over the points
+        square_error = np.sum(error ** 2, axis=0)
+        square_relative = np.sum(relative ** 2, axis=0)
+        square_log = np.sum(decades ** 2, axis=0)
+        log_points = np.sum(both, axis=0)
+
+        total = FitMetrics()
+        for i in range(columns - 1):
+            total.addColumn(FitMetrics(len(measured), float(square_error[i]),\
+                    float(square_relative[i]), int(log_points[i]), float(square_log[i])))
+        return total
@@ -0,0 +1,324 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+from PySide6 import QtCore, QtGui, QtWidgets
+from PySide6.QtCore import Signal, Slot, Qt
+import sys, os
+import threading
+import concurrent.futures
+import numpy as np
+
+import ngspice_con
+from curve_fit import FitParameter, LevenbergMarquardt
+from graph import Graph
+from fit_metrics import FitEvaluator
+from run_limits import SimulationError
+from simulation_scheduler import SimulationScheduler
+from ui_manager import UIManager
+
+# Columns of the parameter table
+PARAM_COLUMNS = ['Free', 'Name', 'Value', 'Lower', 'Upper', 'Log']
+FREE, NAME, VALUE, LOWER, UPPER, LOG = range(len(PARAM_COLUMNS))
+
+# Columns of the page table
+PAGE_COLUMNS = ['Page', 'Weight']
+
+
+class FitWindow(QtWidgets.QMainWindow):
+    """Singleton window fitting the free parameters to the reference data of
+    all enabled pages. The optimizer runs on a background thread; its
+    simulations go through the result cache and the worker processes of the
+    SimulationScheduler, and the parameter table follows every accepted step."""
+
+    # Signals emitted from the optimizer thread
+    iterationFinished = Signal(int, object, float, float)
+    fitFinished = Signal(object, float, str)
+
+
+    _inst = None
+
+    def __new__(cls):
+        if cls._inst is None:
+            cls._inst = super(FitWindow, cls).__new__(cls)
+            cls._inst.__initialized = False
+
+        return cls._inst
+
+
+    def __init__(self):
+        if self.__initialized:
+            return
+
+        super().__init__()
+        self.__param_table = None
+        self.__param_dict = {}
+        self.__pages = []
+        self.__optimizer = None
+        self.__batch = None # SimulationBatch of the runs of the fit
+        self.setWindowTitle('Fit Parameters')
+        self.resize(600, 600)
+
+        # Parameters
+        self.__free_table = QtWidgets.QTableWidget(0, len(PARAM_COLUMNS))
+        self.__free_table.setHorizontalHeaderLabels(PARAM_COLUMNS)
+        self.__free_table.verticalHeader().setVisible(False)
+
+        # Pages and their weights
+        self.__page_table = QtWidgets.QTableWidget(0, len(PAGE_COLUMNS))
+        self.__page_table.setHorizontalHeaderLabels(PAGE_COLUMNS)
+        self.__page_table.verticalHeader().setVisible(False)
+        self.__page_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+
+        # Settings
+        self.__iterations_spin = QtWidgets.QSpinBox()
+        self.__iterations_spin.setRange(1, 10000)
+        self.__iterations_spin.setValue(50)
+
+        self.__tolerance_edit = QtWidgets.QLineEdit('1.000E-06')
+
+        form = QtWidgets.QFormLayout()
+        form.addRow('Max Iterations:', self.__iterations_spin)
+        form.addRow('Tolerance:', self.__tolerance_edit)
+
+        # Buttons
+        self.__start_button = QtWidgets.QPushButton('Start')
+        self.__start_button.clicked.connect(self.start)
+        self.__stop_button = QtWidgets.QPushButton('Stop')
+        self.__stop_button.clicked.connect(self.stop)
+        self.__stop_button.setEnabled(False)
+
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(self.__start_button)
+        buttons.addWidget(self.__stop_button)
+
+        # Progress log
+        self.__log_edit = QtWidgets.QPlainTextEdit()
+        self.__log_edit.setReadOnly(True)
+        self.__log_edit.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+
+        central = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(central)
+        layout.addWidget(self.__free_table, 3)
+        layout.addWidget(self.__page_table, 1)
+        layout.addLayout(form)
+        layout.addLayout(buttons)
+        layout.addWidget(self.__log_edit, 2)
+        self.setCentralWidget(central)
+
+        ui_manager = UIManager()
+        ui_manager.applyTheme(self)
+        ui_manager.themeChanged.connect(lambda: ui_manager.applyTheme(self))
+
+        self.iterationFinished.connect(self.onIterationFinished, Qt.QueuedConnection)
+        self.fitFinished.connect(self.onFitFinished, Qt.QueuedConnection)
+        self.__initialized = True
+
+
+    def setup(self, param_table, param_dict, panels):
+        """Sets the parameter table to update and the pages to fit. Settings
+        of parameters and pages already listed are kept."""
+        self.__param_table = param_table
+        self.__param_dict = param_dict
+
+        previous = {}
+        for row in range(self.__free_table.rowCount()):
+            previous[self.__free_table.item(row, NAME).text()] = [\
+                    self.__free_table.item(row, FREE).checkState(),\
+                    self.__free_table.item(row, LOWER).text(),\
+                    self.__free_table.item(row, UPPER).text(),\
+                    self.__free_table.item(row, LOG).checkState()]
+
+        self.__free_table.setRowCount(len(param_dict))
+        for row, (key, value) in enumerate(param_dict.items()):
+            positive = value > 0
+            free, lower, upper, log = previous.get(key, [Qt.Unchecked,\
+                    f'{value / 1000:.3E}' if positive else '',\
+                    f'{value * 1000:.3E}' if positive else '',\
+                    Qt.Checked if positive else Qt.Unchecked])
+            for column, state in [(FREE, free), (LOG, log)]:
+                item = QtWidgets.QTableWidgetItem()
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(state)
+                self.__free_table.setItem(row, column, item)
+            for column, text in [(NAME, key), (VALUE, f'{value:.3E}')]:
+                item = QtWidgets.QTableWidgetItem(text)
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                self.__free_table.setItem(row, column, item)
+            self.__free_table.setItem(row, LOWER, QtWidgets.QTableWidgetItem(lower))
+            self.__free_table.setItem(row, UPPER, QtWidgets.QTableWidgetItem(upper))
+
+        weights = { panel: self.__page_table.cellWidget(row, 1).value()\
+                for row, panel in enumerate(self.__pages) }
+        self.__pages = [panel for panel in panels\
+                if panel.enabled() and panel.scriptFile() and panel.dataFile()]
+        self.__page_table.setRowCount(len(self.__pages))
+        for row, panel in enumerate(self.__pages):
+            item = QtWidgets.QTableWidgetItem(panel.windowTitle())
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            self.__page_table.setItem(row, 0, item)
+            spin = QtWidgets.QDoubleSpinBox()
+            spin.setRange(0.0, 1000.0)
+            spin.setValue(weights.get(panel, 1.0))
+            self.__page_table.setCellWidget(row, 1, spin)
+
+
+    def parameters(self):
+        """Returns the FitParameter of every free parameter.
+        Raises ValueError if a setting is invalid."""
+        parameters = []
+        for row in range(self.__free_table.rowCount()):
+            if self.__free_table.item(row, FREE).checkState() != Qt.Checked:
+                continue
+            name = self.__free_table.item(row, NAME).text()
+            try:
+                lower = self.__free_table.item(row, LOWER).text().strip()
+                upper = self.__free_table.item(row, UPPER).text().strip()
+                lower = float(lower) if lower else -np.inf
+                upper = float(upper) if upper else np.inf
+            except ValueError:
+                raise ValueError(f"'{name}': the bounds must be numbers.")
+            log = self.__free_table.item(row, LOG).checkState() == Qt.Checked
+            parameters.append(FitParameter(name, self.__param_dict[name], lower, upper, log))
+        return parameters
+
+
+    @Slot()
+    def start(self):
+        if self.__optimizer is not None:
+            return
+        try:
+            parameters = self.parameters()
+            if not parameters:
+                raise ValueError('Check at least one parameter to fit.')
+            if not self.__pages:
+                raise ValueError('No enabled page has both a script and reference data.')
+            tolerance = float(self.__tolerance_edit.text())
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, 'Fit Parameters', str(e))
+            return
+
+        # Everything the optimizer thread needs is collected here, so that it
+        # never touches a widget
+        pages = []
+        for row, panel in enumerate(self.__pages):
+            reference = Graph.loadFile(panel.dataFile())
+            weight = self.__page_table.cellWidget(row, 1).value()
+            if reference is None or weight <= 0:
+                continue
+            pages.append((panel.scriptFile(), np.atleast_2d(reference), weight, panel.timeout(),\
+                    FitEvaluator(), panel.graph().logScaleX(), panel.graph().logScaleY()))
+        if not pages:
+            QtWidgets.QMessageBox.warning(self, 'Fit Parameters', 'No reference data could be loaded.')
+            return
+
+        batch = SimulationScheduler().submitBatch()
+        self.__batch = batch
+        base = dict(self.__param_dict)
+        names = [p.name() for p in parameters]
+        evaluate = lambda vectors: self.evaluate(batch, base, names, pages, vectors)
+        self.__optimizer = LevenbergMarquardt(evaluate, parameters,\
+                self.__iterations_spin.value(), tolerance)
+
+        self.__start_button.setEnabled(False)
+        self.__stop_button.setEnabled(True)
+        self.__log_edit.appendPlainText(f"Fitting {', '.join(names)} on {len(pages)} pages")
+        threading.Thread(target=self.__run, args=(self.__optimizer, names), daemon=True).start()
+
+
+    def __run(self, optimizer, names):
+        """Body of the optimizer thread."""
+        def callback(iteration, values, cost, damping):
+            self.iterationFinished.emit(iteration, dict(zip(names, values)), cost, damping)
+        try:
+            values, cost, message = optimizer.run(callback)
+        except Exception as e:
+            values, cost, message = None, float('inf'), f'Error: {e}'
+        self.fitFinished.emit(dict(zip(names, values)) if values else None, cost, message)
+
+
+    def evaluate(self, batch, base, names, pages, vectors):
+        """Returns the weighted residual vector of every parameter vector,
+        running the simulations that are not cached in parallel in `batch`.
+        Called on the optimizer thread."""
+        cache = SimulationScheduler().cache()
+        jobs = []
+        for values in vectors:
+            param_dict = dict(base)
+            param_dict.update(zip(names, values))
+            for page in pages:
+                script, timeout = page[0], page[3]
+                key = cache.key(script, param_dict,\
+                        ngspice_con.BACKEND, ngspice_con.OUTPUT_FORMAT)
+                data = cache.get(key)
+                future = None
+                if data is None:
+                    future = batch.submit(script, param_dict, timeout)
+                jobs.append((key, data, future, page))
+
+        concurrent.futures.wait([job[2] for job in jobs if job[2] is not None])
+
+        results = []
+        for i in range(len(vectors)):
+            residuals = []
+            for key, data, future, page in jobs[i * len(pages):(i + 1) * len(pages)]:
+                script, reference, weight, timeout, evaluator, log_x, log_y = page
+                if future is not None:
+                    try:
+                        data, diagnostics = future.result()
+                    except (SimulationError, concurrent.futures.CancelledError):
+                        data = None
+                    except Exception as e:
+                        print(str(e))
+                        data = None
+                    cache.put(key, data)
+                r = evaluator.residuals(data, reference, log_x, log_y)
+                if r is None:
+                    residuals = None
+                    break
+                # Every page contributes its mean squared error, whatever its
+                # number of points
+                residuals.append(r * np.sqrt(weight / r.size))
+            results.append(np.concatenate(residuals) if residuals is not None else None)
+        return results
+
+
+    @Slot()
+    def stop(self):
+        if self.__optimizer is None:
+            return
+        self.__optimizer.stop()
+        self.__batch.cancel()
+
+
+    @Slot(int, object, float, float)
+    def onIterationFinished(self, iteration, values, cost, damping):
+        self.__log_edit.appendPlainText(\
+                f'Iteration {iteration:4d}: cost {cost:.6E}, damping {damping:.1E}')
+        self.__param_table.setValues(values)
+
+
+    @Slot(object, float, str)
+    def onFitFinished(self, values, cost, message):
+        self.__optimizer = None
+        self.__batch = None
+        self.__start_button.setEnabled(True)
+        self.__stop_button.setEnabled(False)
+
+        self.__log_edit.appendPlainText(f'{message}: cost {cost:.6E}')
+        if values:
+            self.__param_table.setValues(values)
+            for row in range(self.__free_table.rowCount()):
+                key = self.__free_table.item(row, NAME).text()
+                self.__free_table.item(row, VALUE).setText(f'{self.__param_dict[key]:.3E}')
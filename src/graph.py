@@ -34,6 +34,8 @@ class Graph(pg.PlotWidget):
         self.__log_scale_Y = False
         self.__coordinates = 'Cartesian' # or 'Polar' or 'Smith Chart'
         self.__polar_radius = 1.0 # Maximum radius for Polar plot
+        self.__preview_items = [] # Curves of the preview of a running simulation
+        self.__overlay_item = None # Curve of the results of a sweep
 
 
     def logScaleX(self):
@@ -129,6 +131,8 @@ class Graph(pg.PlotWidget):
         
         # Clear existing plots, and set log scales and aspect ratio
         self.clear()
+        self.__preview_items = []
+        self.__overlay_item = None
         aspect_lock = self.__coordinates in ['Polar', 'Smith Chart']
         self.setAspectLocked(aspect_lock)
         self.setLogMode(x=self.__log_scale_X, y=self.__log_scale_Y)
@@ -145,15 +149,27 @@ class Graph(pg.PlotWidget):
 
     def plotFile(self, file_name, pen=None, symbol='o', symbol_size=2,\
             symbol_pen='w', symbol_brush='w'):
-        try:
-            # Load a text file
-            data = np.loadtxt(file_name)
+        data = self.loadFile(file_name)
+        if data is None:
+            return
+
+        self.plotData(data, pen=pen, symbol=symbol, symbol_size=symbol_size,\
+                symbol_pen=symbol_pen, symbol_brush=symbol_brush)
 
+
+    @staticmethod
+    def loadFile(file_name):
+        """Loads a text data file, or returns None if it cannot be read."""
+        try:
+            return np.loadtxt(file_name)
         except Exception as e:
             print(str(e))
-            return
+            return None
 
-        if data.ndim != 2 or data.shape[1] < 2:
+
+    def plotData(self, data, pen=None, symbol='o', symbol_size=2,\
+            symbol_pen='w', symbol_brush='w'):
+        if data is None or data.ndim != 2 or data.shape[1] < 2:
             # Returns if the data is not two-dimensional or does not have
             # more than two columns
             return
@@ -167,6 +183,44 @@ class Graph(pg.PlotWidget):
                     symbolBrush=symbol_brush)
 
 
+    def plotPreview(self, data, color=(237, 125, 49)):
+        """Plots the preview of a running simulation, a pair of x and y columns
+        per curve padded with NaN, as lines without symbols. The curves are
+        updated in place until the graph is initialized again."""
+        if data is None or data.ndim != 2 or data.shape[1] < 2:
+            return
+        pen = pg.mkPen(color=color, width=2)
+        curves = data.shape[1] // 2
+        while len(self.__preview_items) < curves:
+            self.__preview_items.append(self.plot([], [], pen=pen))
+        for i in range(curves):
+            x, y = data[:, 2 * i], data[:, 2 * i + 1]
+            finite = np.isfinite(x) & np.isfinite(y)
+            self.__preview_items[i].setData(x[finite], y[finite])
+
+
+    def plotOverlays(self, overlays, color=(0, 114, 189, 60)):
+        """Plots the results of a sweep as thin translucent lines without
+        symbols. All of them are drawn as a single curve, broken by NaN
+        between the columns, which is updated in place until the graph is
+        initialized again."""
+        x, y = [], []
+        for data in overlays:
+            if data is None or data.ndim != 2 or data.shape[1] < 2:
+                continue
+            for column in range(1, data.shape[1]):
+                x += [data[:, 0], [np.nan]]
+                y += [data[:, column], [np.nan]]
+        if not x:
+            return
+        x, y = np.concatenate(x), np.concatenate(y)
+        if self.__overlay_item is None:
+            pen = pg.mkPen(color=color, width=1)
+            self.__overlay_item = self.plot(x, y, pen=pen, connect='finite')
+        else:
+            self.__overlay_item.setData(x, y, connect='finite')
+
+
     def drawSmithGrid(self):
         pen = pg.mkPen(color='#808080', width=1, style=Qt.SolidLine)
 
@@ -19,15 +19,26 @@ import sys, os
 import configparser
 import base64
 import pyqtgraph as pg
+import fit_metrics
 import ngspice_con
+import ngspice_pool
+import ngspice_shared
+import stage_timer
 
 from app_version import APP_VERSION
 from code_editor_window import CodeEditorWindow
-from parameter_io import ParameterIO
+from diagnostics_viewer import DiagnosticsViewer
+from fit_window import FitWindow
+from parameter_io import ParameterIO, SIMULATION_DIGITS
 from parameter_table import ParameterTable
 from path_utils import resolvePath
+from run_limits import RunLimits
+from sensitivity_window import SensitivityWindow
 from simulation_panel import SimulationPanel
+from simulation_scheduler import SimulationScheduler,\
+        PRIORITY_FOCUSED, PRIORITY_VISIBLE, PRIORITY_HIDDEN
 from summary_viewer import SummaryViewer
+from sweep_window import SweepWindow
 from ui_manager import UIManager
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -37,6 +48,7 @@ class MainWindow(QtWidgets.QMainWindow):
         super().__init__(parent)
         self.__param_dict = {}
         self.__param_table = ParameterTable(self.__param_dict)
+        self.__focused_page = None # Page the user last worked on
         self.setupUI()
         self.setWindowTitle('MODELngspicer')
         self.resize(700, 350)
@@ -44,6 +56,10 @@ class MainWindow(QtWidgets.QMainWindow):
         ui_manager = UIManager()
         ui_manager.applyTheme(self)
 
+        # Start the persistent ngspice_con workers in the background
+        if ngspice_con.BACKEND == 'Pool':
+            SimulationScheduler().startWorkers()
+
 
     def setupUI(self):
         # Central dock area
@@ -59,7 +75,7 @@ class MainWindow(QtWidgets.QMainWindow):
             dock.setObjectName(name)
             dock.setWidget(content)
             content.windowTitleChanged.connect(dock.setWindowTitle)
-            self.__param_table.valueChanged.connect(content.update_)
+            content.metricsChanged.connect(self.updateMetrics)
 
             self.__central_docks.append(dock)
             self.__central_dock_area.addDockWidget(Qt.TopDockWidgetArea, dock)
@@ -74,6 +90,19 @@ class MainWindow(QtWidgets.QMainWindow):
         # Raise the first dock widget
         self.__central_docks[0].raise_()
 
+        # Run the page the user works on first, then the other visible ones
+        self.__focused_page = self.__central_docks[0].widget()
+        self.__central_dock_area.tabifiedDockWidgetActivated.connect(self.pageActivated)
+        QtWidgets.QApplication.instance().focusChanged.connect(self.focusChanged)
+        SimulationScheduler().setPriorityFunction(self.pagePriority)
+
+        # Status bar > Goodness of fit over all pages
+        self.__metrics_label = QtWidgets.QLabel()
+        self.statusBar().addWidget(self.__metrics_label)
+
+        # Simulate all pages in parallel when a parameter changes
+        self.__param_table.valueChanged.connect(self.parameterChanged)
+
         # Parameter table
         dock = QtWidgets.QDockWidget('Parameters', self)
         dock.setObjectName('Parameters')
@@ -108,6 +137,36 @@ class MainWindow(QtWidgets.QMainWindow):
         action.triggered.connect(self.saveSettings)
         FILE_menu.addAction(action)
 
+        FILE_menu.addSeparator()
+
+        # "File">"Fit Parameters..."
+        action = QtGui.QAction('&Fit Parameters...', self)
+        action.triggered.connect(self.openFit)
+        FILE_menu.addAction(action)
+
+        # "File">"Parameter Sweep..."
+        action = QtGui.QAction('Parameter S&weep...', self)
+        action.triggered.connect(self.openSweep)
+        FILE_menu.addAction(action)
+
+        # "File">"Sensitivity Analysis..."
+        action = QtGui.QAction('Sensiti&vity Analysis...', self)
+        action.triggered.connect(self.openSensitivity)
+        FILE_menu.addAction(action)
+
+        # "File">"Export Timings..."
+        action = QtGui.QAction('Export &Timings...', self)
+        action.triggered.connect(self.exportTimings)
+        FILE_menu.addAction(action)
+
+        FILE_menu.addSeparator()
+
+        # "File">"Cancel Simulations"
+        action = QtGui.QAction('&Cancel Simulations', self)
+        action.setShortcut(QtGui.QKeySequence(Qt.Key_Escape))
+        action.triggered.connect(lambda: SimulationScheduler().cancel())
+        FILE_menu.addAction(action)
+
         # "View">"Tiling"
         TILING_menu = VIEW_menu.addMenu('&Tiling')
 
@@ -136,6 +195,11 @@ class MainWindow(QtWidgets.QMainWindow):
         action.triggered.connect(lambda: self.tilingLayout(2, 3))
         TILING_menu.addAction(action)
 
+        # "View">"Diagnostics..."
+        action = QtGui.QAction('&Diagnostics...', self)
+        action.triggered.connect(self.openDiagnostics)
+        VIEW_menu.addAction(action)
+
         VIEW_menu.addSeparator()
 
         # "View">"Page n"
@@ -170,6 +234,116 @@ class MainWindow(QtWidgets.QMainWindow):
         self.__DARK_THEME_action.triggered.connect(self.setDarkTheme)
         THEME_menu.addAction(self.__DARK_THEME_action)
 
+        # "Options">"Simulator"
+        SIMULATOR_menu = OPTIONS_menu.addMenu('&Simulator')
+
+        # "Options">"Simulator">"Subprocess (ngspice_con)", "Shared Library (libngspice)"
+        self.__SIMULATOR_actions = {}
+        for backend, text in [('Subprocess', 'Subprocess (ngspice_con)'),\
+                ('Pool', 'Persistent Workers (ngspice_con)'),\
+                ('Shared', 'Shared Library (libngspice)')]:
+            action = QtGui.QAction(text, self)
+            action.setCheckable(True)
+            action.setChecked(backend == ngspice_con.BACKEND)
+            action.triggered.connect(\
+                    lambda checked, backend=backend:\
+                    self.setSimulatorBackend(backend))
+
+            self.__SIMULATOR_actions[backend] = action
+            SIMULATOR_menu.addAction(action)
+
+        SIMULATOR_menu.addSeparator()
+
+        # "Options">"Simulator">"Binary Rawfile Output"
+        action = QtGui.QAction('Binary Rawfile Output', self)
+        action.setCheckable(True)
+        action.setChecked(ngspice_con.OUTPUT_FORMAT == 'Binary')
+        action.triggered.connect(self.setBinaryOutput)
+        SIMULATOR_menu.addAction(action)
+
+        # "Options">"Parallel Workers..."
+        action = QtGui.QAction('&Parallel Workers...', self)
+        action.triggered.connect(self.setParallelWorkers)
+        OPTIONS_menu.addAction(action)
+
+        # "Options">"Remote Workers..."
+        action = QtGui.QAction('&Remote Workers...', self)
+        action.triggered.connect(self.setRemoteWorkers)
+        OPTIONS_menu.addAction(action)
+
+        # "Options">"Update Delay..."
+        action = QtGui.QAction('&Update Delay...', self)
+        action.triggered.connect(self.setUpdateDelay)
+        OPTIONS_menu.addAction(action)
+
+        # Checkable options saved with the settings, as (action, setter)
+        self.__OPTION_actions = {}
+
+        # "Options">"Defer Hidden Pages"
+        action = QtGui.QAction('&Defer Hidden Pages', self)
+        action.setToolTip('Simulate hidden and tabbed-behind pages only when they are shown')
+        action.setCheckable(True)
+        action.setChecked(SimulationScheduler().lazy())
+        action.triggered.connect(lambda checked: SimulationScheduler().setLazy(checked))
+        OPTIONS_menu.addAction(action)
+        self.__OPTION_actions['DeferHiddenPages'] = (action, SimulationScheduler().setLazy)
+
+        # "Options">"Split Sweeps"
+        action = QtGui.QAction('S&plit Sweeps', self)
+        action.setToolTip('Split the dc, ac or sp sweep of a page over the parallel workers')
+        action.setCheckable(True)
+        action.setChecked(SimulationScheduler().splitSweeps())
+        action.triggered.connect(lambda checked: SimulationScheduler().setSplitSweeps(checked))
+        OPTIONS_menu.addAction(action)
+        self.__OPTION_actions['SplitSweeps'] = (action, SimulationScheduler().setSplitSweeps)
+
+        # "Options">"Warm Start"
+        action = QtGui.QAction('&Warm Start', self)
+        action.setToolTip('Start each run from the operating point of the page '\
+                '(subprocess backend)')
+        action.setCheckable(True)
+        action.setChecked(SimulationScheduler().warmStart())
+        action.triggered.connect(lambda checked: SimulationScheduler().setWarmStart(checked))
+        OPTIONS_menu.addAction(action)
+        self.__OPTION_actions['WarmStart'] = (action, SimulationScheduler().setWarmStart)
+
+        # "Options">"Progressive Plotting (Shared Library)"
+        self.__PROGRESSIVE_action = QtGui.QAction('Pr&ogressive Plotting (Shared Library)', self)
+        self.__PROGRESSIVE_action.setToolTip('Draw the result of a page while it is simulated. '\
+                'Only the shared library backend can show it')
+        self.__PROGRESSIVE_action.setCheckable(True)
+        self.__PROGRESSIVE_action.setChecked(SimulationScheduler().progressive())
+        self.__PROGRESSIVE_action.setEnabled(ngspice_con.showsPreview())
+        self.__PROGRESSIVE_action.triggered.connect(\
+                lambda checked: SimulationScheduler().setProgressive(checked))
+        OPTIONS_menu.addAction(self.__PROGRESSIVE_action)
+        self.__OPTION_actions['ProgressivePlotting'] =\
+                (self.__PROGRESSIVE_action, SimulationScheduler().setProgressive)
+
+        # "Options">"Simulation Limits..."
+        action = QtGui.QAction('Simulation &Limits...', self)
+        action.triggered.connect(self.setSimulationLimits)
+        OPTIONS_menu.addAction(action)
+
+        # "Options">"Result Cache"
+        CACHE_menu = OPTIONS_menu.addMenu('&Result Cache')
+        scheduler = SimulationScheduler()
+
+        # "Options">"Result Cache">"Keep on Disk"
+        action = QtGui.QAction('Keep on Disk', self)
+        action.setCheckable(True)
+        action.setChecked(scheduler.cache().diskEnabled())
+        action.triggered.connect(\
+                lambda checked: scheduler.cache().setDiskEnabled(checked))
+        CACHE_menu.addAction(action)
+        self.__OPTION_actions['DiskCache'] = (action, scheduler.cache().setDiskEnabled)
+
+        # "Options">"Result Cache">"Clear"
+        action = QtGui.QAction('Clear', self)
+        action.triggered.connect(\
+                lambda: scheduler.cache().clear(disk=True))
+        CACHE_menu.addAction(action)
+
         # "Options">"Code Editor"
         action = QtGui.QAction('&Code Editor', self)
         action.triggered.connect(self.openCodeEditor)
@@ -196,6 +370,150 @@ class MainWindow(QtWidgets.QMainWindow):
         ui_manager.applyTheme(self)
 
 
+    @Slot()
+    def setSimulatorBackend(self, backend):
+        if backend not in ngspice_con.BACKENDS:
+            raise ValueError(f"Unknown simulator backend: {backend}")
+        pool_changed = (ngspice_con.BACKEND == 'Pool') != (backend == 'Pool')
+        ngspice_con.BACKEND = backend
+        for key, action in self.__SIMULATOR_actions.items():
+            action.setChecked(key == backend)
+        self.__PROGRESSIVE_action.setEnabled(ngspice_con.showsPreview())
+
+        # The Pool backend runs on threads of this process rather than on
+        # worker processes, so the executor is replaced
+        if pool_changed:
+            scheduler = SimulationScheduler()
+            scheduler.shutdown()
+            if backend == 'Pool':
+                scheduler.startWorkers()
+            else:
+                ngspice_pool.shutdown()
+
+        if backend == 'Shared' and not ngspice_shared.available():
+            QtWidgets.QMessageBox.warning(self, 'Simulator',\
+                    'The ngspice shared library was not found.\n'\
+                    f'Set {ngspice_shared.LIBRARY_ENV} to its path. '\
+                    "Falling back to 'ngspice_con' until then.")
+
+        self.updatePages()
+
+
+    @Slot(bool)
+    def setBinaryOutput(self, checked):
+        ngspice_con.OUTPUT_FORMAT = 'Binary' if checked else 'Text'
+        self.updatePages()
+
+
+    @Slot()
+    def updatePages(self):
+        scheduler = SimulationScheduler()
+        scheduler.schedule([dock.widget() for dock in self.__central_docks])
+
+
+    @Slot(str)
+    def parameterChanged(self, key):
+        # Only the pages depending on the changed parameter are updated
+        scheduler = SimulationScheduler()
+        scheduler.schedule([dock.widget() for dock in self.__central_docks], key)
+
+
+    @Slot()
+    def setParallelWorkers(self):
+        scheduler = SimulationScheduler()
+        value, ok = QtWidgets.QInputDialog.getInt(self,\
+                'Parallel Workers', 'Number of worker processes:',\
+                scheduler.maxWorkers(), 1, 256)
+        if ok:
+            scheduler.setMaxWorkers(value)
+
+
+    @Slot()
+    def setRemoteWorkers(self):
+        scheduler = SimulationScheduler()
+        text, ok = QtWidgets.QInputDialog.getMultiLineText(self,\
+                'Remote Workers', 'Addresses of remote workers, one per line\n'\
+                '(host:port or unix:path, empty to simulate locally).\n'\
+                'The token is read from the MODELNGSPICER_TOKEN variable:',\
+                '\n'.join(scheduler.remoteWorkers()))
+        if not ok:
+            return
+        addresses = text.split()
+        try:
+            scheduler.setRemoteWorkers(addresses)
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, 'Remote Workers', str(e))
+            return
+        if addresses and not scheduler.remoteSlots():
+            QtWidgets.QMessageBox.warning(self, 'Remote Workers',\
+                    'No remote worker could be reached. Simulating locally.')
+
+
+    @Slot()
+    def setUpdateDelay(self):
+        scheduler = SimulationScheduler()
+        value, ok = QtWidgets.QInputDialog.getInt(self,\
+                'Update Delay', 'Quiet period before simulating (ms):',\
+                scheduler.quietPeriod(), 0, 10000, 10)
+        if ok:
+            scheduler.setQuietPeriod(value)
+
+
+    @Slot()
+    def setSimulationLimits(self):
+        scheduler = SimulationScheduler()
+        limits = scheduler.limits()
+
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle('Simulation Limits')
+
+        timeout_spin = QtWidgets.QDoubleSpinBox()
+        timeout_spin.setRange(0.0, 86400.0)
+        timeout_spin.setDecimals(1)
+        timeout_spin.setSuffix(' s')
+        timeout_spin.setSpecialValueText('None')
+        timeout_spin.setValue(limits.timeout())
+
+        cpu_time_spin = QtWidgets.QSpinBox()
+        cpu_time_spin.setRange(0, 86400)
+        cpu_time_spin.setSuffix(' s')
+        cpu_time_spin.setSpecialValueText('None')
+        cpu_time_spin.setValue(limits.cpuTime())
+
+        memory_spin = QtWidgets.QSpinBox()
+        memory_spin.setRange(0, 1024 * 1024)
+        memory_spin.setSuffix(' MB')
+        memory_spin.setSpecialValueText('None')
+        memory_spin.setValue(limits.memory())
+
+        # Layout
+        layout = QtWidgets.QFormLayout(dialog)
+        layout.addRow('Timeout:', timeout_spin)
+        layout.addRow('CPU Time:', cpu_time_spin)
+        layout.addRow('Memory:', memory_spin)
+
+        # Buttons
+        button_box = QtWidgets.QDialogButtonBox(\
+                QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel,\
+                parent=dialog)
+        layout.addRow(button_box)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+
+        if dialog.exec() == QtWidgets.QDialog.Accepted:
+            scheduler.setLimits(RunLimits(\
+                    timeout_spin.value(), cpu_time_spin.value(), memory_spin.value()))
+
+
+    @Slot()
+    def openDiagnostics(self):
+        viewer = DiagnosticsViewer()
+        for dock in self.__central_docks:
+            viewer.updatePage(dock.widget())
+        viewer.show()
+        viewer.raise_()
+
+
     @Slot()
     def openUserGuide(self):
         absolute_path = resolvePath('<APPLICATIONDIR>/docs/UserGuide.pdf')
@@ -210,20 +528,6 @@ class MainWindow(QtWidgets.QMainWindow):
         if not file_name:
             return
 
-        basename = os.path.basename(file_name)
-        if basename.lower() == 'model.txt':
-            message_box = QtWidgets.QMessageBox()
-            message_box.setIcon(QtWidgets.QMessageBox.Warning)
-            message_box.setWindowTitle('Warning')
-            message_box.setText(\
-                    '"model.txt" will be overwriten whenever parameters are changed!\n'\
-                    'Do you still want to proceed?')
-            message_box.setStandardButtons(QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
-            message_box.setDefaultButton(QtWidgets.QMessageBox.No)
-            answer = message_box.exec()
-            if answer == QtWidgets.QMessageBox.No:
-                return
-
         parameter_io = ParameterIO()
         parameter_io.read(self.__param_dict, file_name)
         self.__param_table.update_()
@@ -315,6 +619,84 @@ class MainWindow(QtWidgets.QMainWindow):
                 """)
 
 
+    @Slot(QtWidgets.QDockWidget)
+    def pageActivated(self, dock):
+        """Makes a page brought to the front of its tabs the focused one."""
+        if dock in self.__central_docks:
+            self.__focused_page = dock.widget()
+
+
+    @Slot(QtWidgets.QWidget, QtWidgets.QWidget)
+    def focusChanged(self, old, new):
+        for dock in self.__central_docks:
+            if new is not None and (dock is new or dock.isAncestorOf(new)):
+                self.__focused_page = dock.widget()
+                return
+
+
+    def pagePriority(self, panel):
+        """Returns the priority of the runs of a page: the focused page first,
+        then the other visible pages, then those tabbed behind or closed."""
+        if not panel.isVisible():
+            return PRIORITY_HIDDEN
+        if panel is self.__focused_page:
+            return PRIORITY_FOCUSED
+        return PRIORITY_VISIBLE
+
+
+    @Slot()
+    def updateMetrics(self):
+        """Shows the fit metrics of all enabled pages taken together."""
+        pages = [dock.widget() for dock in self.__central_docks]
+        pages = [panel for panel in pages if panel.enabled() and panel.metrics() is not None]
+        total = fit_metrics.merge(panel.metrics() for panel in pages)
+        if not total.points():
+            self.__metrics_label.setText('')
+            return
+        self.__metrics_label.setText(f'Total ({len(pages)} pages): {total.summary()}')
+        self.__metrics_label.setToolTip('\n'.join(\
+                f'{panel.windowTitle()}: {panel.metrics().summary()}' for panel in pages))
+
+
+    @Slot()
+    def openFit(self):
+        window = FitWindow()
+        window.setup(self.__param_table, self.__param_dict,\
+                [dock.widget() for dock in self.__central_docks])
+        window.show()
+        window.raise_()
+
+
+    @Slot()
+    def openSweep(self):
+        window = SweepWindow()
+        window.setPages([dock.widget() for dock in self.__central_docks])
+        window.show()
+        window.raise_()
+
+
+    @Slot()
+    def openSensitivity(self):
+        window = SensitivityWindow()
+        window.setPages([dock.widget() for dock in self.__central_docks])
+        window.show()
+        window.raise_()
+
+
+    @Slot()
+    def exportTimings(self):
+        file_name, type_ = QtWidgets.QFileDialog.getSaveFileName(self,\
+                'Export Timings', '', 'CSV Files (*.csv)')
+        if not file_name:
+            return
+        histories = [(dock.widget().windowTitle(), dock.widget().timings())\
+                for dock in self.__central_docks]
+        try:
+            stage_timer.writeCsv(file_name, histories)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, 'Export Error', f"Failed to write file:\n{e}")
+
+
     @Slot()
     def saveSettings(self):
         file_name, type_ = QtWidgets.QFileDialog.getSaveFileName(self,\
@@ -343,8 +725,13 @@ class MainWindow(QtWidgets.QMainWindow):
                 'WindowLayout'  : encoded_state,\
                 }
 
-        # Parameters
-        config['Parameters'] = { key: f'{value:.3E}' for key, value in self.__param_dict.items() }
+        # Parameters, with the digits they are simulated with
+        config['Parameters'] = { key: f'{value:.{SIMULATION_DIGITS}E}'\
+                for key, value in self.__param_dict.items() }
+
+        # Options
+        config['Options'] = { key: action.isChecked()\
+                for key, (action, setter) in self.__OPTION_actions.items() }
 
         # Pages
         for i, dock in enumerate(self.__central_docks):
@@ -352,6 +739,7 @@ class MainWindow(QtWidgets.QMainWindow):
             config[f'Page-{i+1}'] = {\
                     'Title'         : content.windowTitle(),\
                     'Enabled'       : content.enabled(),\
+                    'Timeout'       : content.timeout(),\
                     'ScriptFile'    : content.scriptFile().replace(project_dir, '<PROJECTDIR>'),\
                     'DataFile'      : content.dataFile().replace(project_dir, '<PROJECTDIR>'),\
                     'AxisTitleX'    : content.graph().axisTitleX(),\
@@ -438,6 +826,18 @@ class MainWindow(QtWidgets.QMainWindow):
         self.__param_table.update_()
         PROGRESS_INCREMENT()
 
+        # Options
+        if 'Options' in config:
+            for key, (action, setter) in self.__OPTION_actions.items():
+                if key in config['Options']:
+                    try:
+                        value = config.getboolean('Options', key)
+                    except ValueError:
+                        print(f"Warning: Invalid value of option '{key}'.")
+                        continue
+                    action.setChecked(value)
+                    setter(value)
+
         # Pages
         for i, dock in enumerate(self.__central_docks):
             content = dock.widget()
@@ -453,6 +853,10 @@ class MainWindow(QtWidgets.QMainWindow):
                     value = config.getboolean(section, 'Enabled', fallback=True)
                     content.setEnabled(value)
 
+                if 'Timeout' in config[section]:
+                    value = config.getfloat(section, 'Timeout', fallback=0.0)
+                    content.setTimeout(max(value, 0.0))
+
                 if 'ScriptFile' in config[section]:
                     value = config.get(section, 'ScriptFile', fallback='').strip()
                     content.setScriptFile(resolvePath(value, extra_aliases) if value else '')
@@ -497,8 +901,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Enable ngspice_con and run simulations
         ngspice_con.RUN_ENABLED = True
-        for dock in self.__central_docks:
-            dock.widget().update_()
+        self.updatePages()
         PROGRESS_INCREMENT()
 
         # Display HTML summary
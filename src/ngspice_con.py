@@ -16,11 +16,50 @@
 import os
 import subprocess
 import shutil
+import signal
+import tempfile
+import threading
+import time
+import numpy as np
+
+import ngspice_pool
+import ngspice_shared
+import warm_start
+from rawfile import RawFile
+from run_diagnostics import RunDiagnostics
+from run_directory import RunDirectory
+from run_limits import RunLimits, SimulationError, SimulationTimeout, POLL_INTERVAL
+from spice_script import SpiceScript
+from stage_timer import StageTimer
 
 RUN_ENABLED = True
 
-def run(script_name):
-    """Executes the ngspice simulation script using 'ngspice_con' command."""
+# Simulator backend: 'Subprocess' runs 'ngspice_con -b' for every run,
+# 'Pool' keeps an interactive 'ngspice_con' worker per script,
+# 'Shared' keeps the circuit resident in the ngspice shared library.
+# The subprocess backend is used as a fallback when the others fail.
+BACKEND = 'Subprocess'
+BACKENDS = ['Subprocess', 'Pool', 'Shared']
+
+# Format of the result written by the subprocess backend: 'Text' keeps the
+# script's 'wrdata', 'Binary' replaces it with a binary rawfile 'write'
+OUTPUT_FORMAT = 'Text'
+OUTPUT_FORMATS = ['Text', 'Binary']
+
+def showsPreview(backend=None):
+    """Returns True if the runs of the backend write a preview of their
+    result while they go on. Only the resident circuits of the shared library
+    can be looked into; ngspice_con writes its result when it is done."""
+    return (backend or BACKEND) == 'Shared' and ngspice_shared.available()
+
+
+def run(script_name, limits=None, output=None, netlist=None):
+    """Executes the ngspice simulation script using 'ngspice_con' command.
+    If `netlist` is given, it is sent to ngspice over stdin instead of reading
+    the script file, which then only sets the working directory.
+    Raises SimulationTimeout or SimulationCancelled if the process had to be
+    killed because of `limits`. The lines printed by ngspice are appended to
+    the list `output`, if given."""
     if not RUN_ENABLED:
         return False
 
@@ -28,17 +67,182 @@ def run(script_name):
         print("Error: 'ngspice_con' command not found. Please check your system PATH.")
         return False
 
+    limits = limits or RunLimits()
+    limits.start()
+
     working_dir = os.path.dirname(os.path.abspath(script_name))
-    try:
-        # Run 'ngspice_con' command in batch mode
-        subprocess.run(['ngspice_con', '-b', os.path.basename(script_name)],\
+
+    # Run 'ngspice_con' command in batch mode. The output goes to a temporary
+    # file rather than a pipe, so that a chatty run cannot block on a full pipe
+    command = ['ngspice_con', '-b']
+    if netlist is None:
+        command.append(os.path.basename(script_name))
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(command,\
                 cwd=working_dir,\
-                stdout=subprocess.DEVNULL,\
-                stderr=subprocess.DEVNULL,\
-                check=True) # Raises CalledProcessError if returncode != 0
-        return True
+                stdin=subprocess.DEVNULL if netlist is None else subprocess.PIPE,\
+                stdout=log,\
+                stderr=subprocess.STDOUT,\
+                preexec_fn=limits.preexec())
+        if netlist is not None:
+            # Fed on a separate thread, so that the limits are checked even
+            # if ngspice stops reading
+            threading.Thread(target=_feed, args=(process.stdin, netlist), daemon=True).start()
+        try:
+            while True:
+                try:
+                    returncode = process.wait(POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    limits.check()
+        except SimulationError:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            if output is not None:
+                log.seek(0)
+                output.extend(log.read().decode('utf-8', errors='replace').splitlines())
 
-    except subprocess.CalledProcessError as e:
+    if returncode != 0:
+        if returncode == -getattr(signal, 'SIGXCPU', 0):
+            raise SimulationTimeout(f'CPU time limit of {limits.cpuTime():g} s exceeded')
         print("Error: ngspice_con failed to execute properly.")
-        print("Return code:", e.returncode)
+        print("Return code:", returncode)
         return False
+    return True
+
+
+def _feed(stdin, netlist):
+    try:
+        stdin.write(netlist.encode('utf-8'))
+        stdin.close()
+    except OSError:
+        pass # ngspice exited before reading all of it
+
+
+def simulate(script_name, param_dict, backend=None, output_format=None, limits=None,\
+        chunk=None, nodeset=None, preview_file=None):
+    """Runs the script with the given parameters and returns a tuple of the
+    result data as a two-dimensional array (None if the simulation failed)
+    and the RunDiagnostics of the run.
+
+    `backend` and `output_format` override BACKEND and OUTPUT_FORMAT, which
+    is needed in worker processes that do not share the module state.
+    `limits` is a RunLimits; SimulationError is raised if it stops the run,
+    with the diagnostics gathered so far in its `diagnostics` attribute.
+    `chunk`, an (index, count) tuple, runs only that chunk of the sweep of
+    the script (see sweep_partition), always as a subprocess.
+    `nodeset`, a dict of node voltages, possibly empty, turns on the warm start
+    of the subprocess backend: the run starts from these voltages and falls
+    back to a cold start if it does not converge. A cold start prints its
+    operating point for the next run (see warm_start). The other backends
+    ignore it and say so in the output.
+    `preview_file` receives the part of the result computed so far while the
+    shared library backend runs (see run_directory.writePreview and
+    showsPreview()); the other backends ignore it."""
+    if not RUN_ENABLED:
+        return None, None
+
+    # The timer is started once, so that a fallback does not extend the timeout
+    limits = limits or RunLimits()
+    limits.start()
+
+    output = []
+    timer = StageTimer()
+    start_time = time.perf_counter()
+    backend = backend or BACKEND
+    try:
+        data, backend = _simulate(script_name, param_dict, backend,\
+                output_format or OUTPUT_FORMAT, limits, output, timer, chunk, nodeset,\
+                preview_file)
+    except SimulationError as e:
+        e.diagnostics = RunDiagnostics(output, time.perf_counter() - start_time,\
+                backend, timer.stages())
+        raise
+    return data, RunDiagnostics(output, time.perf_counter() - start_time,\
+            backend, timer.stages())
+
+
+def _simulate(script_name, param_dict, backend, output_format, limits, output, timer,\
+        chunk=None, nodeset=None, preview_file=None):
+    """Returns the result data and the backend that actually produced it."""
+    if chunk is not None:
+        # The resident circuits of the other backends run the whole sweep
+        backend = 'Subprocess'
+
+    if backend == 'Shared' and ngspice_shared.available():
+        with timer.measure('Simulate'):
+            data = ngspice_shared.run(script_name, param_dict, limits, output, preview_file)
+        if data is not None:
+            _ignoredNodeset(nodeset, backend, output)
+            return data, backend
+        print("Warning: falling back to 'ngspice_con' subprocess.")
+
+    if backend == 'Pool':
+        # The worker writes "model.txt" itself, only when it reloads the circuit
+        with timer.measure('Simulate'):
+            success = ngspice_pool.run(script_name, param_dict, limits, output)
+        if success:
+            _ignoredNodeset(nodeset, backend, output)
+            root, ext = os.path.splitext(script_name)
+            with timer.measure('Load Result'):
+                return loadResult(root + '.txt'), backend
+        print("Warning: falling back to 'ngspice_con' subprocess.")
+
+    # Run the netlist built in memory in its own scratch directory, so that
+    # concurrent runs neither race on "model.txt" nor write to the scripts folder
+    binary = output_format == 'Binary'
+    start = len(output)
+    data = _runStaged(script_name, param_dict, binary, limits, output, timer, chunk, nodeset)
+    if nodeset and (data is None or not warm_start.converged(output[start:])):
+        output.append('Warning: the warm start did not converge, running again from a cold start.')
+        data = _runStaged(script_name, param_dict, binary, limits, output, timer, chunk, {})
+    return data, 'Subprocess'
+
+
+def _ignoredNodeset(nodeset, backend, output):
+    if nodeset is not None:
+        output.append(f"Warning: the warm start is not applied by the '{backend}' backend.")
+
+
+def _runStaged(script_name, param_dict, binary, limits, output, timer, chunk=None,\
+        nodeset=None):
+    """Runs the script in a RunDirectory and returns the result data."""
+    try:
+        with timer.measure('Stage Script'):
+            run_dir = RunDirectory(script_name, param_dict, binary, chunk, nodeset)
+        with run_dir:
+            with timer.measure('Simulate'):
+                success = run(run_dir.scriptFile(), limits, output, run_dir.netlist())
+            if not success:
+                return None
+
+            with timer.measure('Load Result'):
+                if binary:
+                    single_scale = SpiceScript(script_name).singleScale()
+                    return loadRawResult(run_dir.resultFile(), single_scale)
+
+                # Load the result written by 'wrdata'
+                return loadResult(run_dir.resultFile())
+
+    except (OSError, ValueError) as e:
+        print(f"Error: failed to prepare the run directory: {e}")
+        return None
+
+
+def loadResult(file_name):
+    try:
+        return np.loadtxt(file_name, ndmin=2)
+    except Exception as e:
+        print(str(e))
+        return None
+
+
+def loadRawResult(file_name, single_scale=True):
+    try:
+        # The file is read once and the vectors are views into that buffer
+        return RawFile(file_name, mmap=False).array(single_scale)
+    except Exception as e:
+        print(str(e))
+        return None
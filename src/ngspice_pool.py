@@ -0,0 +1,329 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import shutil
+import threading
+import queue
+import tempfile
+import atexit
+
+import run_directory
+from parameter_io import ParameterIO, SIMULATION_DIGITS
+from run_diagnostics import STATISTICS_COMMAND
+from run_limits import SimulationError, POLL_INTERVAL
+from spice_script import SpiceScript, includedFile, replaceIncludedFile, inlineParameters
+
+# Line echoed by ngspice after each batch of commands
+DONE_MARKER = 'MODELNGSPICER_DONE'
+
+# Number of workers started in the background at startup
+DEFAULT_WORKERS = 5
+
+# Default limit on the number of 'ngspice_con' processes of the pool
+MAX_WORKERS = os.cpu_count() or 1
+
+
+class NgspiceWorker:
+    """A long-lived interactive 'ngspice_con' process fed with commands over stdin.
+    The circuit stays loaded between runs and only the parameters are altered.
+    When it is reloaded, the netlist is built in memory and sourced from a
+    scratch file of the worker, so nothing is written to the scripts folder."""
+
+
+    def __init__(self):
+        self.__process = None
+        self.__netlist_file = None
+        self.__script = None
+        self.__mtime = None
+        self.__keys = None
+        self.__output = []
+        self.__lock = threading.Lock()
+
+
+    def start(self):
+        command = ['ngspice_con', '-p']
+        if shutil.which('stdbuf'):
+            # Make ngspice flush its output after every line
+            command = ['stdbuf', '-oL'] + command
+        self.__process = subprocess.Popen(command,\
+                stdin=subprocess.PIPE,\
+                stdout=subprocess.PIPE,\
+                stderr=subprocess.STDOUT,\
+                text=True,\
+                bufsize=1)
+
+        # Output is read on a separate thread so that waiting for it can time out
+        self.__lines = queue.Queue()
+        threading.Thread(target=self.__readLines, args=(self.__process, self.__lines),\
+                daemon=True).start()
+        self.execute(['set noaskquit'])
+
+
+    @staticmethod
+    def __readLines(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None) # End of output
+
+
+    def alive(self):
+        return self.__process is not None and self.__process.poll() is None
+
+
+    def stop(self):
+        if self.__netlist_file is not None:
+            try:
+                os.remove(self.__netlist_file)
+            except OSError:
+                pass
+            self.__netlist_file = None
+        if not self.alive():
+            return
+        try:
+            self.__process.stdin.write('quit\n')
+            self.__process.stdin.flush()
+            self.__process.wait(1.0)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+
+    def kill(self):
+        if self.__process is not None:
+            self.__process.kill()
+            self.__process.wait()
+        self.__script = None
+
+
+    def output(self):
+        return list(self.__output)
+
+
+    def execute(self, commands, limits=None):
+        """Sends the commands and blocks until ngspice has processed all of them.
+        The process is killed if `limits` stops the run."""
+        process = self.__process
+        process.stdin.write('\n'.join(commands + [f'echo {DONE_MARKER}']) + '\n')
+        process.stdin.flush()
+
+        self.__output = []
+        while True:
+            try:
+                line = self.__lines.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if limits is not None:
+                    try:
+                        limits.check()
+                    except SimulationError:
+                        self.kill()
+                        raise
+                continue
+
+            if line is None:
+                break
+            line = line.strip()
+            if line.endswith(DONE_MARKER) and not line.endswith('echo ' + DONE_MARKER):
+                return True
+            self.__output.append(line)
+        return False # ngspice exited before finishing
+
+
+    def run(self, script_name, param_dict, limits=None):
+        """Runs the script, reloading the circuit only if the script itself changed."""
+        with self.__lock:
+            return self.__run(script_name, param_dict, limits)
+
+
+    def __run(self, script_name, param_dict, limits):
+        script_name = os.path.abspath(script_name)
+        mtime = os.path.getmtime(script_name)
+        keys = tuple(param_dict.keys())
+
+        if self.__script is None or self.__script.fileName() != script_name\
+                or self.__mtime != mtime or self.__keys != keys:
+            # Source the netlist with the parameters in place of "model.txt",
+            # which also runs its .control section
+            self.__script = SpiceScript(script_name)
+            working_dir = self.__script.workingDir()
+            if self.__netlist_file is None:
+                runs_dir = os.path.join(run_directory.baseDir(), 'runs')
+                os.makedirs(runs_dir, exist_ok=True)
+                fd, self.__netlist_file = tempfile.mkstemp(prefix='pool-', suffix='.cir',\
+                        dir=runs_dir)
+                os.close(fd)
+            with open(self.__netlist_file, 'w') as f:
+                f.write('\n'.join(self.netlist(param_dict)) + '\n')
+            commands = ['destroy all', 'remcirc',\
+                    f'cd "{working_dir}"', f'source "{self.__netlist_file}"']
+            self.__mtime, self.__keys = mtime, keys
+        else:
+            commands = ['destroy all'] + self.alterCommands(param_dict)
+            commands += [c for c in self.__script.controlLines()\
+                    if c.split()[0].lower() not in ['quit', 'exit']]
+        commands.append(STATISTICS_COMMAND)
+
+        if not self.execute(commands, limits):
+            self.__script = None
+            return False
+        return True
+
+
+    def netlist(self, param_dict):
+        """Returns the lines of the script with the parameter block written in
+        place of the include. The other includes are made absolute, as the
+        netlist is sourced from outside of the scripts folder."""
+        working_dir = self.__script.workingDir()
+        lines = []
+        for line in inlineParameters(self.__script.lines(), ParameterIO().lines(param_dict, SIMULATION_DIGITS)):
+            file_name = includedFile(line)
+            if file_name is not None:
+                path = os.path.normpath(os.path.join(working_dir, file_name))
+                line = replaceIncludedFile(line, path.replace('\\', '/'))
+            lines.append(line)
+        return lines
+
+
+    def alterCommands(self, param_dict):
+        commands = []
+        reset = False
+        for kind, name in self.__script.parameterBlocks():
+            if kind == 'model':
+                assignments = ' '.join(f'{key}={value:.{SIMULATION_DIGITS}E}' for key, value in param_dict.items())
+                commands.append(f'altermod {name} {assignments}')
+            else:
+                commands += [f'alterparam {key}={value:.{SIMULATION_DIGITS}E}' for key, value in param_dict.items()]
+                reset = True
+        if reset:
+            commands.append('reset')
+        return commands
+
+
+class NgspiceWorkerPool:
+    """Keeps one worker per script, so that the circuit of a page stays loaded
+    in the same process. Idle workers are started in the background so that
+    no process launch is needed when a page runs for the first time. At most
+    `maxWorkers()` processes are kept; beyond that, the least recently used
+    worker is handed over to the new script, which reloads it."""
+
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__idle = []
+        self.__workers = {} # Worker of each script, least recently used first
+        self.__max_workers = MAX_WORKERS
+
+
+    def maxWorkers(self):
+        return self.__max_workers
+
+
+    def setMaxWorkers(self, value):
+        if not isinstance(value, int) or value < 1:
+            raise ValueError("setMaxWorkers(): `value` must be a positive integer.")
+        with self.__lock:
+            self.__max_workers = value
+            surplus = len(self.__idle) + len(self.__workers) - value
+            stopped = self.__idle[:max(surplus, 0)]
+            self.__idle = self.__idle[len(stopped):]
+        for worker in stopped:
+            worker.stop()
+
+
+    def startWorkers(self, count=DEFAULT_WORKERS):
+        def start():
+            for _ in range(count):
+                with self.__lock:
+                    if len(self.__idle) + len(self.__workers) >= self.__max_workers:
+                        return
+                worker = NgspiceWorker()
+                try:
+                    worker.start()
+                except OSError as e:
+                    print(f"Error: failed to start 'ngspice_con' worker: {e}")
+                    return
+                with self.__lock:
+                    self.__idle.append(worker)
+
+        if shutil.which('ngspice_con') is None:
+            return
+        threading.Thread(target=start, daemon=True).start()
+
+
+    def worker(self, key):
+        with self.__lock:
+            worker = self.__workers.pop(key, None)
+            if worker is None:
+                if self.__idle:
+                    worker = self.__idle.pop()
+                elif self.__workers and len(self.__workers) >= self.__max_workers:
+                    worker = self.__workers.pop(next(iter(self.__workers)))
+            if worker is not None and worker.alive():
+                self.__workers[key] = worker
+                return worker
+
+        if worker is None or not worker.alive():
+            worker = NgspiceWorker()
+            worker.start()
+        with self.__lock:
+            self.__workers[key] = worker
+        return worker
+
+
+    def shutdown(self):
+        with self.__lock:
+            workers = self.__idle + list(self.__workers.values())
+            self.__idle, self.__workers = [], {}
+        for worker in workers:
+            worker.stop()
+
+
+_pool = NgspiceWorkerPool()
+atexit.register(_pool.shutdown)
+
+
+def startWorkers(count=DEFAULT_WORKERS):
+    _pool.startWorkers(count)
+
+
+def setMaxWorkers(value):
+    _pool.setMaxWorkers(value)
+
+
+def run(script_name, param_dict, limits=None, output=None):
+    """Runs the script in the persistent worker assigned to it.
+    Raises SimulationError if the run is stopped by `limits`. The lines
+    printed by ngspice are appended to the list `output`, if given."""
+    if shutil.which('ngspice_con') is None:
+        print("Error: 'ngspice_con' command not found. Please check your system PATH.")
+        return False
+
+    key = os.path.abspath(script_name)
+    try:
+        worker = _pool.worker(key)
+        try:
+            if worker.run(script_name, param_dict, limits):
+                return True
+        finally:
+            if output is not None:
+                output.extend(worker.output())
+        print("Error: ngspice_con worker terminated unexpectedly.")
+    except OSError as e:
+        print(f"Error: ngspice_con worker failed: {e}")
+    return False
+
+
+def shutdown():
+    _pool.shutdown()
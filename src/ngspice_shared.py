@@ -0,0 +1,592 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import ctypes
+import ctypes.util
+import multiprocessing
+import platform
+import time
+import numpy as np
+
+import run_directory
+from parameter_io import ParameterIO, SIMULATION_DIGITS
+from run_diagnostics import STATISTICS_COMMAND
+from run_limits import RunLimits, SimulationError, POLL_INTERVAL
+from spice_script import SpiceScript, inlineParameters
+
+# Environment variable to override the location of the ngspice shared library
+LIBRARY_ENV = 'NGSPICE_LIBRARY_PATH'
+
+# Prefix of the vectors created in place of the 'wrdata' command
+OUTPUT_VECTOR = 'modelngspicer_out'
+
+# Candidate names of the default scale vector of an analysis plot
+SCALE_NAMES = ['time', 'frequency', 'v-sweep', 'i-sweep', 'temp-sweep', 'res-sweep']
+
+# Plot type of each scale vector, to match 'wrdata' expressions such as 'dc2.i(VID)'
+SCALE_TYPES = {'time':'tran', 'frequency':'ac', 'v-sweep':'dc', 'i-sweep':'dc',\
+        'temp-sweep':'dc', 'res-sweep':'dc'}
+
+# Seconds between two previews of the result sent while the analyses run
+PREVIEW_INTERVAL = 0.2
+
+# Flags of vector_info.v_flags
+VF_REAL = 1
+VF_COMPLEX = 2
+
+
+class _NgComplex(ctypes.Structure):
+    _fields_ = [('cx_real', ctypes.c_double), ('cx_imag', ctypes.c_double)]
+
+
+class _VecValues(ctypes.Structure):
+    _fields_ = [\
+            ('name', ctypes.c_char_p),\
+            ('creal', ctypes.c_double),\
+            ('cimag', ctypes.c_double),\
+            ('is_scale', ctypes.c_bool),\
+            ('is_complex', ctypes.c_bool),\
+            ]
+
+
+class _VecValuesAll(ctypes.Structure):
+    _fields_ = [\
+            ('veccount', ctypes.c_int),\
+            ('vecindex', ctypes.c_int),\
+            ('vecsa', ctypes.POINTER(ctypes.POINTER(_VecValues))),\
+            ]
+
+
+class _VectorInfo(ctypes.Structure):
+    _fields_ = [\
+            ('v_name', ctypes.c_char_p),\
+            ('v_type', ctypes.c_int),\
+            ('v_flags', ctypes.c_short),\
+            ('v_realdata', ctypes.POINTER(ctypes.c_double)),\
+            ('v_compdata', ctypes.POINTER(_NgComplex)),\
+            ('v_length', ctypes.c_int),\
+            ]
+
+
+# Callback prototypes of ngSpice_Init()
+_SendChar = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p)
+_SendStat = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p)
+_ControlledExit = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_bool, ctypes.c_bool,\
+        ctypes.c_int, ctypes.c_void_p)
+_SendData = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_void_p)
+_SendInitData = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p)
+_BGThreadRunning = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_bool, ctypes.c_int, ctypes.c_void_p)
+
+
+def findLibrary():
+    """Returns the path of the ngspice shared library, or None if not found."""
+    path = os.environ.get(LIBRARY_ENV)
+    if path:
+        return path if os.path.isfile(path) else None
+
+    for name in ['ngspice', 'ngspice-0', 'libngspice-0']:
+        path = ctypes.util.find_library(name)
+        if path:
+            return path
+
+    if platform.system() == 'Windows':
+        return None
+    for path in ['/usr/lib/libngspice.so', '/usr/local/lib/libngspice.so',\
+            '/opt/homebrew/lib/libngspice.dylib', '/usr/local/lib/libngspice.dylib']:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def available():
+    return findLibrary() is not None
+
+
+def vectorKey(name):
+    """Returns the name of a vector in a single form: 'node' for 'v(node)'
+    and 'source#branch' for 'i(source)'."""
+    name = name.strip().lower()
+    m = re.fullmatch(r'([vi])\(\s*([^()\s]+)\s*\)', name)
+    if not m:
+        return name
+    return m.group(2) if m.group(1) == 'v' else m.group(2) + '#branch'
+
+
+class NgspiceShared:
+    """Thin ctypes wrapper around the ngspice shared library API."""
+
+
+    def __init__(self, library_path):
+        self.__lib = ctypes.CDLL(library_path)
+        self.__output = []
+        self.__exited = False
+        self.__stream = None
+
+        lib = self.__lib
+        lib.ngSpice_Init.argtypes = [_SendChar, _SendStat, _ControlledExit,\
+                _SendData, _SendInitData, _BGThreadRunning, ctypes.c_void_p]
+        lib.ngSpice_Init.restype = ctypes.c_int
+        lib.ngSpice_Command.argtypes = [ctypes.c_char_p]
+        lib.ngSpice_Command.restype = ctypes.c_int
+        lib.ngSpice_Circ.argtypes = [ctypes.POINTER(ctypes.c_char_p)]
+        lib.ngSpice_Circ.restype = ctypes.c_int
+        lib.ngGet_Vec_Info.argtypes = [ctypes.c_char_p]
+        lib.ngGet_Vec_Info.restype = ctypes.POINTER(_VectorInfo)
+        lib.ngSpice_CurPlot.argtypes = []
+        lib.ngSpice_CurPlot.restype = ctypes.c_char_p
+        lib.ngSpice_AllVecs.argtypes = [ctypes.c_char_p]
+        lib.ngSpice_AllVecs.restype = ctypes.POINTER(ctypes.c_char_p)
+
+        # Keep references to the callbacks, otherwise they are garbage collected
+        self.__callbacks = [\
+                _SendChar(self.__sendChar),\
+                _SendStat(lambda text, id_, user: 0),\
+                _ControlledExit(self.__controlledExit),\
+                _SendData(self.__sendData),\
+                _SendInitData(self.__sendInitData),\
+                _BGThreadRunning(lambda running, id_, user: 0),\
+                ]
+        lib.ngSpice_Init(*self.__callbacks, None)
+
+
+    def __sendChar(self, text, id_, user):
+        line = text.decode('utf-8', errors='replace') if text else ''
+        # ngspice prefixes each line with 'stdout ' or 'stderr '
+        self.__output.append(line.split(' ', 1)[-1])
+        return 0
+
+
+    def __controlledExit(self, status, unload, quit_, id_, user):
+        self.__exited = True
+        return 0
+
+
+    def __sendInitData(self, data, id_, user):
+        if self.__stream is not None:
+            self.__stream.begin()
+        return 0
+
+
+    def __sendData(self, data, count, id_, user):
+        if self.__stream is not None and data:
+            self.__stream.add(ctypes.cast(data, ctypes.POINTER(_VecValuesAll)).contents)
+        return 0
+
+
+    def exited(self):
+        return self.__exited
+
+
+    def setStream(self, stream):
+        """Sets the _Stream receiving the points of the running analyses, or None."""
+        self.__stream = stream
+
+
+    def output(self):
+        return list(self.__output)
+
+
+    def clearOutput(self):
+        self.__output.clear()
+
+
+    def command(self, command):
+        return self.__lib.ngSpice_Command(command.encode('utf-8')) == 0
+
+
+    def circuit(self, lines):
+        """Loads a circuit given as a list of netlist lines."""
+        array = (ctypes.c_char_p * (len(lines) + 1))()
+        array[:-1] = [line.encode('utf-8') for line in lines]
+        array[-1] = None
+        return self.__lib.ngSpice_Circ(array) == 0
+
+
+    def currentPlot(self):
+        name = self.__lib.ngSpice_CurPlot()
+        return name.decode('utf-8') if name else ''
+
+
+    def allVectors(self, plot):
+        names = self.__lib.ngSpice_AllVecs(plot.encode('utf-8'))
+        result = []
+        i = 0
+        while names and names[i]:
+            result.append(names[i].decode('utf-8'))
+            i += 1
+        return result
+
+
+    def vector(self, name):
+        """Returns a copy of the vector as a NumPy array, or None if not found."""
+        pointer = self.__lib.ngGet_Vec_Info(name.encode('utf-8'))
+        if not pointer:
+            return None
+        info = pointer.contents
+        length = info.v_length
+        if length <= 0:
+            return np.empty(0)
+        if info.v_flags & VF_COMPLEX and info.v_compdata:
+            raw = ctypes.cast(info.v_compdata, ctypes.POINTER(ctypes.c_double))
+            return np.ctypeslib.as_array(raw, shape=(2 * length,)).copy().view(np.complex128)
+        if info.v_realdata:
+            return np.ctypeslib.as_array(info.v_realdata, shape=(length,)).copy()
+        return None
+
+
+class _Stream:
+    """Collects the points of the result vectors sent by ngspice while the
+    analyses run, and sends a preview of the result every PREVIEW_INTERVAL
+    seconds. The preview has a pair of x and y columns per curve, padded with
+    NaN, so that the curves of analyses of different lengths fit together.
+    Only the 'wrdata' expressions naming a vector are previewed."""
+
+
+    def __init__(self, statement, send):
+        self.__send = send
+        self.__columns = [] # (plot type, plot number, vector) of each expression
+        for expression in statement[1]:
+            m = re.match(r'^([a-zA-Z]+)([0-9]+)\.(.+)$', expression)
+            if m:
+                self.__columns.append((m.group(1).lower(), int(m.group(2)), vectorKey(m.group(3))))
+            else:
+                self.__columns.append((None, 0, vectorKey(expression)))
+        self.__curves = {}    # Column -> (x, real, imaginary, complex)
+        self.__counts = {}    # Number of analyses run so far of each plot type
+        self.__mapping = None # (vector index, column, complex) of the running analysis
+        self.__scale = None
+        self.__sent = time.perf_counter()
+
+
+    def begin(self):
+        """Starts a new analysis."""
+        self.__mapping = None
+
+
+    def __map(self, values):
+        """Finds the vectors of the expressions among those of the analysis."""
+        names = []
+        self.__scale = None
+        for i in range(values.veccount):
+            vector = values.vecsa[i].contents
+            names.append(vectorKey((vector.name or b'').decode('utf-8', errors='replace')))
+            if vector.is_scale and self.__scale is None:
+                self.__scale = i
+        self.__mapping = []
+        if self.__scale is None:
+            return
+
+        kind = SCALE_TYPES.get(names[self.__scale])
+        number = self.__counts[kind] = self.__counts.get(kind, 0) + 1
+        for column, (plot_type, plot_number, key) in enumerate(self.__columns):
+            if plot_type is not None and (plot_type != kind or plot_number != number):
+                continue
+            if key in names:
+                index = names.index(key)
+                is_complex = bool(values.vecsa[index].contents.is_complex)
+                self.__mapping.append((index, column, is_complex))
+                self.__curves[column] = ([], [], [], is_complex)
+
+
+    def add(self, values):
+        """Adds the point of an analysis sent by ngspice."""
+        if self.__mapping is None:
+            self.__map(values)
+        if not self.__mapping:
+            return
+
+        x = values.vecsa[self.__scale].contents.creal
+        for index, column, is_complex in self.__mapping:
+            vector = values.vecsa[index].contents
+            curve = self.__curves[column]
+            curve[0].append(x)
+            curve[1].append(vector.creal)
+            curve[2].append(vector.cimag)
+
+        now = time.perf_counter()
+        if now - self.__sent >= PREVIEW_INTERVAL:
+            self.__sent = now
+            self.__send(self.preview())
+
+
+    def preview(self):
+        pairs = []
+        for column in sorted(self.__curves):
+            x, real, imaginary, is_complex = self.__curves[column]
+            pairs.append((x, real))
+            if is_complex:
+                pairs.append((x, imaginary))
+        length = max((len(x) for x, y in pairs), default=0)
+        preview = np.full((length, 2 * len(pairs)), np.nan)
+        for i, (x, y) in enumerate(pairs):
+            preview[:len(x), 2 * i] = x
+            preview[:len(y), 2 * i + 1] = y
+        return preview
+
+
+class _ResidentCircuit:
+    """Keeps one script loaded in ngspice and reruns it with new parameters."""
+
+
+    def __init__(self, ngspice):
+        self.__ngspice = ngspice
+        self.__script = None
+        self.__mtime = None
+        self.__keys = None
+
+
+    def run(self, script_name, param_dict, send=None):
+        """Runs the script and returns the result data. If `send` is given,
+        previews of the result are passed to it while the analyses run."""
+        script_name = os.path.abspath(script_name)
+        mtime = os.path.getmtime(script_name)
+        keys = tuple(param_dict.keys())
+
+        ngspice = self.__ngspice
+        ngspice.clearOutput()
+        ngspice.command('destroy all')
+
+        if self.__script is None or self.__script.fileName() != script_name\
+                or self.__mtime != mtime or self.__keys != keys:
+            self.load(script_name, param_dict)
+            self.__mtime, self.__keys = mtime, keys
+        else:
+            self.alter(param_dict)
+
+        # Run the .control section with the result 'wrdata' replaced
+        statement = self.resultStatement()
+        if send is not None and statement:
+            ngspice.setStream(_Stream(statement, send))
+        try:
+            for command in self.__script.controlLines():
+                fields = command.split()
+                if statement and fields[0].lower() == 'wrdata' and len(fields) > 1\
+                        and fields[1] == statement[0]:
+                    for i, expression in enumerate(statement[1]):
+                        ngspice.command(f'let {OUTPUT_VECTOR}{i} = {expression}')
+                elif fields[0].lower() not in ['quit', 'exit']:
+                    ngspice.command(command)
+        finally:
+            ngspice.setStream(None)
+        ngspice.command(STATISTICS_COMMAND)
+
+        return self.collect(statement)
+
+
+    def load(self, script_name, param_dict):
+        """Loads the circuit built in memory, with the parameter block written
+        in place of the include, through ngSpice_Circ()."""
+        self.__script = SpiceScript(script_name)
+        os.chdir(self.__script.workingDir())
+        lines = inlineParameters(self.__script.circuitLines(), ParameterIO().lines(param_dict, SIMULATION_DIGITS))
+
+        self.__ngspice.command('remcirc')
+        if not self.__ngspice.circuit(lines):
+            raise RuntimeError(f"ngspice failed to load '{script_name}'")
+
+
+    def alter(self, param_dict):
+        """Applies new parameter values to the resident circuit."""
+        reset = False
+        for kind, name in self.__script.parameterBlocks():
+            if kind == 'model':
+                assignments = ' '.join(f'{key}={value:.{SIMULATION_DIGITS}E}' for key, value in param_dict.items())
+                self.__ngspice.command(f'altermod {name} {assignments}')
+            else:
+                for key, value in param_dict.items():
+                    self.__ngspice.command(f'alterparam {key}={value:.{SIMULATION_DIGITS}E}')
+                reset = True
+        if reset:
+            self.__ngspice.command('reset')
+
+
+    def resultStatement(self):
+        """Returns the 'wrdata' statement that writes the result file."""
+        statements = self.__script.wrdataStatements()
+        result_name = os.path.basename(self.__script.resultFile())
+        for statement in statements:
+            if os.path.basename(statement[0]) == result_name:
+                return statement
+        return statements[-1] if statements else None
+
+
+    def collect(self, statement):
+        """Builds the result array laid out in the same way as 'wrdata'."""
+        if not statement:
+            return None
+
+        ngspice = self.__ngspice
+        setscale_map = self.__script.setscaleMap()
+        single_scale = self.__script.singleScale()
+        columns = []
+        for i, expression in enumerate(statement[1]):
+            y = ngspice.vector(f'{OUTPUT_VECTOR}{i}')
+            if y is None:
+                raise RuntimeError(f"ngspice did not return the vector '{expression}'")
+            if not columns or not single_scale:
+                x = self.scale(expression, setscale_map)
+                if x is None:
+                    raise RuntimeError(f"Failed to find the scale of '{expression}'")
+                columns.append(x.real)
+            if np.iscomplexobj(y):
+                columns.extend([y.real, y.imag])
+            else:
+                columns.append(y)
+
+        length = min(len(c) for c in columns)
+        return np.column_stack([c[:length] for c in columns])
+
+
+    def scale(self, expression, setscale_map):
+        """Returns the scale vector belonging to a 'wrdata' expression."""
+        ngspice = self.__ngspice
+        m = re.match(r'^([a-zA-Z]+[0-9]+)\.(.+)$', expression)
+        plot, name = (m.group(1), m.group(2)) if m else (ngspice.currentPlot(), expression)
+
+        if name.lower() in setscale_map:
+            return ngspice.vector(setscale_map[name.lower()])
+
+        vectors = [v.lower() for v in ngspice.allVectors(plot)]
+        for scale_name in SCALE_NAMES:
+            if scale_name in vectors:
+                return ngspice.vector(f'{plot}.{scale_name}')
+        return None
+
+
+def _serve(conn, library_path):
+    """Entry point of the child process hosting the ngspice shared library."""
+    ngspice = NgspiceShared(library_path)
+    circuit = _ResidentCircuit(ngspice)
+    while not ngspice.exited():
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message[0] == 'quit':
+            break
+        # Previews are sent while the run goes on, if asked for
+        send = (lambda preview: conn.send(('preview', preview))) if message[3] else None
+        try:
+            data = circuit.run(message[1], message[2], send)
+            conn.send(('ok', data, ngspice.output()))
+        except Exception as e:
+            conn.send(('error', str(e), ngspice.output()))
+
+
+class _Host:
+    """Owns the child process so that a crash in the library cannot take
+    down the GUI. A dead child is restarted on the next request."""
+
+
+    def __init__(self):
+        self.__process = None
+        self.__conn = None
+
+
+    def alive(self):
+        return self.__process is not None and self.__process.is_alive()
+
+
+    def start(self, library_path):
+        context = multiprocessing.get_context('spawn')
+        self.__conn, child_conn = context.Pipe()
+        self.__process = context.Process(target=_serve,\
+                args=(child_conn, library_path), daemon=True)
+        self.__process.start()
+        child_conn.close()
+
+
+    def stop(self):
+        if self.alive():
+            try:
+                self.__conn.send(('quit',))
+            except (BrokenPipeError, OSError):
+                pass
+            self.__process.join(1.0)
+            if self.__process.is_alive():
+                self.__process.kill()
+        self.__process = None
+        self.__conn = None
+
+
+    def kill(self):
+        if self.__process is not None:
+            self.__process.kill()
+            self.__process.join()
+        self.__process = None
+        self.__conn = None
+
+
+    def request(self, script_name, param_dict, limits, preview=None):
+        """Runs the script in the child process and returns its reply. The
+        previews of the result sent meanwhile are passed to `preview`."""
+        self.__conn.send(('run', script_name, dict(param_dict), preview is not None))
+        while True:
+            if self.__conn.poll(POLL_INTERVAL):
+                reply = self.__conn.recv()
+                if reply[0] != 'preview':
+                    return reply
+                preview(reply[1])
+            try:
+                limits.check()
+            except SimulationError:
+                # ngspice cannot be interrupted from outside, so the whole
+                # process is killed and restarted on the next request
+                self.kill()
+                raise
+
+
+_host = _Host()
+
+
+def run(script_name, param_dict, limits=None, output=None, preview_file=None):
+    """Runs the script in the shared library and returns the result data,
+    or None if the run failed. Raises SimulationError if stopped by `limits`.
+    The lines printed by ngspice are appended to the list `output`, if given.
+    If `preview_file` is given, the part of the result computed so far is
+    written to it while the analyses run (see run_directory.writePreview)."""
+    library_path = findLibrary()
+    if library_path is None:
+        print("Error: ngspice shared library not found. "\
+                f"Set {LIBRARY_ENV} or install libngspice.")
+        return None
+
+    try:
+        if not _host.alive():
+            _host.start(library_path)
+        limits = limits or RunLimits()
+        limits.start()
+        preview = None
+        if preview_file:
+            preview = lambda data: run_directory.writePreview(preview_file, data)
+        status, value, lines = _host.request(script_name, param_dict, limits, preview)
+        if output is not None:
+            output.extend(lines)
+
+    except (EOFError, BrokenPipeError, OSError) as e:
+        print(f"Error: ngspice shared library process terminated unexpectedly: {e}")
+        _host.stop()
+        return None
+
+    if status != 'ok':
+        print(f"Error: ngspice shared library failed to run '{script_name}': {value}")
+        return None
+    return value
+
+
+def shutdown():
+    _host.stop()
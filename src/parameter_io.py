@@ -15,13 +15,26 @@
 
 import re
 
+# Digits after the point of the values written for a simulation and saved
+# to files. The tables show 3, but a run must see the small steps of a
+# sensitivity or a fit, which 3 digits would round away, and a saved fit
+# must be reproduced when it is loaded again
+SIMULATION_DIGITS = 12
+
+
 class ParameterIO:
 
+    def lines(self, param_dict, digits=3):
+        """Returns the parameter block as SPICE continuation lines, with
+        `digits` digits after the point."""
+        return ['+ {:s}={:.{}E}'.format(key, value, digits) for key, value in param_dict.items()]
+
+
     def write(self, param_dict, file_name):
         try:
             with open(file_name, 'w') as f:
-                for key, value in param_dict.items():
-                    f.write('+ {:s}={:.3E}\n'.format(key, value))
+                for line in self.lines(param_dict, SIMULATION_DIGITS):
+                    f.write(line + '\n')
         except Exception as e:
             print(f"Error writing parameters to '{file_name}': {e}")
 
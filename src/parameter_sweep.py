@@ -0,0 +1,127 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import itertools
+import numpy as np
+
+# Distributions of a grid sweep
+GRID_DISTRIBUTIONS = ['Linear', 'Log']
+
+# Distributions of a Monte Carlo sample. 'Normal' and 'Log-normal' are
+# centred at the current value, with `sigma` relative to it
+RANDOM_DISTRIBUTIONS = ['Uniform', 'Log-uniform', 'Normal', 'Log-normal']
+
+# Upper bound of the number of parameter vectors of one sweep
+MAX_SAMPLES = 100000
+
+
+class SweepSpec:
+    """How one parameter is varied in a sweep."""
+
+
+    def __init__(self, name, distribution='Linear', low=0.0, high=1.0, points=5, sigma=0.1):
+        if distribution not in GRID_DISTRIBUTIONS + RANDOM_DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution: {distribution}")
+        if distribution in ['Log', 'Log-uniform'] and (low <= 0 or high <= 0):
+            raise ValueError(f"'{name}': a log range needs positive bounds.")
+        if distribution in GRID_DISTRIBUTIONS and points < 1:
+            raise ValueError(f"'{name}': the number of points must be at least 1.")
+        if distribution in ['Normal', 'Log-normal'] and sigma < 0:
+            raise ValueError(f"'{name}': sigma must be non-negative.")
+        self.__name = name
+        self.__distribution = distribution
+        self.__low = low
+        self.__high = high
+        self.__points = points
+        self.__sigma = sigma
+
+
+    def name(self):
+        return self.__name
+
+
+    def distribution(self):
+        return self.__distribution
+
+
+    def low(self):
+        return self.__low
+
+
+    def high(self):
+        return self.__high
+
+
+    def points(self):
+        return self.__points
+
+
+    def sigma(self):
+        return self.__sigma
+
+
+    def gridValues(self):
+        if self.__distribution == 'Linear':
+            return np.linspace(self.__low, self.__high, self.__points)
+        if self.__distribution == 'Log':
+            return np.geomspace(self.__low, self.__high, self.__points)
+        raise ValueError(f"'{self.__name}': {self.__distribution} is not a grid distribution.")
+
+
+    def sample(self, nominal, rng, count):
+        """Returns `count` random values. Grid distributions are sampled
+        uniformly over their range."""
+        distribution = self.__distribution
+        if distribution in ['Uniform', 'Linear']:
+            return rng.uniform(self.__low, self.__high, count)
+        if distribution in ['Log-uniform', 'Log']:
+            return np.exp(rng.uniform(np.log(self.__low), np.log(self.__high), count))
+        if distribution == 'Normal':
+            return nominal * (1.0 + self.__sigma * rng.standard_normal(count))
+        return nominal * np.exp(self.__sigma * rng.standard_normal(count))
+
+
+def gridSamples(param_dict, specs):
+    """Returns the parameter vectors of the Cartesian product of the grids.
+    Parameters without a spec keep their current value."""
+    grids = [spec.gridValues() for spec in specs]
+    count = int(np.prod([len(grid) for grid in grids])) if grids else 0
+    if count > MAX_SAMPLES:
+        raise ValueError(f"The grid has {count} points, more than {MAX_SAMPLES}.")
+
+    samples = []
+    for values in itertools.product(*grids):
+        sample = dict(param_dict)
+        for spec, value in zip(specs, values):
+            sample[spec.name()] = float(value)
+        samples.append(sample)
+    return samples
+
+
+def monteCarloSamples(param_dict, specs, count, seed=None):
+    """Returns `count` random parameter vectors. The same seed gives the
+    same vectors. Parameters without a spec keep their current value."""
+    if count > MAX_SAMPLES:
+        raise ValueError(f"More than {MAX_SAMPLES} samples requested.")
+    rng = np.random.default_rng(seed)
+    columns = [spec.sample(param_dict.get(spec.name(), 0.0), rng, count) for spec in specs]
+
+    samples = []
+    for i in range(count):
+        sample = dict(param_dict)
+        for spec, column in zip(specs, columns):
+            sample[spec.name()] = float(column[i])
+        samples.append(sample)
+    return samples
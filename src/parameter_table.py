@@ -15,64 +15,209 @@
 
 from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtCore import Signal, Slot, Qt
+from typing import override
 import sys, os
+import numpy as np
 
 from exponential_spinbox import ExponentialSpinBox
 
-class ParameterTable(QtWidgets.QTableWidget):
+# Columns of the table
+NAME, VALUE = 0, 1
 
-    # Signal emitted when a parameter is updated by the user
-    valueChanged = Signal()
+
+class ParameterModel(QtCore.QAbstractTableModel):
+    """Table model of the parameters, kept as a list of names and an array of
+    values beside the parameter dictionary, which it updates on every edit.
+    Rows are looked up by name through a dictionary."""
+
+    # Signal emitted when a parameter is updated by the user, with the name of
+    # the parameter ('' if all parameters may have changed)
+    valueChanged = Signal(str)
 
 
     def __init__(self, param_dict:dict, parent=None):
         super().__init__(parent)
         self.__param_dict = param_dict
+        self.__names = []
+        self.__values = np.zeros(0)
+        self.__rows = {} # name -> row
+
+
+    def reload(self):
+        """Rebuilds the rows from the parameter dictionary."""
+        self.beginResetModel()
+        self.__names = list(self.__param_dict.keys())
+        self.__values = np.array(list(self.__param_dict.values()), dtype=float)
+        self.__rows = {name: row for row, name in enumerate(self.__names)}
+        self.endResetModel()
+
+
+    def row(self, name):
+        """Returns the row of a parameter, or -1."""
+        return self.__rows.get(name, -1)
+
+
+    def setValues(self, values):
+        """Sets the values of existing parameters, looked up by name."""
+        rows = []
+        for key, value in values.items():
+            row = self.__rows.get(key)
+            if row is None:
+                continue
+            self.__param_dict[key] = value
+            self.__values[row] = value
+            rows.append(row)
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), VALUE), self.index(max(rows), VALUE))
+
+
+    @override
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.__names)
+
+
+    @override
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else 2
+
+
+    @override
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ['name', 'value'][section]
+        return super().headerData(section, orientation, role)
+
+
+    @override
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == VALUE:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+
+    @override
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if index.column() == NAME:
+            if role in [Qt.DisplayRole, Qt.ToolTipRole]:
+                return self.__names[row]
+        elif role == Qt.DisplayRole:
+            return '{:.3E}'.format(self.__values[row])
+        elif role == Qt.EditRole:
+            return float(self.__values[row])
+        return None
+
+
+    @override
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or index.column() != VALUE or role != Qt.EditRole:
+            return False
+        row = index.row()
+        if value == self.__values[row]:
+            return True
+        key = self.__names[row]
+        self.__values[row] = value
+        self.__param_dict[key] = value
+        self.dataChanged.emit(index, index)
+        self.valueChanged.emit(key)
+        return True
+
+
+class ValueDelegate(QtWidgets.QStyledItemDelegate):
+    """Edits a parameter value with an ExponentialSpinBox, created only while
+    the cell is being edited. Every step of the spinbox is committed at once,
+    so that the pages are simulated as the value is stepped."""
+
+
+    @override
+    def createEditor(self, parent, option, index):
+        editor = ExponentialSpinBox(parent)
+        editor.setFrame(False)
+        editor.valueChanged.connect(lambda value, editor=editor: self.commitData.emit(editor))
+        return editor
+
+
+    @override
+    def setEditorData(self, editor, index):
+        editor.blockSignals(True)
+        editor.setValue(index.data(Qt.EditRole))
+        editor.blockSignals(False)
+
+
+    @override
+    def setModelData(self, editor, model, index):
+        # Leaving the cell unchanged keeps the digits the spinbox does not show
+        if editor.text() != index.data(Qt.DisplayRole):
+            model.setData(index, editor.value(), Qt.EditRole)
+
+
+class ParameterTable(QtWidgets.QWidget):
+    """Parameter list with a filter by name. The rows are drawn by a
+    QTableView from a ParameterModel, so that a library of thousands of
+    parameters is loaded and edited without a widget per row."""
+
+    # Signal emitted when a parameter is updated by the user, with the name of
+    # the parameter ('' if all parameters may have changed)
+    valueChanged = Signal(str)
+
+
+    def __init__(self, param_dict:dict, parent=None):
+        super().__init__(parent)
+        self.__model = ParameterModel(param_dict, self)
+        self.__model.valueChanged.connect(self.valueChanged)
         self.setupView()
 
 
     def setupView(self):
-        self.clear()
-        
-        # Set header dimensions
-        self.verticalHeader().setMinimumSectionSize(18)
-        self.verticalHeader().setDefaultSectionSize(18)
-        self.horizontalHeader().setFixedHeight(18)
+        # Filter by name
+        self.__filter_edit = QtWidgets.QLineEdit()
+        self.__filter_edit.setPlaceholderText('Filter')
+        self.__filter_edit.setClearButtonEnabled(True)
 
-        # Set column labels and count
-        self.setHorizontalHeaderLabels(['name', 'value'])
-        self.setColumnCount(2)
+        self.__proxy_model = QtCore.QSortFilterProxyModel(self)
+        self.__proxy_model.setSourceModel(self.__model)
+        self.__proxy_model.setFilterKeyColumn(NAME)
+        self.__proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.__filter_edit.textChanged.connect(self.__proxy_model.setFilterFixedString)
 
+        self.__view = QtWidgets.QTableView()
+        self.__view.setModel(self.__proxy_model)
+        self.__view.setItemDelegateForColumn(VALUE, ValueDelegate(self.__view))
+        self.__view.setEditTriggers(QtWidgets.QAbstractItemView.AllEditTriggers)
+        self.__view.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
 
-    def update_(self):
-        self.setupView()
-        self.setRowCount(len(self.__param_dict))
+        # Set header dimensions. Fixed row heights let the view skip measuring
+        # the rows
+        self.__view.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.__view.verticalHeader().setMinimumSectionSize(18)
+        self.__view.verticalHeader().setDefaultSectionSize(18)
+        self.__view.horizontalHeader().setFixedHeight(18)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
+        layout.addWidget(self.__filter_edit)
+        layout.addWidget(self.__view)
 
-        for row, (key, value) in enumerate(self.__param_dict.items()):
-            # Column 1: parameter name (read-only)
-            widget_item = QtWidgets.QTableWidgetItem(key)
-            widget_item.setFlags(widget_item.flags() & ~Qt.ItemIsEditable)
-            self.setItem(row, 0, widget_item)
 
-            # Column 2: parameter value (editable with ExponentialSpinBox)
-            spinbox = ExponentialSpinBox()
-            spinbox.setValue(value)
-            spinbox.valueChanged.connect(self.spinboxValueChanged)
-            self.setCellWidget(row, 1, spinbox)
+    def model(self):
+        return self.__model
 
-        self.valueChanged.emit()
 
+    def view(self):
+        return self.__view
 
-    @Slot()
-    def spinboxValueChanged(self):
-        sender = self.sender()
 
-        for row in range(self.rowCount()):
-            if self.cellWidget(row, 1) is sender:
-                # Retrieve parameter name and value
-                key = self.item(row, 0).text()
-                value = sender.value()
-                self.__param_dict[key] = value
-                break
+    def update_(self):
+        self.__model.reload()
+        self.valueChanged.emit('')
+
 
-        self.valueChanged.emit()
+    def setValues(self, values):
+        """Sets the values of existing parameters without rebuilding the
+        table, and emits a single valueChanged signal."""
+        self.__model.setValues(values)
+        self.valueChanged.emit('')
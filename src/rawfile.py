@@ -0,0 +1,188 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+# Size of the first read of a plot header, doubled until the header fits
+HEADER_CHUNK = 65536
+
+
+class RawPlot:
+    """One plot of a rawfile. Vectors are views into the data section."""
+
+
+    def __init__(self, header, variables, data):
+        self.__header = header
+        self.__variables = variables
+        self.__data = data
+
+
+    def name(self):
+        return self.__header.get('plotname', '')
+
+
+    def header(self):
+        return dict(self.__header)
+
+
+    def isComplex(self):
+        return 'complex' in self.__header.get('flags', '').lower()
+
+
+    def variables(self):
+        """Returns a list of (name, type) tuples. The first one is the scale."""
+        return list(self.__variables)
+
+
+    def data(self):
+        """Returns the data section as a (points, variables) view."""
+        return self.__data
+
+
+    def scale(self):
+        return self.__data[:, 0]
+
+
+    def vector(self, name):
+        for i, (variable, type_) in enumerate(self.__variables):
+            if variable.lower() == name.lower():
+                return self.__data[:, i]
+        raise KeyError(name)
+
+
+    def vectors(self):
+        """Returns the vectors except the scale, in file order."""
+        return [self.__data[:, i] for i in range(1, len(self.__variables))]
+
+
+class RawFile:
+    """Reader of ngspice binary rawfiles. The data section of each plot is
+    mapped with np.memmap (or np.frombuffer) and exposed as per-vector views,
+    so no copy of the numbers is made."""
+
+
+    def __init__(self, file_name, mmap=True):
+        self.__plots = []
+        self.read(file_name, mmap)
+
+
+    def plots(self):
+        return list(self.__plots)
+
+
+    def read(self, file_name, mmap=True):
+        with open(file_name, 'rb') as f:
+            buffer = None if mmap else f.read()
+            size = f.seek(0, 2)
+
+        offset = 0
+        while offset < size:
+            header, variables, offset = self.__readHeader(file_name, buffer, offset)
+            if header is None:
+                break
+
+            points = int(header.get('no. points', '0'))
+            dtype = np.complex128 if 'complex' in header.get('flags', '').lower() else np.float64
+            count = points * len(variables)
+            if mmap:
+                data = np.memmap(file_name, dtype=dtype, mode='r',\
+                        offset=offset, shape=(points, len(variables)))
+            else:
+                data = np.frombuffer(buffer, dtype=dtype, count=count,\
+                        offset=offset).reshape(points, len(variables))
+            self.__plots.append(RawPlot(header, variables, data))
+            offset += count * np.dtype(dtype).itemsize
+
+
+    def __readHeader(self, file_name, buffer, offset):
+        """Parses the text header starting at `offset` and returns the header
+        fields, the variables and the offset of the binary data."""
+        # The header is read in growing chunks until it ends with the
+        # 'Binary:' line
+        size = HEADER_CHUNK
+        while True:
+            if buffer is None:
+                with open(file_name, 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read(size)
+            else:
+                chunk = buffer[offset:offset + size]
+            marker = chunk.find(b'Binary:')
+            end = chunk.find(b'\n', marker) if marker >= 0 else -1
+            if end >= 0 or len(chunk) < size:
+                break
+            size *= 2
+
+        if end < 0:
+            if chunk.find(b'Values:') >= 0:
+                raise ValueError(f"'{file_name}' is an ASCII rawfile")
+            return None, None, offset
+
+        header = {}
+        variables = []
+        in_variables = False
+        for line in chunk[:marker].decode('utf-8', errors='replace').splitlines():
+            if in_variables and line[:1] in [' ', '\t']:
+                fields = line.split()
+                if len(fields) >= 3:
+                    variables.append((fields[1], fields[2]))
+                continue
+            in_variables = False
+            key, sep, value = line.partition(':')
+            if not sep:
+                continue
+            key = key.strip().lower()
+            if key == 'variables':
+                in_variables = True
+            else:
+                header[key] = value.strip()
+
+        # The data starts right after the end of the 'Binary:' line
+        return header, variables, offset + end + 1
+
+
+    def columns(self, single_scale=True):
+        """Returns the vectors as the columns written by 'wrdata': one scale
+        column followed by the vectors, or a scale before every vector if
+        `single_scale` is False. Complex vectors give a real and an imaginary
+        column. The columns are views into the data, cut to the same length."""
+        columns = []
+        for plot in self.__plots:
+            scale = plot.scale()
+            for vector in plot.vectors():
+                if not columns or not single_scale:
+                    columns.append(scale.real if np.iscomplexobj(scale) else scale)
+                if np.iscomplexobj(vector):
+                    columns.extend([vector.real, vector.imag])
+                else:
+                    columns.append(vector)
+        if not columns:
+            return []
+
+        length = min(len(c) for c in columns)
+        return [c[:length] for c in columns]
+
+
+    def array(self, single_scale=True):
+        """Returns the columns as a two-dimensional array, or None if there is
+        no vector. The data section of a single real plot already has the
+        layout of 'wrdata' with a single scale, and is returned as it is;
+        otherwise the columns are copied into a new array."""
+        if len(self.__plots) == 1 and single_scale:
+            plot = self.__plots[0]
+            if not plot.isComplex() and len(plot.variables()) > 1:
+                return plot.data()
+        columns = self.columns(single_scale)
+        return np.column_stack(columns) if columns else None
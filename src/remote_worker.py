@@ -0,0 +1,698 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""Remote simulation workers.
+
+A worker daemon runs ngspice for clients on other machines. A client sends
+a bundle of the script and the files it includes together with a parameter
+vector, and gets the result back as a binary array. Bundles are identified
+by the hash of their content and kept by the worker, so they are sent only
+once per worker however many runs use them.
+
+    python src/remote_worker.py --listen 127.0.0.1:5700 --jobs 8
+    python src/remote_worker.py --listen unix:/tmp/ngspice.sock
+
+Messages are a 4-byte big-endian length, a JSON header and the binary
+payloads whose sizes are listed in the header. A client opens a connection
+with 'hello', giving the shared secret of the MODELNGSPICER_TOKEN environment
+variable, and the worker closes connections whose token does not match.
+A worker started without the variable makes up a token and prints it.
+A Unix socket is only opened to its owner. The token and the messages are
+not encrypted, so reach workers on other machines through an SSH tunnel:
+
+    ssh -N -L 5700:127.0.0.1:5700 host
+"""
+
+import os
+import sys
+import json
+import uuid
+import queue
+import shutil
+import socket
+import struct
+import select
+import hashlib
+import hmac
+import secrets
+import argparse
+import tempfile
+import threading
+import multiprocessing
+import concurrent.futures
+import numpy as np
+
+import ngspice_con
+import ngspice_pool
+import run_directory
+from dependency_index import ScriptDependencies
+from run_diagnostics import RunDiagnostics
+from run_limits import RunLimits, SimulationError, SimulationTimeout, SimulationCancelled,\
+        POLL_INTERVAL
+from spice_script import SpiceScript, MODEL_FILE, includedFile, replaceIncludedFile
+
+PROTOCOL_VERSION = 2
+DEFAULT_PORT = 5700
+
+# Environment variable holding the shared secret of the workers and clients
+TOKEN_VARIABLE = 'MODELNGSPICER_TOKEN'
+
+# Seconds to wait for a worker to accept a connection and answer
+CONNECT_TIMEOUT = 5.0
+
+# Upper bounds of a message, against garbage on the socket
+MAX_HEADER_SIZE = 16 * 1024 * 1024
+MAX_PAYLOAD_SIZE = 1024 * 1024 * 1024
+
+
+class RemoteError(SimulationError):
+    """Raised when a remote worker cannot be reached or breaks the protocol."""
+
+
+def parseAddress(address):
+    """Returns (family, address) of 'unix:/path', 'host:port' or 'host'."""
+    if address.startswith('unix:'):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError('Unix sockets are not available on this system.')
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, sep, port = address.rpartition(':')
+    if not sep:
+        host, port = address, DEFAULT_PORT
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"Invalid port in address '{address}'.")
+    return socket.AF_INET, (host.strip('[]') or '127.0.0.1', port)
+
+
+def defaultToken():
+    return os.environ.get(TOKEN_VARIABLE, '')
+
+
+def sendMessage(sock, header, payloads=()):
+    header = dict(header, sizes=[len(payload) for payload in payloads])
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(struct.pack('!I', len(data)) + data)
+    for payload in payloads:
+        sock.sendall(payload)
+
+
+def _receiveExactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionError('Connection closed by peer')
+        received += count
+    return buffer
+
+
+def receiveMessage(sock):
+    """Returns (header, payloads) of the next message.
+    Raises ConnectionError if the connection is closed or corrupt."""
+    size, = struct.unpack('!I', _receiveExactly(sock, 4))
+    if size > MAX_HEADER_SIZE:
+        raise ConnectionError('Message header too large')
+    try:
+        header = json.loads(_receiveExactly(sock, size).decode('utf-8'))
+    except ValueError:
+        raise ConnectionError('Corrupt message header')
+    sizes = header.get('sizes', []) if isinstance(header, dict) else None
+    if not isinstance(sizes, list) or not all(isinstance(size, int)\
+            and not isinstance(size, bool) and size >= 0 for size in sizes):
+        raise ConnectionError('Corrupt message header')
+    if sum(sizes) > MAX_PAYLOAD_SIZE:
+        raise ConnectionError('Message payload too large')
+    return header, [bytes(_receiveExactly(sock, size)) for size in sizes]
+
+
+class Bundle:
+    """The script and every file it includes, except the parameter file,
+    with paths relative to the script folder. Includes outside the script
+    folder are stored under 'external/' and the .include lines of the script
+    are pointed at them."""
+
+
+    def __init__(self, script_name):
+        script = SpiceScript(script_name)
+        source_dir = script.workingDir()
+        self.__script = os.path.basename(script.fileName())
+        self.__files = {}
+
+        external = {}
+        for file_name in script.includeFiles():
+            if not os.path.isfile(file_name):
+                continue
+            if run_directory.isOutside(file_name, source_dir):
+                relative = f'external/{len(external)}/{os.path.basename(file_name)}'
+                external[file_name] = relative
+            else:
+                relative = os.path.relpath(file_name, source_dir).replace('\\', '/')
+            with open(file_name, 'rb') as f:
+                self.__files[relative] = f.read()
+
+        lines = []
+        for line in script.lines():
+            file_name = includedFile(line)
+            if file_name is not None and os.path.basename(file_name) != MODEL_FILE:
+                path = os.path.normpath(os.path.join(source_dir, file_name))
+                if path in external:
+                    line = replaceIncludedFile(line, external[path])
+            lines.append(line)
+        self.__files[self.__script] = ('\n'.join(lines) + '\n').encode('utf-8')
+
+        digest = hashlib.sha256()
+        for name in sorted(self.__files):
+            digest.update(name.encode('utf-8') + b'\0')
+            digest.update(hashlib.sha256(self.__files[name]).digest())
+        self.__digest = digest.hexdigest()[:32]
+
+
+    def script(self):
+        return self.__script
+
+
+    def files(self):
+        return dict(self.__files)
+
+
+    def digest(self):
+        return self.__digest
+
+
+def unpackBundle(directory, names, payloads):
+    """Writes the files of a bundle below `directory`, which must not exist
+    yet. The files are written to a temporary directory that is renamed at
+    the end, so that concurrent connections never see half a bundle."""
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix='tmp-', dir=parent)
+    try:
+        for name, payload in zip(names, payloads):
+            path = os.path.normpath(os.path.join(temp_dir, name))
+            if os.path.isabs(name) or run_directory.isOutside(path, temp_dir):
+                raise ValueError(f"Invalid file name in bundle: '{name}'")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(payload)
+        try:
+            os.rename(temp_dir, directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+            shutil.rmtree(temp_dir, ignore_errors=True) # Unpacked by another connection
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def encodeResult(data, diagnostics):
+    """Returns the header fields and payloads of a successful run."""
+    header = {'status': 'ok'}
+    payloads = []
+    if data is None:
+        header['status'] = 'failed'
+    else:
+        data = np.ascontiguousarray(data, dtype='<f8')
+        header['shape'] = list(data.shape)
+        payloads.append(data.tobytes())
+    header.update(encodeDiagnostics(diagnostics))
+    return header, payloads
+
+
+def encodeDiagnostics(diagnostics):
+    if diagnostics is None:
+        return {}
+    return {\
+            'output'    : diagnostics.output(),\
+            'elapsed'   : diagnostics.elapsed(),\
+            'backend'   : diagnostics.backend(),\
+            'stages'    : diagnostics.stages(),\
+            }
+
+
+def decodeDiagnostics(header, address):
+    if 'output' not in header:
+        return None
+    return RunDiagnostics(header['output'], header.get('elapsed', 0.0),\
+            f"{header.get('backend', '')}@{address}", header.get('stages'))
+
+
+class WorkerServer:
+    """Worker daemon. Every connection is served by its own thread, and the
+    simulations run on a pool of `jobs` processes like in the GUI. A client
+    cancels a run by sending 'cancel' or by closing the connection.
+    Only clients giving `token` in 'hello' are served; a random token is
+    made up if it is empty."""
+
+
+    def __init__(self, address, jobs=None, backend='Subprocess', token=''):
+        self.__address = address
+        self.__jobs = jobs or os.cpu_count() or 1
+        self.__backend = backend
+        self.__token = token or secrets.token_urlsafe(24)
+        self.__bundle_dir = os.path.join(run_directory.baseDir(), 'bundles')
+        self.__executor = None
+        self.__lock = threading.Lock()
+        self.__socket = None
+
+
+    def jobs(self):
+        return self.__jobs
+
+
+    def token(self):
+        return self.__token
+
+
+    def executor(self):
+        with self.__lock:
+            if self.__executor is None and self.__backend == 'Pool':
+                # One worker pool in this process keeps each script in its own worker
+                ngspice_pool.setMaxWorkers(self.__jobs)
+                self.__executor = concurrent.futures.ThreadPoolExecutor(\
+                        max_workers=self.__jobs)
+            elif self.__executor is None:
+                self.__executor = concurrent.futures.ProcessPoolExecutor(\
+                        max_workers=self.__jobs,\
+                        mp_context=multiprocessing.get_context('spawn'))
+            return self.__executor
+
+
+    def listen(self):
+        family, address = parseAddress(self.__address)
+        if family != socket.AF_INET and os.path.exists(address):
+            os.remove(address) # Left over from an earlier run
+        self.__socket = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.__socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__socket.bind(address)
+        if family != socket.AF_INET:
+            os.chmod(address, 0o600) # Before anyone can connect
+        self.__socket.listen()
+        return self.__socket.getsockname()
+
+
+    def serveForever(self):
+        if self.__socket is None:
+            self.listen()
+        try:
+            while True:
+                connection, peer = self.__socket.accept()
+                threading.Thread(target=self.__serve, args=(connection,), daemon=True).start()
+        finally:
+            self.close()
+
+
+    def close(self):
+        if self.__socket is not None:
+            self.__socket.close()
+            self.__socket = None
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+
+
+    def __serve(self, connection):
+        if connection.family == socket.AF_INET:
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            with connection:
+                # Nothing is run before the client has shown the token
+                header, payloads = receiveMessage(connection)
+                token = header.get('token')
+                if header.get('type') != 'hello' or not isinstance(token, str) or\
+                        not hmac.compare_digest(token.encode('utf-8'), self.__token.encode('utf-8')):
+                    sendMessage(connection, {'status': 'error', 'message': 'Authentication failed'})
+                    return
+                sendMessage(connection, {'version': PROTOCOL_VERSION, 'jobs': self.__jobs})
+                while True:
+                    header, payloads = receiveMessage(connection)
+                    kind = header.get('type')
+                    if kind == 'run':
+                        if not self.__run(connection, header, payloads):
+                            return
+                    elif kind != 'cancel': # A cancel may arrive after the run finished
+                        sendMessage(connection, {'status': 'error',\
+                                'message': f'Unknown request: {kind}'})
+        except ConnectionError:
+            pass
+        except OSError as e:
+            print(f"Warning: connection failed: {e}")
+
+
+    def __run(self, connection, header, payloads):
+        """Runs one simulation and sends its result back. Returns False if the
+        client went away."""
+        directory = os.path.join(self.__bundle_dir, os.path.basename(str(header.get('bundle'))))
+        if not os.path.isdir(directory):
+            if 'files' not in header:
+                sendMessage(connection, {'status': 'missing'})
+                return True
+            try:
+                unpackBundle(directory, header['files'], payloads)
+            except (OSError, ValueError) as e:
+                sendMessage(connection, {'status': 'error', 'message': str(e)})
+                return True
+        os.utime(directory) # Keep it from being removed as stale
+
+        script_name = os.path.join(directory, os.path.basename(header.get('script', '')))
+        cancel_file = os.path.join(run_directory.baseDir(), 'cancel', uuid.uuid4().hex)
+        limits = RunLimits(header.get('timeout', 0.0), header.get('cpu_time', 0),\
+                header.get('memory', 0), cancel_file)
+        chunk = tuple(header['chunk']) if header.get('chunk') else None
+        future = self.executor().submit(ngspice_con.simulate, script_name,\
+                header.get('params', {}), self.__backend, header.get('output_format'), limits,\
+                chunk, header.get('nodeset'))
+
+        # Wait for the run, watching the connection for a cancellation
+        connected = True
+        cancelled = False
+        while not concurrent.futures.wait([future], POLL_INTERVAL).done:
+            if cancelled or not select.select([connection], [], [], 0)[0]:
+                continue
+            try:
+                message, unused = receiveMessage(connection)
+            except ConnectionError:
+                connected = False
+                message = {'type': 'cancel'}
+            if message.get('type') == 'cancel':
+                cancelled = True
+                if not future.cancel():
+                    os.makedirs(os.path.dirname(cancel_file), exist_ok=True)
+                    open(cancel_file, 'w').close()
+
+        if os.path.exists(cancel_file):
+            os.remove(cancel_file)
+        if not connected:
+            return False
+
+        try:
+            reply, payloads = encodeResult(*future.result())
+        except concurrent.futures.CancelledError:
+            reply, payloads = {'status': 'cancelled', 'message': 'Simulation cancelled'}, []
+        except SimulationError as e:
+            status = 'timeout' if isinstance(e, SimulationTimeout)\
+                    else 'cancelled' if isinstance(e, SimulationCancelled) else 'error'
+            reply = {'status': status, 'message': str(e)}
+            reply.update(encodeDiagnostics(getattr(e, 'diagnostics', None)))
+            payloads = []
+        except Exception as e:
+            if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                with self.__lock:
+                    self.__executor = None # Recreated on the next run
+            reply, payloads = {'status': 'error', 'message': f'Simulation failed: {e}'}, []
+        sendMessage(connection, reply, payloads)
+        return True
+
+
+class RemoteConnection:
+    """Connection of a client to a worker, running one simulation at a time.
+    The token defaults to the MODELNGSPICER_TOKEN environment variable."""
+
+
+    def __init__(self, address, timeout=CONNECT_TIMEOUT, token=None):
+        self.__address = address
+        family, target = parseAddress(address)
+        self.__socket = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            self.__socket.settimeout(timeout)
+            self.__socket.connect(target)
+            if family == socket.AF_INET:
+                self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sendMessage(self.__socket, {'type': 'hello', 'version': PROTOCOL_VERSION,\
+                    'token': defaultToken() if token is None else token})
+            header, payloads = receiveMessage(self.__socket)
+            self.__socket.settimeout(None)
+        except (OSError, ConnectionError):
+            self.__socket.close()
+            raise
+        if header.get('status') == 'error':
+            self.__socket.close()
+            raise RemoteError(f"{address}: {header.get('message', 'connection refused')}")
+        if header.get('version') != PROTOCOL_VERSION:
+            self.__socket.close()
+            raise RemoteError(f'{address}: unsupported protocol version {header.get("version")}')
+        self.__jobs = max(int(header.get('jobs', 1)), 1)
+
+
+    def address(self):
+        return self.__address
+
+
+    def jobs(self):
+        """Returns the number of simulations the worker runs at a time."""
+        return self.__jobs
+
+
+    def close(self):
+        self.__socket.close()
+
+
+    def simulate(self, bundle, param_dict, output_format=None, limits=None, chunk=None,\
+            nodeset=None):
+        """Runs the bundle on the worker and returns (data, RunDiagnostics) like
+        ngspice_con.simulate(). `limits` is also checked here, and the run is
+        cancelled on the worker if it stops it. Raises ConnectionError or
+        OSError if the connection failed, after which it must be closed."""
+        limits = limits or RunLimits()
+        limits.start()
+        request = {\
+                'type'          : 'run',\
+                'bundle'        : bundle.digest(),\
+                'script'        : bundle.script(),\
+                'params'        : dict(param_dict),\
+                'output_format' : output_format or ngspice_con.OUTPUT_FORMAT,\
+                'timeout'       : limits.timeout(),\
+                'cpu_time'      : limits.cpuTime(),\
+                'memory'        : limits.memory(),\
+                'chunk'         : list(chunk) if chunk else None,\
+                'nodeset'       : nodeset,\
+                }
+        sendMessage(self.__socket, request)
+        header, payloads = self.__wait(limits)
+        if header.get('status') == 'missing':
+            # First run of the bundle on this worker
+            files = bundle.files()
+            request['files'] = list(files)
+            sendMessage(self.__socket, request, list(files.values()))
+            header, payloads = self.__wait(limits)
+
+        status = header.get('status')
+        diagnostics = decodeDiagnostics(header, self.__address)
+        if status in ['ok', 'failed']:
+            data = None
+            if status == 'ok':
+                data = np.frombuffer(payloads[0], dtype='<f8').reshape(header['shape'])
+            return data, diagnostics
+
+        message = header.get('message', 'Simulation failed')
+        error = SimulationTimeout(message) if status == 'timeout'\
+                else SimulationCancelled(message) if status == 'cancelled'\
+                else RemoteError(f'{self.__address}: {message}')
+        error.diagnostics = diagnostics
+        raise error
+
+
+    def __wait(self, limits):
+        """Waits for the reply, cancelling the run if `limits` stops it."""
+        while True:
+            readable, writable, errors = select.select([self.__socket], [], [], POLL_INTERVAL)
+            if readable:
+                return receiveMessage(self.__socket)
+            try:
+                limits.check()
+            except SimulationError:
+                # The worker kills ngspice, the reply is not waited for
+                self.close()
+                raise
+
+
+class RemoteExecutor(concurrent.futures.Executor):
+    """Executor running ngspice_con.simulate() jobs on remote workers. Every
+    worker gets one connection per job it runs at a time, and each connection
+    takes the next job from a shared queue, so faster workers take more.
+    A job whose worker fails is handed to another one."""
+
+
+    def __init__(self, addresses, timeout=CONNECT_TIMEOUT, token=None):
+        self.__queue = queue.Queue()
+        self.__token = token
+        self.__lock = threading.Lock()
+        self.__bundles = {} # Script name -> (ScriptDependencies, Bundle)
+        self.__threads = []
+        self.__alive = 0
+        self.__shutdown = False
+
+        for address in addresses:
+            try:
+                connection = RemoteConnection(address, timeout, token)
+            except (OSError, ConnectionError, RemoteError) as e:
+                print(f"Warning: remote worker {address} is not available: {e}")
+                continue
+            connections = [connection]
+            try:
+                for i in range(connection.jobs() - 1):
+                    connections.append(RemoteConnection(address, timeout, token))
+            except (OSError, ConnectionError, RemoteError) as e:
+                print(f"Warning: remote worker {address}: {e}")
+            for connection in connections:
+                thread = threading.Thread(target=self.__slot, args=(connection,), daemon=True)
+                self.__threads.append(thread)
+                self.__alive += 1
+                thread.start()
+
+
+    def alive(self):
+        """Returns the number of connections able to take jobs."""
+        with self.__lock:
+            return self.__alive
+
+
+    def bundle(self, script_name):
+        """Returns the Bundle of a script, rebuilt when a file of it changed."""
+        script_name = os.path.abspath(script_name)
+        with self.__lock:
+            entry = self.__bundles.get(script_name)
+            if entry is None or not entry[0].upToDate():
+                entry = (ScriptDependencies(script_name), Bundle(script_name))
+                self.__bundles[script_name] = entry
+            return entry[1]
+
+
+    def submit(self, fn, *args, **kwargs):
+        """Submits ngspice_con.simulate(script_name, param_dict, backend,
+        output_format, limits, chunk, nodeset). The backend is chosen by the
+        worker."""
+        if fn is not ngspice_con.simulate:
+            raise ValueError("submit(): only ngspice_con.simulate can run remotely.")
+        with self.__lock:
+            if self.__shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            if self.__alive == 0:
+                raise RemoteError('No remote worker available')
+            future = concurrent.futures.Future()
+            self.__queue.put((future, args, kwargs))
+        return future
+
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.__lock:
+            self.__shutdown = True
+        if cancel_futures:
+            self.__drain(lambda future: future.cancel())
+        for thread in self.__threads:
+            self.__queue.put(None)
+        if wait:
+            for thread in self.__threads:
+                thread.join()
+
+
+    def __drain(self, action):
+        while True:
+            try:
+                job = self.__queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is None:
+                self.__queue.put(None)
+                return
+            action(job[0])
+
+
+    def __slot(self, connection):
+        address = connection.address()
+        while True:
+            job = self.__queue.get()
+            if job is None:
+                break
+            future, args, kwargs = job
+            if future.running():
+                pass # Handed over from a failed connection
+            elif not future.set_running_or_notify_cancel():
+                continue
+
+            script_name, param_dict, backend, output_format, limits, chunk, nodeset = \
+                    (list(args) + [None] * 7)[:7]
+            nodeset = kwargs.get('nodeset', nodeset)
+            try:
+                if connection is None:
+                    connection = RemoteConnection(address, token=self.__token)
+                future.set_result(connection.simulate(self.bundle(script_name),\
+                        param_dict, output_format, limits, chunk, nodeset))
+            except (OSError, ConnectionError) as e:
+                print(f"Warning: remote worker {address} failed: {e}")
+                if connection is not None:
+                    connection.close()
+                self.__queue.put(job)
+                break
+            except SimulationError as e:
+                if isinstance(e, (SimulationTimeout, SimulationCancelled)):
+                    # Closed to cancel the run on the worker
+                    connection.close()
+                    connection = None
+                future.set_exception(e)
+            except Exception as e:
+                future.set_exception(e)
+
+        with self.__lock:
+            self.__alive -= 1
+            if self.__alive == 0:
+                # Nobody is left to run the queued jobs
+                self.__drain(self.__fail)
+
+
+    def __fail(self, future):
+        if future.running() or future.set_running_or_notify_cancel():
+            future.set_exception(RemoteError('No remote worker available'))
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(prog='remote_worker',\
+            description='Runs ngspice simulations for MODELngspicer clients. '\
+            f'Clients must give the shared secret of the {TOKEN_VARIABLE} '\
+            'environment variable; without it, a random token is printed.')
+    parser.add_argument('-l', '--listen', default=f'127.0.0.1:{DEFAULT_PORT}',\
+            help=f'host:port or unix:path to listen on (default: 127.0.0.1:{DEFAULT_PORT})')
+    parser.add_argument('-j', '--jobs', type=int, default=None,\
+            help='number of parallel ngspice runs (default: number of CPUs)')
+    parser.add_argument('--backend', choices=ngspice_con.BACKENDS, default='Subprocess',\
+            help='simulator backend (default: Subprocess)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+    run_directory.removeStale()
+    server = WorkerServer(args.listen, args.jobs, args.backend, defaultToken())
+    try:
+        address = server.listen()
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    if not defaultToken():
+        print(f"Token: {server.token()} (set {TOKEN_VARIABLE} on the clients)")
+    print(f"Listening on {address} with {server.jobs()} jobs", flush=True)
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import hashlib
+import threading
+import collections
+import numpy as np
+
+from parameter_io import ParameterIO, SIMULATION_DIGITS
+from spice_script import SpiceScript
+
+# Bumped whenever the layout of cached results changes
+CACHE_FORMAT = '1'
+
+# Default size limit of the in-memory tier in bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def defaultCacheDir():
+    base_dir = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA')\
+            or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base_dir, 'MODELngspicer', 'results')
+
+
+class ResultCache:
+    """Content-addressed cache of simulation results. Entries are keyed by a
+    hash of the script, the files it includes and the parameter values, and
+    are kept in an in-memory LRU tier and optionally in an on-disk tier.
+    The cache may be shared by the GUI thread and background threads."""
+
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.__entries = collections.OrderedDict()
+        self.__bytes = 0
+        self.__max_bytes = max_bytes
+        self.__disk_enabled = False
+        self.__cache_dir = defaultCacheDir()
+        self.__lock = threading.RLock()
+
+
+    def maxBytes(self):
+        return self.__max_bytes
+
+
+    def setMaxBytes(self, value):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError("setMaxBytes(): `value` must be a non-negative integer.")
+        with self.__lock:
+            self.__max_bytes = value
+            self.__evict()
+
+
+    def diskEnabled(self):
+        return self.__disk_enabled
+
+
+    def setDiskEnabled(self, value):
+        if not isinstance(value, bool):
+            raise ValueError("setDiskEnabled(): `value` must be a boolean.")
+        self.__disk_enabled = value
+
+
+    def cacheDir(self):
+        return self.__cache_dir
+
+
+    def setCacheDir(self, value):
+        if not isinstance(value, str):
+            raise ValueError("setCacheDir(): `value` must be a string.")
+        self.__cache_dir = value
+
+
+    def key(self, script_name, param_dict, backend='', output_format=''):
+        """Returns the cache key of a run, or None if the script cannot be read.
+        The backend and the output format are part of the key, as the results
+        they produce differ in precision."""
+        digest = hashlib.sha256(CACHE_FORMAT.encode('utf-8'))
+        digest.update(f'{backend}\n{output_format}\n'.encode('utf-8'))
+        try:
+            script = SpiceScript(script_name)
+            for file_name in [script.fileName()] + script.includeFiles():
+                digest.update(file_name.encode('utf-8'))
+                if os.path.isfile(file_name):
+                    with open(file_name, 'rb') as f:
+                        digest.update(f.read())
+        except OSError:
+            return None
+
+        # Parameters are hashed as they are written for the run
+        for line in ParameterIO().lines(param_dict, SIMULATION_DIGITS):
+            digest.update(line.encode('utf-8'))
+        return digest.hexdigest()
+
+
+    def get(self, key):
+        if key is None:
+            return None
+
+        with self.__lock:
+            data = self.__entries.get(key)
+            if data is not None:
+                self.__entries.move_to_end(key)
+                return data
+
+        if self.__disk_enabled:
+            try:
+                data = np.load(self.__diskPath(key), allow_pickle=False)
+            except (OSError, ValueError):
+                return None
+            self.__store(key, data)
+            return data
+        return None
+
+
+    def put(self, key, data):
+        if key is None or data is None:
+            return
+        self.__store(key, data)
+
+        if self.__disk_enabled:
+            try:
+                os.makedirs(self.__cache_dir, exist_ok=True)
+                # Write to a temporary file first so that a reader never sees
+                # a partially written entry
+                temp_name = self.__diskPath(key) + '.tmp'
+                with open(temp_name, 'wb') as f:
+                    np.save(f, data, allow_pickle=False)
+                os.replace(temp_name, self.__diskPath(key))
+            except OSError as e:
+                print(f"Warning: failed to write the result cache: {e}")
+
+
+    def clear(self, disk=False):
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+        if disk and os.path.isdir(self.__cache_dir):
+            for file_name in os.listdir(self.__cache_dir):
+                if file_name.endswith('.npy'):
+                    try:
+                        os.remove(os.path.join(self.__cache_dir, file_name))
+                    except OSError:
+                        pass
+
+
+    def __store(self, key, data):
+        data = np.asarray(data)
+        data.setflags(write=False) # Cached arrays are shared by all readers
+        with self.__lock:
+            if key in self.__entries:
+                self.__bytes -= self.__entries.pop(key).nbytes
+            self.__entries[key] = data
+            self.__bytes += data.nbytes
+            self.__evict()
+
+
+    def __evict(self):
+        while self.__bytes > self.__max_bytes and self.__entries:
+            key, data = self.__entries.popitem(last=False)
+            self.__bytes -= data.nbytes
+
+
+    def __diskPath(self, key):
+        return os.path.join(self.__cache_dir, key + '.npy')
@@ -0,0 +1,45 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from fit_metrics import FitEvaluator, DEFAULT_ATOL
+
+# Default relative tolerance of the comparison against golden outputs
+DEFAULT_RTOL = 1e-3
+
+
+def compareGolden(data, golden, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL):
+    """Compares a result against its golden output element by element.
+    Returns (passed, worst error relative to the tolerance)."""
+    if data.shape != golden.shape:
+        return False, float('inf')
+    error = np.abs(data - golden) / (atol + rtol * np.abs(golden))
+    worst = float(np.max(error)) if error.size else 0.0
+    return worst <= 1.0, worst
+
+
+def compareData(data, reference, rtol, atol=DEFAULT_ATOL, log_x=False, log_y=False,\
+        evaluator=None):
+    """Compares a result against measured reference data like the fit metrics
+    of a page (see fit_metrics.FitEvaluator, which `evaluator` may give to
+    reuse its interpolation). The relative RMS error of each column must not
+    exceed `rtol`. Returns (passed, worst relative RMS error)."""
+    evaluator = evaluator or FitEvaluator(atol)
+    metrics = evaluator.evaluate(data, reference, log_x, log_y)
+    if metrics is None or not metrics.points():
+        return False, float('inf')
+    worst = max(float(column.relativeRms()) for column in metrics.columns())
+    return worst <= rtol, worst
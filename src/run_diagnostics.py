@@ -0,0 +1,129 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import re
+
+# Command appended to every run so that ngspice prints its own statistics
+STATISTICS_COMMAND = 'rusage all'
+
+# Output lines worth showing on their own, matched case-insensitively
+WARNING_PATTERNS = [\
+        r'\bwarning\b',\
+        r'\berror\b',\
+        r'timestep too small',\
+        r'gmin stepping',\
+        r'source stepping',\
+        r'singular matrix',\
+        r'iteration limit reached',\
+        r'trouble with node',\
+        ]
+
+# Statistics of the 'rusage' output shown in the diagnostics view
+ANALYSIS_TIME = 'Total analysis time'
+ELAPSED_TIME = 'Total elapsed time'
+ITERATIONS = 'Total iterations'
+TRANSIENT_ITERATIONS = 'Transient iterations'
+TIMEPOINTS = 'Transient timepoints'
+ACCEPTED_TIMEPOINTS = 'Accepted timepoints'
+REJECTED_TIMEPOINTS = 'Rejected timepoints'
+
+
+def parseStatistics(lines):
+    """Returns the 'name = value' statistics printed by 'rusage' as a dict of
+    floats. Units in parentheses, e.g. '(seconds)', are dropped from the names."""
+    statistics = {}
+    for line in lines:
+        m = re.match(r'^\s*([A-Za-z][^=]*?)\s*(\([^)]*\))?\s*=\s*([-+0-9.eE]+)', line)
+        if not m:
+            continue
+        try:
+            statistics[m.group(1)] = float(m.group(3))
+        except ValueError:
+            pass
+    return statistics
+
+
+def parseWarnings(lines):
+    """Returns the output lines reporting warnings, errors and convergence aids."""
+    pattern = re.compile('|'.join(WARNING_PATTERNS), re.IGNORECASE)
+    return [line for line in lines if pattern.search(line)]
+
+
+class RunDiagnostics:
+    """Output and statistics of a single simulator run. Instances are
+    picklable so that they can be returned from worker processes."""
+
+
+    def __init__(self, output=None, elapsed=0.0, backend='', stages=None):
+        self.__output = [line.rstrip() for line in (output or [])]
+        self.__elapsed = elapsed # Wall-clock seconds measured by the caller
+        self.__backend = backend
+        self.__stages = dict(stages or {}) # Seconds spent in each stage of the run
+        self.__statistics = parseStatistics(self.__output)
+        self.__warnings = parseWarnings(self.__output)
+
+
+    def output(self):
+        return list(self.__output)
+
+
+    def elapsed(self):
+        return self.__elapsed
+
+
+    def backend(self):
+        return self.__backend
+
+
+    def stages(self):
+        return dict(self.__stages)
+
+
+    def statistics(self):
+        return dict(self.__statistics)
+
+
+    def statistic(self, name, default=None):
+        return self.__statistics.get(name, default)
+
+
+    def warnings(self):
+        return list(self.__warnings)
+
+
+    def analysisTime(self):
+        return self.statistic(ANALYSIS_TIME)
+
+
+    def iterations(self):
+        return self.statistic(ITERATIONS)
+
+
+    def rejectedTimepoints(self):
+        return self.statistic(REJECTED_TIMEPOINTS)
+
+
+    def summary(self):
+        """Returns a one-line summary for status bars and tooltips."""
+        fields = [f'{self.__elapsed:.3f} s']
+        if self.analysisTime() is not None:
+            fields.append(f'analysis {self.analysisTime():g} s')
+        if self.iterations() is not None:
+            fields.append(f'{self.iterations():g} iterations')
+        if self.rejectedTimepoints():
+            fields.append(f'{self.rejectedTimepoints():g} rejected timepoints')
+        if self.__warnings:
+            fields.append(f'{len(self.__warnings)} warnings')
+        return ', '.join(fields)
@@ -0,0 +1,228 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import time
+import shutil
+import getpass
+import tempfile
+import numpy as np
+
+from parameter_io import ParameterIO, SIMULATION_DIGITS
+from run_diagnostics import STATISTICS_COMMAND
+from sweep_partition import findPartition
+from warm_start import captureCommands, nodesetLines
+from spice_script import SpiceScript, MODEL_FILE, includedFile, replaceIncludedFile,\
+        isInclude
+
+# Scratch files older than this (in seconds) are left over from earlier sessions
+STALE_AGE = 24 * 60 * 60
+
+
+def scratchRoot():
+    """Returns the root of the scratch directories, preferring tmpfs."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def baseDir():
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = 'user'
+    return os.path.join(scratchRoot(), f'MODELngspicer-{user}')
+
+
+def writePreview(file_name, preview):
+    """Replaces the preview file of a running simulation with the part of the
+    result computed so far. The file is replaced at once, as the GUI may
+    read it at any time."""
+    try:
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        temp_name = file_name + '.tmp'
+        with open(temp_name, 'wb') as f:
+            np.save(f, preview)
+        os.replace(temp_name, file_name)
+    except OSError as e:
+        print(f"Warning: failed to write the preview of the simulation: {e}")
+
+
+def readPreview(file_name):
+    """Returns the array of a preview file, or None if there is none yet."""
+    try:
+        return np.load(file_name)
+    except (OSError, ValueError):
+        return None
+
+
+def removeStale(max_age=STALE_AGE):
+    """Removes run directories, cancellation and preview files and bundles
+    of remote workers left over from earlier sessions."""
+    now = time.time()
+    for sub_dir in ['runs', 'cancel', 'previews', 'bundles']:
+        path = os.path.join(baseDir(), sub_dir)
+        if not os.path.isdir(path):
+            continue
+        for name in os.listdir(path):
+            entry = os.path.join(path, name)
+            try:
+                if now - os.path.getmtime(entry) < max_age:
+                    continue
+                if os.path.isdir(entry):
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    os.remove(entry)
+            except OSError:
+                pass
+
+
+def isOutside(path, directory):
+    """Returns True if the path is not below the directory."""
+    try:
+        relative = os.path.relpath(path, directory)
+    except ValueError: # On another drive
+        return True
+    return relative.startswith('..') or os.path.isabs(relative)
+
+
+class RunDirectory:
+    """Private scratch directory of a single run, holding the files the script
+    includes and receiving its results. The netlist itself is kept in memory,
+    with the parameter block written in place of the include of "model.txt",
+    and is sent to ngspice over stdin. With `chunk`, an (index, count) tuple,
+    only that chunk of the sweep of the script is staged. With `nodeset`, a
+    dict of node voltages, the run starts from them; with an empty one, it
+    prints its operating point for the next run (see warm_start)."""
+
+
+    def __init__(self, script_name, param_dict, binary=False, chunk=None, nodeset=None):
+        runs_dir = os.path.join(baseDir(), 'runs')
+        os.makedirs(runs_dir, exist_ok=True)
+        self.__path = tempfile.mkdtemp(prefix='run-', dir=runs_dir)
+        self.__script_file = os.path.join(self.__path, os.path.basename(script_name))
+        self.__binary = binary
+        self.__netlist = ''
+        try:
+            self.stage(SpiceScript(script_name), param_dict, chunk, nodeset)
+        except BaseException:
+            self.remove()
+            raise
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.remove()
+
+
+    def path(self):
+        return self.__path
+
+
+    def scriptFile(self):
+        """Returns the name the script would have in the directory. The
+        file itself is not written."""
+        return self.__script_file
+
+
+    def netlist(self):
+        """Returns the staged netlist as text."""
+        return self.__netlist
+
+
+    def resultFile(self):
+        """Returns the file the result is written to, a binary rawfile ('.raw')
+        if the directory was staged with `binary`."""
+        root, ext = os.path.splitext(self.__script_file)
+        return root + ('.raw' if self.__binary else '.txt')
+
+
+    def stage(self, script, param_dict, chunk=None, nodeset=None):
+        source_dir = script.workingDir()
+
+        script_lines = script.lines()
+        if chunk is not None:
+            partition = findPartition(script)
+            if partition is None:
+                raise ValueError(f"'{script.fileName()}' has no sweep that can be split.")
+            script_lines = partition.rewrite(script_lines, *chunk)
+
+        # Includes below the script folder are copied with the same layout,
+        # so that nested relative includes keep working
+        for file_name in script.includeFiles():
+            if isOutside(file_name, source_dir) or not os.path.isfile(file_name):
+                continue
+            target = os.path.join(self.__path, os.path.relpath(file_name, source_dir))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(file_name, target)
+
+        result_name = os.path.basename(script.resultFile())
+        lines = []
+        in_control = False
+        statistics = False
+        initial_guess = nodeset is None
+        capture = nodeset is not None and not nodeset
+        for line in script_lines:
+            keyword = line.strip().lower()
+            if not initial_guess and (keyword.startswith('.control')\
+                    or keyword.split()[:1] == ['.end']):
+                lines.extend(nodesetLines(nodeset))
+                initial_guess = True
+            if keyword.startswith('.control'):
+                in_control = True
+            elif keyword.startswith('.endc'):
+                in_control = False
+
+            # Let ngspice print its statistics once, before the control
+            # section ends or quits
+            if not statistics and (keyword.startswith('.endc')\
+                    or (in_control and keyword.split()[:1] in [['quit'], ['exit']])):
+                lines.append(STATISTICS_COMMAND)
+                statistics = True
+
+            file_name = includedFile(line)
+            m = re.match(r'^([ \t]*)wrdata([ \t]+)([^ \t]+)(.*)$', line, re.IGNORECASE)
+            if in_control and self.__binary and m and os.path.basename(m.group(3)) == result_name:
+                # Let ngspice write the result vectors as a binary rawfile
+                raw_file = os.path.basename(self.resultFile())
+                lines.append(f'{m.group(1)}set filetype=binary')
+                lines.append(f'{m.group(1)}write{m.group(2)}{raw_file}{m.group(4)}')
+            elif file_name is None:
+                lines.append(line)
+            elif isInclude(line, MODEL_FILE):
+                lines.extend(ParameterIO().lines(param_dict, SIMULATION_DIGITS))
+            else:
+                # Includes outside the script folder are referenced in place
+                path = os.path.normpath(os.path.join(source_dir, file_name))
+                if isOutside(path, source_dir):
+                    lines.append(replaceIncludedFile(line, path.replace('\\', '/')))
+                else:
+                    lines.append(line)
+
+            # Without a known operating point, print the one of the circuit
+            # as loaded, once the control section starts
+            if capture and keyword.startswith('.control'):
+                lines.extend(captureCommands())
+                capture = False
+
+        self.__netlist = '\n'.join(lines) + '\n'
+
+
+    def remove(self):
+        shutil.rmtree(self.__path, ignore_errors=True)
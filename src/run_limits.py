@@ -0,0 +1,108 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+# Interval in seconds at which running simulations check for cancellation
+POLL_INTERVAL = 0.05
+
+
+class SimulationError(Exception):
+    """Raised when a simulation could not produce a result."""
+
+
+class SimulationTimeout(SimulationError):
+    """Raised when a simulation exceeded its wall-clock or CPU time limit."""
+
+
+class SimulationCancelled(SimulationError):
+    """Raised when a simulation was cancelled while it was running."""
+
+
+class RunLimits:
+    """Wall-clock timeout, resource limits and cancellation of a single run.
+    Instances are picklable so that they can be sent to worker processes.
+    Cancellation is signalled across processes by creating `cancel_file`."""
+
+
+    def __init__(self, timeout=0.0, cpu_time=0, memory=0, cancel_file=''):
+        self.__timeout = timeout         # Wall-clock seconds, 0 for no limit
+        self.__cpu_time = cpu_time       # CPU seconds of the ngspice process, 0 for no limit
+        self.__memory = memory           # Address space of the ngspice process in MB, 0 for no limit
+        self.__cancel_file = cancel_file
+        self.__deadline = None
+
+
+    def timeout(self):
+        return self.__timeout
+
+
+    def cpuTime(self):
+        return self.__cpu_time
+
+
+    def memory(self):
+        return self.__memory
+
+
+    def cancelFile(self):
+        return self.__cancel_file
+
+
+    def copy(self, timeout=None, cancel_file=None):
+        return RunLimits(\
+                self.__timeout if timeout is None else timeout,\
+                self.__cpu_time, self.__memory,\
+                self.__cancel_file if cancel_file is None else cancel_file)
+
+
+    def start(self):
+        """Starts the wall-clock timer, unless it is already running."""
+        if self.__deadline is None and self.__timeout > 0:
+            self.__deadline = time.monotonic() + self.__timeout
+
+
+    def cancelled(self):
+        return bool(self.__cancel_file) and os.path.exists(self.__cancel_file)
+
+
+    def check(self):
+        """Raises SimulationCancelled or SimulationTimeout if the run must stop."""
+        if self.cancelled():
+            raise SimulationCancelled('Simulation cancelled')
+        if self.__deadline is not None and time.monotonic() > self.__deadline:
+            raise SimulationTimeout(f'Simulation timed out after {self.__timeout:g} s')
+
+
+    def preexec(self):
+        """Returns a function applying the resource limits in the child process,
+        or None if there is nothing to apply."""
+        if resource is None or (self.__cpu_time <= 0 and self.__memory <= 0):
+            return None
+        cpu_time, memory = self.__cpu_time, self.__memory
+
+        def apply():
+            if cpu_time > 0:
+                resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_time), int(cpu_time) + 1))
+            if memory > 0:
+                size = int(memory) * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (size, size))
+        return apply
@@ -0,0 +1,92 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from fit_metrics import FitEvaluator
+
+# Default relative perturbation of each parameter
+DEFAULT_STEP = 0.01
+
+# Directions of the central differences
+UP = 1
+DOWN = -1
+
+
+def perturbations(param_dict, step=DEFAULT_STEP):
+    """Returns (name, direction, param_dict) for the up and down perturbation
+    of every parameter. Parameters equal to zero cannot be perturbed
+    relatively and are left out."""
+    result = []
+    for name, value in param_dict.items():
+        if value == 0:
+            continue
+        for direction in [UP, DOWN]:
+            perturbed = dict(param_dict)
+            perturbed[name] = value * (1.0 + direction * step)
+            result.append((name, direction, perturbed))
+    return result
+
+
+def curveSensitivity(base, up, down, step=DEFAULT_STEP):
+    """Returns the normalized sensitivity of a curve to a parameter, that is
+    the RMS over the points of dy/(dp/p) by central differences, divided by
+    the RMS of the curve. Unlike a pointwise dy/y, it does not blow up where
+    the curve crosses zero. The perturbed curves are interpolated onto the x
+    values of the base curve. Returns NaN if a curve is missing or zero."""
+    if base is None or up is None or down is None:
+        return np.nan
+    base, up, down = np.atleast_2d(base), np.atleast_2d(up), np.atleast_2d(down)
+    columns = min(base.shape[1], up.shape[1], down.shape[1])
+    if columns < 2 or len(base) == 0:
+        return np.nan
+
+    interpolator = FitEvaluator().interpolator(base[:, 0])
+    y_up, valid_up = interpolator(up[:, 0], up[:, 1:columns])
+    y_down, valid_down = interpolator(down[:, 0], down[:, 1:columns])
+    valid = valid_up & valid_down & np.all(np.isfinite(y_up) & np.isfinite(y_down), axis=1)
+    if not np.any(valid):
+        return np.nan
+
+    # Each column is normalized by its own RMS
+    scale = np.sqrt(np.mean(base[valid, 1:columns] ** 2, axis=0))
+    slope = np.sqrt(np.mean(((y_up[valid] - y_down[valid]) / (2.0 * step)) ** 2, axis=0))
+    nonzero = scale > 0
+    if not np.any(nonzero):
+        return np.nan
+    return float(np.sqrt(np.mean((slope[nonzero] / scale[nonzero]) ** 2)))
+
+
+def fitError(data, reference, evaluator=None, log_x=False, log_y=False):
+    """Returns the relative RMS error of a curve against reference data, as
+    in the fit metrics of the page (see fit_metrics.FitEvaluator)."""
+    metrics = (evaluator or FitEvaluator()).evaluate(data, reference, log_x, log_y)
+    if metrics is None:
+        return np.nan
+    return float(metrics.relativeRms())
+
+
+def errorSensitivity(base, up, down, reference, step=DEFAULT_STEP, evaluator=None,\
+        log_x=False, log_y=False):
+    """Returns the normalized sensitivity of the fit error against the
+    reference data to a parameter, (dE/E)/(dp/p) by central differences.
+    Negative values mean increasing the parameter improves the fit."""
+    evaluator = evaluator or FitEvaluator()
+    e_base = fitError(base, reference, evaluator, log_x, log_y)
+    e_up = fitError(up, reference, evaluator, log_x, log_y)
+    e_down = fitError(down, reference, evaluator, log_x, log_y)
+    if not np.isfinite(e_base) or e_base == 0:
+        return np.nan
+    return float((e_up - e_down) / (2.0 * step * e_base))
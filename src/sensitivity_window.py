@@ -0,0 +1,312 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+from PySide6 import QtCore, QtGui, QtWidgets
+from PySide6.QtCore import Signal, Slot, Qt
+import sys, os
+import numpy as np
+from concurrent.futures.process import BrokenProcessPool
+
+import ngspice_con
+from fit_metrics import FitEvaluator
+from run_limits import SimulationError
+from sensitivity import perturbations, curveSensitivity, errorSensitivity,\
+        DEFAULT_STEP, UP, DOWN
+from simulation_scheduler import SimulationScheduler
+from ui_manager import UIManager
+
+# Quantities of which the sensitivities are computed
+METRICS = ['Curve', 'Fit Error']
+
+# Number of decades below the largest sensitivity spanned by the colour scale
+COLOR_DECADES = 4
+
+
+class SensitivityItem(QtWidgets.QTableWidgetItem):
+    """Heatmap cell sorted by the magnitude of its sensitivity."""
+
+
+    def __lt__(self, other):
+        a = self.data(Qt.UserRole)
+        b = other.data(Qt.UserRole)
+        a = abs(a) if a is not None and np.isfinite(a) else -1.0
+        b = abs(b) if b is not None and np.isfinite(b) else -1.0
+        return a < b
+
+
+class SensitivityWindow(QtWidgets.QMainWindow):
+    """Singleton window computing the normalized sensitivity of every page
+    to every parameter. Each parameter is perturbed up and down by a relative
+    step, all the runs are spread over the worker processes of the
+    SimulationScheduler, and the results fill a parameter x page heatmap as
+    they arrive."""
+
+    # Signal emitted from the executor thread when a run is finished
+    runFinished = Signal(object, object)
+
+
+    _inst = None
+
+    def __new__(cls):
+        if cls._inst is None:
+            cls._inst = super(SensitivityWindow, cls).__new__(cls)
+            cls._inst.__initialized = False
+
+        return cls._inst
+
+
+    def __init__(self):
+        if self.__initialized:
+            return
+
+        super().__init__()
+        self.__pages = []
+        self.__batch = None # SimulationBatch of the running analysis
+        self.__results = {}     # (panel, name, direction) -> data
+        self.__references = {}  # panel -> reference data
+        self.__evaluators = {}  # panel -> FitEvaluator of the reference data
+        self.__names = []
+        self.__running = []     # Pages of the current analysis
+        self.__step = DEFAULT_STEP
+        self.__metric = METRICS[0]
+        self.setWindowTitle('Sensitivity Analysis')
+        self.resize(800, 600)
+
+        # Settings
+        self.__step_spin = QtWidgets.QDoubleSpinBox()
+        self.__step_spin.setRange(0.001, 50.0)
+        self.__step_spin.setDecimals(3)
+        self.__step_spin.setSuffix(' %')
+        self.__step_spin.setValue(DEFAULT_STEP * 100.0)
+
+        self.__metric_combo = QtWidgets.QComboBox()
+        self.__metric_combo.addItems(METRICS)
+        self.__metric_combo.setToolTip('Curve: relative change of the simulated curve\n'\
+                'Fit Error: relative change of the RMS error against the data file')
+
+        form = QtWidgets.QFormLayout()
+        form.addRow('Step:', self.__step_spin)
+        form.addRow('Sensitivity of:', self.__metric_combo)
+
+        # Buttons
+        self.__start_button = QtWidgets.QPushButton('Start')
+        self.__start_button.clicked.connect(self.start)
+        self.__stop_button = QtWidgets.QPushButton('Stop')
+        self.__stop_button.clicked.connect(self.stop)
+        self.__progress_bar = QtWidgets.QProgressBar()
+
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(self.__start_button)
+        buttons.addWidget(self.__stop_button)
+        buttons.addWidget(self.__progress_bar)
+
+        # Heatmap, one row per parameter and one column per page
+        self.__heatmap = QtWidgets.QTableWidget(0, 0)
+        self.__heatmap.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+
+        widget = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(widget)
+        layout.addLayout(form)
+        layout.addLayout(buttons)
+        layout.addWidget(self.__heatmap)
+        self.setCentralWidget(widget)
+
+        ui_manager = UIManager()
+        ui_manager.applyTheme(self)
+        ui_manager.themeChanged.connect(lambda: ui_manager.applyTheme(self))
+
+        self.runFinished.connect(self.onRunFinished, Qt.QueuedConnection)
+        self.__initialized = True
+
+
+    def setPages(self, panels):
+        self.__pages = list(panels)
+
+
+    def __submit(self, batch, panel, name, direction, param_dict):
+        """Runs one simulation, or takes its result from the cache."""
+        key = SimulationScheduler().cache().key(panel.scriptFile(), param_dict,\
+                ngspice_con.BACKEND, ngspice_con.OUTPUT_FORMAT)
+        data = SimulationScheduler().cache().get(key)
+        if data is not None:
+            self.__addResult(panel, name, direction, data)
+            return
+        batch.submit(panel.scriptFile(), param_dict, panel.timeout(),\
+                (batch, panel, name, direction, key))
+
+
+    @Slot()
+    def start(self):
+        pages = [panel for panel in self.__pages if panel.enabled() and panel.scriptFile()]
+        self.__metric = self.__metric_combo.currentText()
+        if self.__metric == 'Fit Error':
+            pages = [panel for panel in pages if panel.dataFile()]
+        if not pages:
+            QtWidgets.QMessageBox.warning(self, 'Sensitivity Analysis',\
+                    'No page has a script to run' +\
+                    (' and a data file to compare with.' if self.__metric == 'Fit Error' else '.'))
+            return
+
+        self.stop()
+        batch = SimulationScheduler().submitBatch(callback=self.runFinished.emit)
+        self.__batch = batch
+        self.__step = self.__step_spin.value() / 100.0
+        self.__running = pages
+        self.__results = {}
+
+        self.__references = {}
+        self.__evaluators = {}
+        if self.__metric == 'Fit Error':
+            for panel in pages:
+                self.__references[panel] = panel.graph().loadFile(panel.dataFile())
+                self.__evaluators[panel] = FitEvaluator()
+
+        param_dict = dict(pages[0].paramDict())
+        runs = perturbations(param_dict, self.__step)
+        self.__names = list(dict.fromkeys(name for name, direction, params in runs))
+
+        # Heatmap
+        table = self.__heatmap
+        table.setSortingEnabled(False)
+        table.clear()
+        table.setRowCount(len(self.__names))
+        table.setColumnCount(len(pages) + 1)
+        table.setHorizontalHeaderLabels([panel.windowTitle() for panel in pages] + ['Max'])
+        table.setVerticalHeaderLabels(self.__names)
+        for row in range(len(self.__names)):
+            for column in range(len(pages) + 1):
+                table.setItem(row, column, SensitivityItem())
+
+        self.__progress_bar.setRange(0, (len(runs) + 1) * len(pages))
+        self.__progress_bar.setValue(0)
+
+        # The nominal runs first, so that every pair of perturbed runs can
+        # be rated as soon as it is finished
+        for panel in pages:
+            self.__submit(batch, panel, None, 0, param_dict)
+        for name, direction, params in runs:
+            for panel in pages:
+                self.__submit(batch, panel, name, direction, params)
+
+
+    @Slot()
+    def stop(self):
+        """Cancels the queued runs and kills the running ones."""
+        if self.__batch is not None:
+            self.__batch.cancel()
+            self.__batch = None
+
+
+    @Slot(object, object)
+    def onRunFinished(self, future, stamp):
+        batch, panel, name, direction, key = stamp
+        if future.cancelled():
+            return
+
+        try:
+            data, diagnostics = future.result()
+        except (SimulationError, BrokenProcessPool) as e:
+            print(f"Warning: sensitivity run of '{name or 'nominal'}' failed: {e}")
+            data = None
+        except Exception as e:
+            print(str(e))
+            data = None
+
+        SimulationScheduler().cache().put(key, data)
+        if batch is not self.__batch:
+            # The analysis was stopped or restarted
+            return
+        self.__addResult(panel, name, direction, data)
+
+
+    def __addResult(self, panel, name, direction, data):
+        self.__results[(panel, name, direction)] = data
+        self.__progress_bar.setValue(self.__progress_bar.value() + 1)
+
+        names = self.__names if name is None else [name]
+        for name in names:
+            self.__updateCell(panel, name)
+
+        if self.__progress_bar.value() >= self.__progress_bar.maximum():
+            # All runs finished. The most influential parameters go on top
+            self.__batch = None
+            self.__updateColors()
+            self.__heatmap.setSortingEnabled(True)
+            self.__heatmap.sortItems(self.__heatmap.columnCount() - 1, Qt.DescendingOrder)
+
+
+    def __updateCell(self, panel, name):
+        """Rates the parameter on the page once its nominal run and both
+        perturbed runs are finished."""
+        keys = [(panel, None, 0), (panel, name, UP), (panel, name, DOWN)]
+        if any(key not in self.__results for key in keys):
+            return
+        base, up, down = [self.__results[key] for key in keys]
+
+        if self.__metric == 'Fit Error':
+            value = errorSensitivity(base, up, down, self.__references.get(panel), self.__step,\
+                    self.__evaluators[panel], panel.graph().logScaleX(), panel.graph().logScaleY())
+        else:
+            value = curveSensitivity(base, up, down, self.__step)
+
+        row = self.__names.index(name)
+        column = self.__running.index(panel)
+        self.__setValue(self.__heatmap.item(row, column), value)
+
+        # The largest magnitude over the pages
+        values = [self.__heatmap.item(row, c).data(Qt.UserRole)\
+                for c in range(len(self.__running))]
+        values = [abs(v) for v in values if v is not None and np.isfinite(v)]
+        if values:
+            self.__setValue(self.__heatmap.item(row, len(self.__running)), max(values))
+
+
+    def __setValue(self, item, value):
+        item.setData(Qt.UserRole, value)
+        item.setText(f'{value:.3G}' if np.isfinite(value) else 'N/A')
+        self.__colorItem(item, self.__maximum())
+
+
+    def __maximum(self):
+        """Returns the largest finite sensitivity magnitude of the heatmap."""
+        table = self.__heatmap
+        column = table.columnCount() - 1
+        values = [table.item(row, column).data(Qt.UserRole) for row in range(table.rowCount())]
+        values = [v for v in values if v is not None and np.isfinite(v)]
+        return max(values) if values else 0.0
+
+
+    def __colorItem(self, item, maximum):
+        """Colours a cell on a log scale relative to `maximum`: red for a
+        positive sensitivity and blue for a negative one."""
+        value = item.data(Qt.UserRole)
+        if value is None or not np.isfinite(value) or maximum <= 0 or value == 0:
+            item.setBackground(QtGui.QBrush())
+            item.setForeground(QtGui.QBrush())
+            return
+        level = 1.0 + np.log10(min(abs(value) / maximum, 1.0)) / COLOR_DECADES
+        level = float(np.clip(level, 0.0, 1.0))
+        shade = int(255 * (1.0 - level))
+        color = QtGui.QColor(255, shade, shade) if value > 0 else QtGui.QColor(shade, shade, 255)
+        item.setBackground(color)
+        item.setForeground(QtGui.QColor(0, 0, 0))
+
+
+    def __updateColors(self):
+        maximum = self.__maximum()
+        table = self.__heatmap
+        for row in range(table.rowCount()):
+            for column in range(table.columnCount()):
+                self.__colorItem(table.item(row, column), maximum)
@@ -20,9 +20,16 @@ import sys, os
 
 from graph import Graph
 from ui_manager import UIManager
-from parameter_io import ParameterIO
 from code_editor_window import CodeEditorWindow
-import ngspice_con
+from diagnostics_viewer import DiagnosticsViewer
+from fit_metrics import FitEvaluator
+from simulation_scheduler import SimulationScheduler
+from stage_timer import StageTimer, TimingHistory
+from sweep_window import SweepWindow
+
+# Sweep results kept and drawn behind the result of a page. Later results
+# of a larger sweep are only listed in the sweep window
+MAX_OVERLAYS = 200
 
 
 class LineEdit(QtWidgets.QLineEdit):
@@ -38,6 +45,9 @@ class LineEdit(QtWidgets.QLineEdit):
 
 class SimulationPanel(QtWidgets.QMainWindow):
 
+    # Signal emitted when the fit metrics of the page are updated
+    metricsChanged = Signal()
+
 
     def __init__(self, param_dict, default_title, parent=None):
         super().__init__(parent)
@@ -47,6 +57,13 @@ class SimulationPanel(QtWidgets.QMainWindow):
         self.__script_file = ''
         self.__data_file = ''
         self.__enabled = True
+        self.__timeout = 0.0 # Seconds, 0 to use the global limit
+        self.__diagnostics = None # RunDiagnostics of the latest run
+        self.__timings = TimingHistory()
+        self.__overlays = [] # Results of parameter sweeps drawn behind the result
+        self.__result = None # Latest simulation result shown
+        self.__fit_evaluator = FitEvaluator()
+        self.__metrics = None # FitMetrics of the result against the data
 
         # Set the default window title
         self.setWindowTitle(default_title)
@@ -80,6 +97,26 @@ class SimulationPanel(QtWidgets.QMainWindow):
         action.triggered.connect(self.toggleEnabled)
         SIMULATION_menu.addAction(action)
 
+        # "Simulation">"Timeout..."
+        action = QtGui.QAction('Timeout...', self)
+        action.triggered.connect(self.browseTimeout)
+        SIMULATION_menu.addAction(action)
+
+        # "Simulation">"Cancel"
+        action = QtGui.QAction('Cancel', self)
+        action.triggered.connect(self.cancel)
+        SIMULATION_menu.addAction(action)
+
+        # "Simulation">"Diagnostics..."
+        action = QtGui.QAction('Diagnostics...', self)
+        action.triggered.connect(self.openDiagnostics)
+        SIMULATION_menu.addAction(action)
+
+        # "Simulation">"Parameter Sweep..."
+        action = QtGui.QAction('Parameter Sweep...', self)
+        action.triggered.connect(self.openSweep)
+        SIMULATION_menu.addAction(action)
+
         # "Simulation">"Rename Title"
         action = QtGui.QAction('Rename Title', self)
         action.triggered.connect(self.renameTitle)
@@ -95,6 +132,11 @@ class SimulationPanel(QtWidgets.QMainWindow):
         action.triggered.connect(self.setAxisTitles)
         GRAPH_menu.addAction(action)
 
+        # "Graph">"Clear Sweep Overlay"
+        action = QtGui.QAction('Clear Sweep Overlay', self)
+        action.triggered.connect(self.clearOverlays)
+        GRAPH_menu.addAction(action)
+
         # "Graph">"Log Scale"
         log_scale_menu = GRAPH_menu.addMenu('Log Scale')
 
@@ -145,6 +187,18 @@ class SimulationPanel(QtWidgets.QMainWindow):
 
         status_bar.addWidget(self.__enabled_checkbox)
 
+        # Status bar > Status of the latest run
+        self.__status_label = QtWidgets.QLabel()
+        status_bar.addWidget(self.__status_label)
+
+        # Status bar > Goodness of fit against the reference data
+        self.__metrics_label = QtWidgets.QLabel()
+        status_bar.addWidget(self.__metrics_label)
+
+        # Status bar > Time taken by the latest update
+        self.__timing_label = QtWidgets.QLabel()
+        status_bar.addWidget(self.__timing_label)
+
         # Status bar >"Script:"
         self.__script_edit = LineEdit()
         self.__script_edit.setToolTip('Double-click to open with an editor')
@@ -197,6 +251,73 @@ class SimulationPanel(QtWidgets.QMainWindow):
         self.__data_edit.setText(value)
 
 
+    def timeout(self):
+        return self.__timeout
+
+
+    def setTimeout(self, value):
+        if not isinstance(value, (int, float)) or value < 0:
+            raise ValueError("setTimeout(): `value` must be a non-negative number.")
+        self.__timeout = float(value)
+
+
+    def setStatus(self, text):
+        self.__status_label.setText(text)
+
+
+    def timings(self):
+        return self.__timings
+
+
+    def addTimings(self, stages):
+        """Records the stage timings of an update and shows the last and the
+        rolling-average total."""
+        self.__timings.append(stages)
+        self.__timing_label.setText(self.__timings.summary())
+        self.__timing_label.setToolTip(self.__timings.details())
+
+
+    def overlays(self):
+        return list(self.__overlays)
+
+
+    def addOverlay(self, data):
+        """Adds a sweep result to the overlay and draws it right away."""
+        if data is None or len(self.__overlays) >= MAX_OVERLAYS:
+            return
+        self.__overlays.append(data)
+        self.__graph.plotOverlays(self.__overlays)
+
+
+    @Slot()
+    def clearOverlays(self):
+        self.__overlays.clear()
+        self.showResult(self.__result)
+
+
+    def metrics(self):
+        return self.__metrics
+
+
+    def setMetrics(self, metrics):
+        self.__metrics = metrics
+        self.__metrics_label.setText(metrics.summary() if metrics else '')
+        self.__metrics_label.setToolTip(metrics.details() if metrics else '')
+        self.metricsChanged.emit()
+
+
+    def diagnostics(self):
+        return self.__diagnostics
+
+
+    def setDiagnostics(self, diagnostics):
+        self.__diagnostics = diagnostics
+        self.__status_label.setToolTip(diagnostics.summary() if diagnostics else '')
+        warnings = diagnostics.warnings() if diagnostics else []
+        if warnings and not self.__status_label.text():
+            self.__status_label.setText(f'{len(warnings)} warnings')
+
+
     def graph(self):
         return self.__graph
 
@@ -227,6 +348,36 @@ class SimulationPanel(QtWidgets.QMainWindow):
         self.update_()
 
 
+    @Slot()
+    def browseTimeout(self):
+        d, ok = QtWidgets.QInputDialog.getDouble(self,\
+                'Timeout', 'Timeout in seconds (0 to use the global limit):',\
+                self.__timeout, 0.0, 86400.0, 1, Qt.WindowFlags(), 1.0)
+        if ok:
+            self.setTimeout(d)
+
+
+    @Slot()
+    def cancel(self):
+        SimulationScheduler().cancel([self])
+
+
+    @Slot()
+    def openDiagnostics(self):
+        viewer = DiagnosticsViewer()
+        viewer.setCurrentPage(self)
+        viewer.show()
+        viewer.raise_()
+
+
+    @Slot()
+    def openSweep(self):
+        window = SweepWindow()
+        window.setPages([self])
+        window.show()
+        window.raise_()
+
+
     @Slot()
     def renameTitle(self):
         text, ok = QtWidgets.QInputDialog.getText(self,\
@@ -240,6 +391,8 @@ class SimulationPanel(QtWidgets.QMainWindow):
         self.setScriptFile('')
         self.setDataFile('')
         self.setEnabled(True)
+        self.setTimeout(0.0)
+        self.__overlays.clear()
 
         # Reset the window title
         self.setWindowTitle(self.__default_title)
@@ -358,48 +511,77 @@ class SimulationPanel(QtWidgets.QMainWindow):
         editor.show()
 
 
-    @Slot()
-    def update_(self):
+    def paramDict(self):
+        return self.__param_dict
+
+
+    def updateMenu(self):
         # Update check states of the menu actions
         self.__LOGSCALE_X_action.setChecked(self.__graph.logScaleX())
         self.__LOGSCALE_Y_action.setChecked(self.__graph.logScaleY())
         for key, action in self.__COORDINATES_actions.items():
             action.setChecked(key == self.__graph.coordinates())
 
-        if not self.__enabled:
-            return
 
-        # Initialize graph view
-        self.__graph.initialize()
+    def showResult(self, data, timer=None):
+        """Plots the simulation result (None if not available) together with
+        the reference data. The time taken is added to the StageTimer `timer`."""
+        timer = timer or StageTimer()
+        self.__result = data
+
+        # Load the reference data
+        reference = None
+        if self.__data_file:
+            with timer.measure('Load Data'):
+                reference = Graph.loadFile(self.__data_file)
+
+        with timer.measure('Fit Metrics'):
+            self.setMetrics(self.__fit_evaluator.evaluate(data, reference,\
+                    self.__graph.logScaleX(), self.__graph.logScaleY()))
 
         try:
-            # Run ngspice simulation and plot the result
-            if self.__script_file:
-                # Write parameters to "model.txt"
-                working_dir = os.path.dirname(os.path.abspath(self.__script_file))
-                output_file = os.path.join(working_dir, 'model.txt')
-                parameter_io = ParameterIO()
-                parameter_io.write(self.__param_dict, output_file)
+            with timer.measure('Plot'):
+                # Initialize graph view
+                self.__graph.initialize()
 
-                # Run ngspice_con
-                ngspice_con.run(self.__script_file)
+                # Plot the sweep results behind the others
+                self.__graph.plotOverlays(self.__overlays)
 
                 # Plot the simulation result
-                root, ext = os.path.splitext(self.__script_file)
-                result_file = root + '.txt'
-
-                ui_manager = UIManager()
-                symbol_color = 'k' if ui_manager.theme() == 'Light' else 'w'
-                self.__graph.plotFile(\
-                        result_file,\
-                        symbol_pen=symbol_color,\
-                        symbol_brush=symbol_color)
-
-            # Plot the reference data
-            if self.__data_file:
-                self.__graph.plotFile(self.__data_file,\
-                        symbol_pen='r',\
-                        symbol_brush='r')
+                if data is not None:
+                    ui_manager = UIManager()
+                    symbol_color = 'k' if ui_manager.theme() == 'Light' else 'w'
+                    self.__graph.plotData(\
+                            data,\
+                            symbol_pen=symbol_color,\
+                            symbol_brush=symbol_color)
+
+                # Plot the reference data
+                if reference is not None:
+                    self.__graph.plotData(reference,\
+                            symbol_pen='r',\
+                            symbol_brush='r')
 
         except Exception as e:
             print(str(e))
+
+
+    def showPreview(self, preview):
+        """Plots the part of the result computed so far by the running
+        simulation over the last result, until showResult() is called."""
+        try:
+            self.__graph.plotPreview(preview)
+        except Exception as e:
+            print(str(e))
+
+
+    @override
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Catch up on the updates deferred while the page was hidden
+        SimulationScheduler().pageShown(self)
+
+
+    @Slot()
+    def update_(self):
+        SimulationScheduler().run([self])
@@ -0,0 +1,714 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+from PySide6 import QtCore
+from PySide6.QtCore import Signal, Slot, Qt
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import ngspice_con
+import ngspice_pool
+import run_directory
+import sweep_partition
+import warm_start
+from dependency_index import DependencyIndex
+from remote_worker import RemoteExecutor
+from result_cache import ResultCache
+from run_limits import RunLimits, SimulationError
+from stage_timer import StageTimer
+
+# Default quiet period in milliseconds before a burst of changes is simulated
+DEFAULT_QUIET_PERIOD = 150
+
+# A burst is never delayed longer than this multiple of the quiet period
+MAX_DELAY_FACTOR = 4
+
+# Milliseconds between two looks at the previews of the running pages
+PREVIEW_INTERVAL = 200
+
+# Priorities of the runs of a page, the lowest first
+PRIORITY_FOCUSED = 0 # The page the user is working on
+PRIORITY_VISIBLE = 1 # The other pages on screen
+PRIORITY_HIDDEN = 2  # Pages tabbed behind others or closed
+PRIORITY_BATCH = 3   # Runs of the sweep, fit and sensitivity windows
+
+
+def _forward(source, target):
+    """Completes the running Future `target` like the finished `source`."""
+    if source.cancelled():
+        target.set_exception(concurrent.futures.CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class SimulationBatch:
+    """Handle of the runs of a sweep, a fit or a sensitivity analysis,
+    cancelled together through one cancel file. `callback(future, stamp)`
+    is called from the executor thread when each run is finished; it is not
+    called for the runs dropped by cancel()."""
+
+    def __init__(self, scheduler, callback=None):
+        self.__scheduler = scheduler
+        self.__callback = callback
+        self.__cancel_file = os.path.join(run_directory.baseDir(), 'cancel', uuid.uuid4().hex)
+        self.__futures = set() # Runs not finished yet
+        self.__cancelled = False
+        self.__lock = threading.Lock() # A fit submits from its optimizer thread
+
+
+    def submit(self, script_name, param_dict, timeout=0, stamp=None):
+        """Submits a run of the script and returns its Future, already
+        cancelled if the batch is."""
+        limits = self.__scheduler.limits().copy(\
+                timeout=timeout if timeout > 0 else None,\
+                cancel_file=self.__cancel_file)
+        with self.__lock:
+            if self.__cancelled:
+                future = concurrent.futures.Future()
+                future.cancel()
+                return future
+            future = self.__scheduler.queueRun((script_name, param_dict,\
+                    ngspice_con.BACKEND, ngspice_con.OUTPUT_FORMAT, limits))
+            self.__futures.add(future)
+        future.add_done_callback(lambda future, stamp=stamp: self.__finished(future, stamp))
+        return future
+
+
+    def __finished(self, future, stamp):
+        with self.__lock:
+            self.__futures.discard(future)
+            cancelled, last = self.__cancelled, not self.__futures
+        if not cancelled:
+            if self.__callback is not None:
+                self.__callback(future, stamp)
+        elif last and os.path.exists(self.__cancel_file):
+            # The killed runs have seen the cancel file
+            try:
+                os.remove(self.__cancel_file)
+            except OSError:
+                pass
+
+
+    def isCancelled(self):
+        return self.__cancelled
+
+
+    def cancel(self):
+        """Cancels the queued runs and kills the running ones. Results
+        arriving later are dropped."""
+        with self.__lock:
+            self.__cancelled = True
+            futures = list(self.__futures)
+        running = [future for future in futures if not future.cancel() and not future.done()]
+        if running:
+            try:
+                os.makedirs(os.path.dirname(self.__cancel_file), exist_ok=True)
+                open(self.__cancel_file, 'w').close()
+            except OSError as e:
+                print(f"Warning: failed to cancel the simulations: {e}")
+
+
+class SimulationScheduler(QtCore.QObject):
+    """Singleton class running the simulations of several pages in parallel
+    on a pool of worker processes, or of threads with the Pool backend, whose
+    runs only wait on their ngspice worker. The runs of the pages wait in a
+    queue and are handed to the workers as these become free, the page of the
+    highest priority first."""
+
+    # Signal emitted from the executor thread when a run is finished
+    jobFinished = Signal(object, object, object)
+
+    # Signal emitted when the diagnostics of a page have been updated
+    diagnosticsChanged = Signal(object)
+
+    # Signals passing the runs of batches to the GUI thread, which owns the
+    # queue, when they are queued and when they are finished
+    batchQueued = Signal(object)
+    batchFinished = Signal(object)
+
+
+    _inst = None
+
+    def __new__(cls):
+        if cls._inst is None:
+            cls._inst = super(SimulationScheduler, cls).__new__(cls)
+            cls._inst.__initialized = False
+
+        return cls._inst
+
+
+    def __init__(self):
+        if self.__initialized:
+            return
+
+        super().__init__() # Initialize QObject
+        self.__executor = None
+        self.__remote = None  # RemoteExecutor of the remote workers, if any
+        self.__remote_workers = []
+        self.__max_workers = os.cpu_count() or 1
+        self.__version = 0  # Incremented for every parameter snapshot
+        self.__latest = {}  # Version of the latest run submitted for each page
+        self.__futures = {} # Future of the latest run submitted for each page
+        self.__queue = []   # Runs waiting for a free worker, in submission order
+        self.__running = {} # Number of workers taken by each running run
+        self.__priority_function = None
+        self.__cache = ResultCache()
+        self.__limits = RunLimits()
+        self.__dependencies = DependencyIndex()
+        self.__split_sweeps = False # Split the sweep of a page over the workers
+        self.__warm_start = False # Start each run from the operating point of the last one
+        self.__nodesets = {}      # (script file, node voltages) of the last run of each page
+        self.__progressive = False # Plot the result of a page while it is simulated
+        self.__previews = {}       # [preview file, modification time] of the run of each page
+        self.__lazy = False   # Defer the runs of hidden pages until they are shown
+        self.__dirty = {}     # Hidden pages whose result is out of date, in order
+        run_directory.removeStale()
+
+        # Coalescing of bursts of update requests
+        self.__scheduled = {} # Pages waiting for the quiet period, in order
+        self.__quiet_period = DEFAULT_QUIET_PERIOD
+        self.__quiet_timer = QtCore.QTimer(self)
+        self.__quiet_timer.setSingleShot(True)
+        self.__quiet_timer.timeout.connect(self.runScheduled)
+        self.__burst_timer = QtCore.QElapsedTimer()
+
+        # Polling of the previews written by the running simulations
+        self.__preview_timer = QtCore.QTimer(self)
+        self.__preview_timer.setInterval(PREVIEW_INTERVAL)
+        self.__preview_timer.timeout.connect(self.pollPreviews)
+        self.jobFinished.connect(self.onFinished, Qt.QueuedConnection)
+        self.batchQueued.connect(self.onBatchQueued, Qt.QueuedConnection)
+        self.batchFinished.connect(self.onBatchFinished, Qt.QueuedConnection)
+        self.__initialized = True
+
+
+    def maxWorkers(self):
+        return self.__max_workers
+
+
+    def setMaxWorkers(self, value):
+        if not isinstance(value, int) or value < 1:
+            raise ValueError("setMaxWorkers(): `value` must be a positive integer.")
+        if value != self.__max_workers:
+            self.__max_workers = value
+            self.shutdown() # The pool is recreated with the new size on the next run
+            if ngspice_con.BACKEND == 'Pool':
+                self.startWorkers()
+
+
+    def cache(self):
+        return self.__cache
+
+
+    def quietPeriod(self):
+        return self.__quiet_period
+
+
+    def setQuietPeriod(self, value):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError("setQuietPeriod(): `value` must be a non-negative integer.")
+        self.__quiet_period = value
+
+
+    def executor(self):
+        if self.__executor is None:
+            if ngspice_con.BACKEND == 'Pool':
+                # The runs of the Pool backend only wait on their 'ngspice_con'
+                # worker, so they run on threads of this process, whose single
+                # worker pool keeps each script loaded in the same worker
+                ngspice_pool.setMaxWorkers(self.__max_workers)
+                self.__executor = concurrent.futures.ThreadPoolExecutor(\
+                        max_workers=self.__max_workers)
+            else:
+                self.__executor = concurrent.futures.ProcessPoolExecutor(\
+                        max_workers=self.__max_workers,\
+                        mp_context=multiprocessing.get_context('spawn'))
+        return self.__executor
+
+
+    def startWorkers(self):
+        """Starts the 'ngspice_con' workers of the Pool backend in the
+        background, ahead of the first run of the pages."""
+        self.executor()
+        ngspice_pool.startWorkers(min(ngspice_pool.DEFAULT_WORKERS, self.__max_workers))
+
+
+    def shutdown(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+
+
+    def remoteWorkers(self):
+        return list(self.__remote_workers)
+
+
+    def setRemoteWorkers(self, addresses):
+        """Sets the addresses ('host:port' or 'unix:path') of remote workers
+        to run the simulations on instead of the local pool. The workers are
+        connected right away; the local pool is used while none is reachable."""
+        if not isinstance(addresses, (list, tuple)) or\
+                not all(isinstance(address, str) for address in addresses):
+            raise ValueError("setRemoteWorkers(): `addresses` must be a list of strings.")
+        if self.__remote is not None:
+            self.__remote.shutdown(wait=False, cancel_futures=True)
+            self.__remote = None
+        self.__remote_workers = [address.strip() for address in addresses if address.strip()]
+        if self.__remote_workers:
+            self.__remote = RemoteExecutor(self.__remote_workers)
+
+
+    def remoteSlots(self):
+        """Returns the number of simulations the remote workers run at a time."""
+        return self.__remote.alive() if self.__remote is not None else 0
+
+
+    def submit(self, fn, *args, **kwargs):
+        """Submits a job to the remote workers if there are any, or to the
+        pool, recreating the pool if a worker died."""
+        if self.__remote is not None and fn is ngspice_con.simulate and self.__remote.alive():
+            try:
+                return self.__remote.submit(fn, *args, **kwargs)
+            except SimulationError:
+                pass # The last remote worker just went away
+        try:
+            return self.executor().submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self.shutdown()
+            return self.executor().submit(fn, *args, **kwargs)
+
+
+    def queueRun(self, args):
+        """Queues a run of a batch with the arguments `args` of
+        ngspice_con.simulate() and returns its Future. It waits behind the
+        runs of the pages. May be called from any thread."""
+        future = concurrent.futures.Future()
+        self.batchQueued.emit((future, None, args, {}, None, 1))
+        return future
+
+
+    @Slot(object)
+    def onBatchQueued(self, job):
+        future = job[0]
+        future.add_done_callback(lambda future: self.batchFinished.emit(future))
+        self.__queue.append(job)
+        self.dispatch()
+
+
+    @Slot(object)
+    def onBatchFinished(self, future):
+        if self.__running.pop(future, None) is not None:
+            self.dispatch() # A worker became free
+
+
+    def submitBatch(self, jobs=(), callback=None):
+        """Submits the runs `jobs`, as (script file, parameters, timeout,
+        stamp), and returns their SimulationBatch, to which more runs can be
+        submitted."""
+        batch = SimulationBatch(self, callback)
+        for script_name, param_dict, timeout, stamp in jobs:
+            batch.submit(script_name, param_dict, timeout, stamp)
+        return batch
+
+
+    def version(self):
+        return self.__version
+
+
+    def priorityFunction(self):
+        return self.__priority_function
+
+
+    def setPriorityFunction(self, function):
+        """Sets the function returning the priority of a page, one of the
+        PRIORITY_* values. It is called whenever a worker becomes free, so
+        the order of the queued runs follows the pages the user looks at."""
+        if function is not None and not callable(function):
+            raise ValueError("setPriorityFunction(): `function` must be callable.")
+        self.__priority_function = function
+
+
+    def priority(self, panel):
+        if panel is None:
+            return PRIORITY_BATCH
+        if self.__priority_function is not None:
+            return self.__priority_function(panel)
+        return PRIORITY_VISIBLE if panel.isVisible() else PRIORITY_HIDDEN
+
+
+    def capacity(self):
+        """Returns the number of runs the workers take at a time."""
+        return self.remoteSlots() or self.__max_workers
+
+
+    def queued(self):
+        """Returns the pages whose runs wait for a free worker."""
+        return [job[1] for job in self.__queue if not job[0].cancelled() and job[1] is not None]
+
+
+    def splitSweeps(self):
+        return self.__split_sweeps
+
+
+    def setSplitSweeps(self, value):
+        if not isinstance(value, bool):
+            raise ValueError("setSplitSweeps(): `value` must be a boolean.")
+        self.__split_sweeps = value
+
+
+    def warmStart(self):
+        return self.__warm_start
+
+
+    def setWarmStart(self, value):
+        if not isinstance(value, bool):
+            raise ValueError("setWarmStart(): `value` must be a boolean.")
+        self.__warm_start = value
+        self.__nodesets.clear()
+
+
+    def nodeset(self, panel):
+        """Returns the node voltages of the last operating point of the page,
+        empty if not known, or None if the warm start is off."""
+        if not self.__warm_start:
+            return None
+        script_file, nodeset = self.__nodesets.get(panel, ('', None))
+        return dict(nodeset) if nodeset and script_file == panel.scriptFile() else {}
+
+
+    def progressive(self):
+        return self.__progressive
+
+
+    def setProgressive(self, value):
+        if not isinstance(value, bool):
+            raise ValueError("setProgressive(): `value` must be a boolean.")
+        self.__progressive = value
+
+
+    @Slot()
+    def pollPreviews(self):
+        """Plots the previews written by the running simulations since the
+        last poll."""
+        if not self.__previews:
+            self.__preview_timer.stop()
+            return
+        for panel, entry in list(self.__previews.items()):
+            try:
+                mtime = os.stat(entry[0]).st_mtime_ns
+            except OSError:
+                continue # Not started, or nothing computed yet
+            if mtime == entry[1]:
+                continue
+            entry[1] = mtime
+            preview = run_directory.readPreview(entry[0])
+            if preview is not None:
+                panel.showPreview(preview)
+
+
+    def lazy(self):
+        return self.__lazy
+
+
+    def setLazy(self, value):
+        if not isinstance(value, bool):
+            raise ValueError("setLazy(): `value` must be a boolean.")
+        self.__lazy = value
+        if not value and self.__dirty:
+            # Bring the deferred pages up to date
+            panels = list(self.__dirty)
+            self.__dirty.clear()
+            self.run(panels)
+
+
+    def isDirty(self, panel):
+        return panel in self.__dirty
+
+
+    def pageShown(self, panel):
+        """Runs a page deferred while it was hidden, now that it is shown."""
+        if panel in self.__dirty:
+            del self.__dirty[panel]
+            self.run([panel])
+
+
+    def dependencyIndex(self):
+        return self.__dependencies
+
+
+    def schedule(self, panels, key=''):
+        """Requests a run of the pages once the changes have settled for the
+        quiet period. Requests arriving in the meantime are merged.
+        If the name of the changed parameter `key` is given, only the pages
+        whose scripts depend on it are run."""
+        if key:
+            panels = [panel for panel in panels\
+                    if self.__dependencies.dependsOn(panel.scriptFile(), key)]
+        if not panels:
+            return
+
+        if not self.__scheduled:
+            self.__burst_timer.start()
+        for panel in panels:
+            self.__scheduled[panel] = None
+
+        # Keep postponing during a burst, but not beyond the maximum delay
+        if self.__burst_timer.elapsed() < self.__quiet_period * MAX_DELAY_FACTOR\
+                or not self.__quiet_timer.isActive():
+            self.__quiet_timer.start(self.__quiet_period)
+
+
+    @Slot()
+    def runScheduled(self):
+        panels = list(self.__scheduled)
+        self.__scheduled.clear()
+        self.run(panels)
+
+
+    def limits(self):
+        """Returns the global RunLimits applied to every run."""
+        return self.__limits
+
+
+    def setLimits(self, limits):
+        if not isinstance(limits, RunLimits):
+            raise ValueError("setLimits(): `limits` must be a RunLimits.")
+        self.__limits = limits
+
+
+    def cancel(self, panels=None):
+        """Cancels the runs of the given pages (all pages if None) that are
+        queued or in flight. Running ngspice processes are killed."""
+        for panel in list(self.__futures) if panels is None else panels:
+            if self.__cancelRun(panel):
+                # Results arriving later for this page are dropped
+                self.__latest[panel] = None
+                panel.setStatus('Cancelled')
+
+
+    def __cancelRun(self, panel):
+        job = self.__futures.pop(panel, None)
+        if job is None:
+            return False
+        future, cancel_file = job
+        if not future.cancel():
+            # Already running: tell the worker to kill ngspice
+            try:
+                os.makedirs(os.path.dirname(cancel_file), exist_ok=True)
+                open(cancel_file, 'w').close()
+            except OSError as e:
+                print(f"Warning: failed to cancel the simulation: {e}")
+        return True
+
+
+    def run(self, panels):
+        """Submits the simulations of the enabled pages without blocking.
+        Each result is plotted when it arrives, unless a newer run of the same
+        page has been submitted in the meantime."""
+        self.__version += 1
+        version = self.__version
+
+        for panel in panels:
+            panel.updateMenu()
+            if not panel.enabled():
+                continue
+
+            if self.__lazy and not panel.isVisible():
+                # Nobody is looking at the page: mark it dirty and drop its
+                # in-flight run, it is run again when the page is shown
+                self.__dirty[panel] = None
+                if self.__cancelRun(panel):
+                    self.__latest[panel] = None
+                continue
+            self.__dirty.pop(panel, None)
+            self.__latest[panel] = version
+
+            # Latest wins: the stale run of the page is cancelled, and its
+            # result is dropped if it arrives anyway
+            self.__cancelRun(panel)
+
+            if not panel.scriptFile() or not ngspice_con.RUN_ENABLED:
+                panel.showResult(None)
+                panel.setStatus('')
+                continue
+
+            # A result that is already known is plotted without running ngspice
+            timer = StageTimer()
+            with timer.measure('Cache Lookup'):
+                param_dict = dict(panel.paramDict())
+                key = self.__cache.key(panel.scriptFile(), param_dict,\
+                        ngspice_con.BACKEND, ngspice_con.OUTPUT_FORMAT)
+                data = self.__cache.get(key)
+            if data is not None:
+                panel.showResult(data, timer)
+                panel.setStatus('')
+                panel.addTimings(timer.stages())
+                continue
+
+            # The page timeout overrides the global one
+            cancel_file = os.path.join(run_directory.baseDir(), 'cancel', uuid.uuid4().hex)
+            limits = self.__limits.copy(\
+                    timeout=panel.timeout() if panel.timeout() > 0 else None,\
+                    cancel_file=cancel_file)
+
+            # Parameters are snapshotted here, written, simulated and parsed
+            # in the worker process. A long sweep is split over the workers
+            # and stitched back together
+            args = (panel.scriptFile(), param_dict,\
+                    ngspice_con.BACKEND, ngspice_con.OUTPUT_FORMAT, limits)
+            kwargs = {'nodeset': self.nodeset(panel)}
+            sweep = sweep_partition.partition(panel.scriptFile()) if self.__split_sweeps else None
+            chunks = sweep.chunks(self.capacity()) if sweep else 1
+
+            # The result computed so far is written to a preview file while
+            # the run goes on, by the backends able to
+            preview_file = ''
+            if self.__progressive and ngspice_con.showsPreview() and chunks == 1:
+                preview_file = os.path.join(run_directory.baseDir(), 'previews',\
+                        uuid.uuid4().hex + '.npy')
+                kwargs['preview_file'] = preview_file
+                self.__previews[panel] = [preview_file, None]
+                self.__preview_timer.start()
+
+            # The run waits in the queue until a worker is free. Its Future
+            # is running once the run is handed to the workers
+            future = concurrent.futures.Future()
+            self.__queue.append((future, panel, args, kwargs, sweep, chunks))
+            self.__futures[panel] = (future, cancel_file)
+            panel.setStatus('Queued...')
+
+            # The callback runs in a worker thread of the executor, so the
+            # result is passed to the GUI thread through a queued signal
+            stamp = (version, key, cancel_file, preview_file, timer, time.perf_counter())
+            future.add_done_callback(\
+                    lambda future, panel=panel, stamp=stamp:\
+                    self.jobFinished.emit(panel, future, stamp))
+        self.dispatch()
+
+
+    def dispatch(self):
+        """Hands the queued runs to the workers while some are free, the run
+        of the page of the highest priority first, then the oldest. The runs
+        of batches come last."""
+        while True:
+            self.__queue = [job for job in self.__queue if not job[0].cancelled()]
+            if not self.__queue:
+                return
+            index = min(range(len(self.__queue)),\
+                    key=lambda i: (self.priority(self.__queue[i][1]), i))
+            future, panel, args, kwargs, sweep, chunks = self.__queue[index]
+            busy = sum(self.__running.values())
+            if busy > 0 and busy + chunks > self.capacity():
+                return
+            del self.__queue[index]
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if 'preview_file' in kwargs and self.remoteSlots():
+                # Remote workers show no preview
+                kwargs = dict(kwargs)
+                kwargs.pop('preview_file')
+                self.__previews.pop(panel, None)
+            try:
+                if chunks > 1:
+                    job = sweep_partition.submitChunks(self.submit, ngspice_con.simulate,\
+                            sweep, chunks, *args, **kwargs)
+                else:
+                    job = self.submit(ngspice_con.simulate, *args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.__running[future] = chunks
+            if panel is not None:
+                panel.setStatus('Running...')
+            job.add_done_callback(lambda job, future=future: _forward(job, future))
+
+
+    @Slot(object, object, object)
+    def onFinished(self, panel, future, stamp):
+        version, key, cancel_file, preview_file, timer, submit_time = stamp
+        if self.__running.pop(future, None) is not None:
+            self.dispatch() # A worker became free
+        if preview_file and self.__previews.get(panel, [None])[0] == preview_file:
+            del self.__previews[panel]
+        for file_name in [cancel_file, preview_file]:
+            if file_name and os.path.exists(file_name):
+                try:
+                    os.remove(file_name)
+                except OSError:
+                    pass
+        if future.cancelled():
+            return
+
+        message = ''
+        diagnostics = None
+        try:
+            data, diagnostics = future.result()
+            if data is None:
+                message = 'Simulation failed'
+        except SimulationError as e:
+            data = None
+            message = str(e)
+            diagnostics = getattr(e, 'diagnostics', None)
+        except concurrent.futures.CancelledError:
+            data = None
+            message = 'Cancelled'
+        except BrokenProcessPool as e:
+            print(f"Error: simulation worker terminated unexpectedly: {e}")
+            self.shutdown()
+            data = None
+            message = 'Simulation worker terminated'
+        except Exception as e:
+            print(str(e))
+            data = None
+            message = 'Simulation failed'
+
+        # Even a stale result is valid for the parameters it was computed from
+        self.__cache.put(key, data)
+
+        if version != self.__latest.get(panel):
+            # Computed from an older parameter snapshot
+            return
+        self.__futures.pop(panel, None)
+
+        # The next runs of the page start from the operating point printed by
+        # a cold start. A failed run drops it, so the next one starts cold
+        # and prints a new one
+        if self.__warm_start:
+            nodeset = self.nodeset(panel) or None
+            if data is None:
+                nodeset = None
+            elif diagnostics is not None:
+                nodeset = warm_start.operatingPoint(diagnostics.output()) or nodeset
+            self.__nodesets[panel] = (panel.scriptFile(), nodeset)
+
+        # Time spent waiting for a worker and passing data between processes
+        if diagnostics is not None:
+            timer.merge(diagnostics.stages())
+            timer.add('Queue', max(time.perf_counter() - submit_time - diagnostics.elapsed(), 0.0))
+
+        panel.showResult(data, timer)
+        panel.setStatus(message)
+        panel.addTimings(timer.stages())
+        if diagnostics is not None:
+            panel.setDiagnostics(diagnostics)
+            self.diagnosticsChanged.emit(panel)
@@ -0,0 +1,212 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+
+# Name of the parameter file included by every ngspice script
+MODEL_FILE = 'model.txt'
+
+
+class SpiceScript:
+    """Lightweight reader of an ngspice script, splitting it into the circuit
+    part and the .control part and locating the parameter block."""
+
+
+    def __init__(self, file_name):
+        self.__file_name = os.path.abspath(file_name)
+        self.__lines = []
+        with open(self.__file_name, 'r') as f:
+            self.__lines = f.read().splitlines()
+
+
+    def fileName(self):
+        return self.__file_name
+
+
+    def workingDir(self):
+        return os.path.dirname(self.__file_name)
+
+
+    def lines(self):
+        return list(self.__lines)
+
+
+    def circuitLines(self):
+        """Returns the lines outside of the .control ... .endc section."""
+        result = []
+        in_control = False
+        for line in self.__lines:
+            keyword = line.strip().lower()
+            if keyword.startswith('.control'):
+                in_control = True
+            elif keyword.startswith('.endc'):
+                in_control = False
+            elif not in_control:
+                result.append(line)
+        return result
+
+
+    def controlLines(self):
+        """Returns the commands of the .control section, with '+' continuation
+        lines joined and comments removed."""
+        result = []
+        in_control = False
+        for line in self.__lines:
+            keyword = line.strip().lower()
+            if keyword.startswith('.control'):
+                in_control = True
+                continue
+            if keyword.startswith('.endc'):
+                in_control = False
+                continue
+            if not in_control:
+                continue
+
+            command = stripComment(line).strip()
+            if not command or command.startswith('*'):
+                continue
+            if command.startswith('+') and result:
+                result[-1] += ' ' + command[1:].strip()
+            else:
+                result.append(command)
+        return result
+
+
+    def parameterBlocks(self):
+        """Returns a list of (kind, name) tuples for every block that includes
+        the parameter file. `kind` is either 'model' or 'param'."""
+        result = []
+        card = None
+        for line in self.circuitLines():
+            stripped = stripComment(line).strip()
+            if not stripped or stripped.startswith('*'):
+                continue
+            if stripped.startswith('+'):
+                pass
+            elif isInclude(stripped, MODEL_FILE):
+                if card is not None:
+                    result.append(card)
+            else:
+                card = None
+                fields = stripped.split()
+                keyword = fields[0].lower()
+                if keyword == '.model' and len(fields) > 1:
+                    card = ('model', fields[1])
+                elif keyword == '.param':
+                    card = ('param', '')
+        return result
+
+
+    def wrdataStatements(self):
+        """Returns a list of (file_name, [vector, ...]) for every wrdata command."""
+        result = []
+        for command in self.controlLines():
+            fields = command.split()
+            if fields[0].lower() == 'wrdata' and len(fields) > 1:
+                result.append((fields[1], fields[2:]))
+        return result
+
+
+    def setscaleMap(self):
+        """Returns a dictionary mapping vectors to the scales set with setscale."""
+        result = {}
+        for command in self.controlLines():
+            fields = command.split()
+            if fields[0].lower() == 'setscale' and len(fields) > 2:
+                for vector in fields[1:-1]:
+                    result[vector.lower()] = fields[-1]
+        return result
+
+
+    def singleScale(self):
+        """Returns True if the script sets 'wr_singlescale'."""
+        for command in self.controlLines():
+            fields = command.split()
+            if len(fields) > 1 and fields[0].lower() == 'set'\
+                    and fields[1].lower() == 'wr_singlescale':
+                return True
+        return False
+
+
+    def includeFiles(self):
+        """Returns the files pulled in with .include or .lib, recursively,
+        except the parameter file."""
+        result = []
+        self.__collectIncludes(self.__lines, self.workingDir(), result)
+        return result
+
+
+    def __collectIncludes(self, lines, working_dir, result):
+        for line in lines:
+            file_name = includedFile(line)
+            if not file_name or os.path.basename(file_name) == MODEL_FILE:
+                continue
+            path = os.path.normpath(os.path.join(working_dir, file_name))
+            if path in result:
+                continue
+            result.append(path)
+            try:
+                with open(path, 'r') as f:
+                    self.__collectIncludes(f.read().splitlines(), os.path.dirname(path), result)
+            except OSError:
+                pass
+
+
+    def resultFile(self):
+        """Returns the default result file, that is the script name with '.txt'."""
+        root, ext = os.path.splitext(self.__file_name)
+        return root + '.txt'
+
+
+def stripComment(line):
+    """Removes an inline '$' or ';' comment from a line."""
+    return re.split(r'[ \t][$;]|^[$;]', line, maxsplit=1)[0]
+
+
+def includedFile(line):
+    """Returns the file name of an .include or .lib line, or None."""
+    m = re.match(r'\.(?:inc(?:lude)?|lib)[ \t]+(?:"([^"]+)"|\'([^\']+)\'|([^ \t]+))',\
+            line.strip(), re.IGNORECASE)
+    if not m:
+        return None
+    return m.group(1) or m.group(2) or m.group(3)
+
+
+def replaceIncludedFile(line, file_name):
+    """Returns the .include or .lib line with the file name replaced."""
+    m = re.match(r'([ \t]*\.(?:inc(?:lude)?|lib)[ \t]+)(?:"[^"]+"|\'[^\']+\'|[^ \t]+)(.*)$',\
+            line, re.IGNORECASE)
+    if not m:
+        return line
+    return f'{m.group(1)}"{file_name}"{m.group(2)}'
+
+
+def isInclude(line, file_name):
+    """Returns True if the line is an .include of the given file."""
+    included = includedFile(line)
+    return included is not None and os.path.basename(included) == file_name
+
+
+def inlineParameters(lines, parameter_lines):
+    """Returns the lines with the parameter block written in place of the
+    .include of the parameter file, so that the netlist is complete in memory."""
+    result = []
+    for line in lines:
+        if isInclude(line, MODEL_FILE):
+            result.extend(parameter_lines)
+        else:
+            result.append(line)
+    return result
@@ -0,0 +1,155 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import csv
+import time
+import collections
+import contextlib
+
+# Stages of the update pipeline, in the order they happen
+STAGES = [\
+        'Cache Lookup',\
+        'Queue',\
+        'Stage Script',\
+        'Simulate',\
+        'Load Result',\
+        'Load Data',\
+        'Fit Metrics',\
+        'Plot',\
+        ]
+
+# Number of records kept per page
+DEFAULT_MAX_RECORDS = 1000
+
+# Number of latest records the rolling average is taken over
+DEFAULT_WINDOW = 20
+
+
+class StageTimer:
+    """Accumulates the wall-clock time spent in named stages of one update.
+    Instances are picklable so that worker processes can return them."""
+
+
+    def __init__(self):
+        self.__stages = {}
+
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+
+    def add(self, stage, seconds):
+        self.__stages[stage] = self.__stages.get(stage, 0.0) + seconds
+
+
+    def merge(self, stages):
+        for stage, seconds in stages.items():
+            self.add(stage, seconds)
+
+
+    def stages(self):
+        return dict(self.__stages)
+
+
+    def total(self):
+        return sum(self.__stages.values())
+
+
+class TimingHistory:
+    """Bounded history of the stage timings of one page."""
+
+
+    def __init__(self, max_records=DEFAULT_MAX_RECORDS, window=DEFAULT_WINDOW):
+        self.__records = collections.deque(maxlen=max_records)
+        self.__window = window
+
+
+    def append(self, stages):
+        self.__records.append((time.time(), dict(stages)))
+
+
+    def records(self):
+        """Returns a list of (timestamp, {stage: seconds}) tuples, oldest first."""
+        return list(self.__records)
+
+
+    def clear(self):
+        self.__records.clear()
+
+
+    def last(self):
+        return dict(self.__records[-1][1]) if self.__records else {}
+
+
+    def average(self):
+        """Returns the rolling average of each stage over the latest records.
+        A stage missing from a record (e.g. on a cache hit) counts as zero."""
+        records = list(self.__records)[-self.__window:]
+        if not records:
+            return {}
+        totals = {}
+        for timestamp, stages in records:
+            for stage, seconds in stages.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return { stage: seconds / len(records) for stage, seconds in totals.items() }
+
+
+    def summary(self):
+        """Returns the last and average total time as a short text."""
+        if not self.__records:
+            return ''
+        last = sum(self.last().values()) * 1000
+        average = sum(self.average().values()) * 1000
+        return f'{last:.0f} ms (avg {average:.0f} ms)'
+
+
+    def details(self):
+        """Returns the last and average time of each stage, one stage per line."""
+        last, average = self.last(), self.average()
+        lines = []
+        for stage in sortedStages(average):
+            lines.append(f'{stage}: {last.get(stage, 0.0) * 1000:.1f} ms'\
+                    f' (avg {average[stage] * 1000:.1f} ms)')
+        return '\n'.join(lines)
+
+
+def sortedStages(stages):
+    """Returns the stage names in pipeline order, unknown stages last."""
+    return sorted(stages, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s))
+
+
+def writeCsv(file_name, histories):
+    """Writes the timing histories, given as (page title, TimingHistory) pairs,
+    as a CSV file with one row per update and one column per stage (seconds)."""
+    stages = set()
+    for title, history in histories:
+        for timestamp, record in history.records():
+            stages.update(record)
+    stages = sortedStages(stages)
+
+    with open(file_name, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Page', 'Timestamp'] + stages + ['Total'])
+        for title, history in histories:
+            for timestamp, record in history.records():
+                writer.writerow([title,\
+                        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))]\
+                        + [f'{record.get(stage, 0.0):.6f}' for stage in stages]\
+                        + [f'{sum(record.values()):.6f}'])
@@ -0,0 +1,382 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import re
+import threading
+import concurrent.futures
+import numpy as np
+
+from run_diagnostics import RunDiagnostics
+from spice_script import SpiceScript, stripComment
+
+# Analysis commands, in the .control section or as dot cards
+ANALYSES = ['ac', 'dc', 'disto', 'noise', 'op', 'pss', 'pz', 'sens', 'sp', 'tf', 'tran']
+
+# Control commands opening a block closed by 'end'
+BLOCKS = ['while', 'repeat', 'dowhile', 'foreach', 'if']
+
+# Chunks are not made smaller than this number of sweep points
+MIN_CHUNK_POINTS = 8
+
+# Tolerances of ngspice at the end of a sweep: a dc sweep stops once the
+# source is past the stop value by this much, an ac sweep once the frequency
+# is past it by RELTOL times the frequency step
+DC_TOLERANCE = np.finfo(float).eps * 1e3
+RELTOL = 1e-3
+
+# Sweeps are not split beyond this number of points, which are generated
+MAX_POINTS = 10_000_000
+
+SI_PREFIX = {'a':1E-18, 'f':1E-15, 'p':1E-12, 'n':1E-09, 'u':1E-06, 'm':1E-03,\
+        'k':1E+03, 'meg':1E+06, 'g':1E+09, 't':1E+12, 'mil':25.4E-06}
+
+
+def spiceNumber(text):
+    """Returns the value of a SPICE number such as '1Meg' or '10u', or None
+    if the text is not a plain number (an expression or a variable)."""
+    m = re.fullmatch(r'([+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)'\
+            r'(meg|mil|a|f|p|n|u|m|k|g|t)?[a-z]*', text, re.IGNORECASE)
+    if not m:
+        return None
+    return float(m.group(1)) * SI_PREFIX.get((m.group(2) or '').lower(), 1)
+
+
+def sweepPoints(kind, scale, start, stop, step):
+    """Returns the points of a dc sweep (`scale` is ignored) or an ac or sp
+    sweep as ngspice steps through them: the dc source and a 'lin' frequency
+    are incremented by the step, a 'dec' or 'oct' frequency is multiplied by
+    the ratio of two points, each time from the last point, and the sweep
+    stops past the stop value and its tolerance. `step` is the number of
+    points of an ac or sp sweep. Returns None if the sweep is too long."""
+    if kind == 'dc':
+        delta, tolerance = step, DC_TOLERANCE
+        estimate = (stop - start) / step
+    elif scale == 'lin':
+        delta = (stop - start) / (step - 1) if step > 1 else stop - start
+        tolerance = delta * RELTOL
+        estimate = step
+    else:
+        base = 10.0 if scale == 'dec' else 2.0
+        delta = np.exp(np.log(base) / step)
+        tolerance = delta * stop * RELTOL
+        estimate = np.log(stop / start) / np.log(base) * step
+    if not np.isfinite(estimate) or estimate + 2 > MAX_POINTS:
+        return None
+
+    # The running products and sums are accumulated one point after the
+    # other, rounded like in ngspice
+    steps = np.full(int(estimate) + 3, delta)
+    steps[0] = start
+    if kind != 'dc' and scale != 'lin':
+        points = np.multiply.accumulate(steps)
+    else:
+        points = np.add.accumulate(steps)
+    past = np.sign(step if kind == 'dc' else 1.0) * (points - stop) > tolerance
+    return points[:np.argmax(past)] if past.any() else points
+
+
+def bounds(points, index, count):
+    """Returns the range [first, last) of the points of chunk `index`. The
+    bounds are floor((points * index + 0.5) / count), which ngspice computes
+    alike even if its count of points is off by a rounding error."""
+    return (2 * points * index + 1) // (2 * count), (2 * points * (index + 1) + 1) // (2 * count)
+
+
+class SweepPartition:
+    """A sweep of a script whose points do not depend on each other, so that
+    it can be split into chunks simulated in separate processes.
+
+    'dc', 'ac' and 'sp' are single sweeps whose range is split. 'loop' is
+    a .control loop 'while <index> lt <count>' starting at 'let <index> = 0',
+    as used to sweep a bias over repeated analyses, whose index range is
+    split. The loop must fill its result vectors at <index>, so that every
+    chunk writes all the rows and the rows of its own range are taken."""
+
+
+    def __init__(self, kind, line_numbers, fields, points=None):
+        self.__kind = kind
+        self.__line_numbers = line_numbers # Lines rewritten for a chunk
+        self.__fields = fields
+        self.__grid = points # Points of a dc, ac or sp sweep
+        self.__points = len(points) if points is not None else 0
+
+
+    def kind(self):
+        return self.__kind
+
+
+    def points(self):
+        """Returns the number of sweep points, 0 if only known after the run."""
+        return self.__points
+
+
+    def chunks(self, max_chunks):
+        """Returns the number of chunks to split the sweep into."""
+        if self.__points:
+            max_chunks = min(max_chunks, self.__points // MIN_CHUNK_POINTS)
+        return max(max_chunks, 1)
+
+
+    def rewrite(self, lines, index, count):
+        """Returns the script lines of chunk `index` of `count`."""
+        lines = list(lines)
+        indent = lambda n: re.match(r'[ \t]*', lines[n]).group(0)
+        fields = self.__fields
+
+        # A chunk starts at its first point of the whole sweep, written
+        # exactly, so that ngspice steps through the same points from there.
+        # It stops half a step past its last point, clear of the tolerance,
+        # except a 'lin' sweep, whose step follows from its end points
+        if self.__kind == 'dc':
+            prefix, source, start, step, step_text = fields
+            first, last = bounds(self.__points, index, count)
+            n = self.__line_numbers[0]
+            lines[n] = f'{indent(n)}{prefix}dc {source} {float(self.__grid[first])!r} '\
+                    f'{float(self.__grid[last - 1] + step / 2)!r} {step_text}'
+
+        elif self.__kind in ['ac', 'sp']:
+            prefix, scale, number, start, stop = fields
+            first, last = bounds(self.__points, index, count)
+            f_first, f_last = float(self.__grid[first]), float(self.__grid[last - 1])
+            if scale == 'lin':
+                sweep = f'lin {last - first} {f_first!r} {f_last!r}'
+            else:
+                base = 10.0 if scale == 'dec' else 2.0
+                sweep = f'{scale} {number:g} {f_first!r} {f_last * base ** (0.5 / number)!r}'
+            n = self.__line_numbers[0]
+            lines[n] = f'{indent(n)}{prefix}{self.__kind} {sweep}'
+
+        else:
+            # 'while i lt limit' runs ceil(limit) times from zero, however
+            # close the limit computed by the script is to an integer
+            variable, limit = fields
+            init, loop = self.__line_numbers
+            lines[init] = f'{indent(init)}let {variable} = '\
+                    f'floor((ceil({limit})*{index}+0.5)/{count})'
+            lines[loop] = f'{indent(loop)}while {variable} lt '\
+                    f'floor((ceil({limit})*{index + 1}+0.5)/{count})'
+        return lines
+
+
+    def stitch(self, results, count):
+        """Returns the result of the whole sweep from the results of the
+        chunks, in order. Raises ValueError if the chunks do not add up to
+        the points of the sweep."""
+        if self.__kind != 'loop':
+            for index, data in enumerate(results):
+                first, last = bounds(self.__points, index, count)
+                if len(data) != last - first:
+                    raise ValueError(f'chunk {index + 1} of the {self.__kind} sweep has '\
+                            f'{len(data)} points instead of {last - first}')
+            return np.concatenate(results)
+
+        # Every chunk wrote the whole vectors, but filled only its own rows
+        rows = len(results[0])
+        if any(data.shape != results[0].shape for data in results):
+            raise ValueError('the chunks of the sweep loop wrote results of different sizes')
+        return np.concatenate([data[slice(*bounds(rows, index, count))]\
+                for index, data in enumerate(results)])
+
+
+def _sweep(command, prefix):
+    """Returns (kind, fields, points) of a dc, ac or sp sweep command that can
+    be split, or None."""
+    fields = command.split()
+    keyword = fields[0].lower().lstrip('.')
+    if keyword == 'dc' and len(fields) == 5:
+        start, stop, step = [spiceNumber(text) for text in fields[2:5]]
+        if None in [start, stop, step] or step == 0 or (stop - start) / step < 0:
+            return None
+        points = sweepPoints('dc', None, start, stop, step)
+        return 'dc', [prefix, fields[1], start, step, fields[4]], points
+
+    if keyword in ['ac', 'sp'] and len(fields) == 5 and fields[1].lower() in ['dec', 'oct', 'lin']:
+        scale = fields[1].lower()
+        number, start, stop = [spiceNumber(text) for text in fields[2:5]]
+        if None in [number, start, stop] or number < 1 or start <= 0 or stop < start\
+                or number != int(number):
+            return None
+        points = sweepPoints(keyword, scale, start, stop, int(number))
+        return keyword, [prefix, scale, int(number), start, stop], points
+    return None
+
+
+def findPartition(script):
+    """Returns the SweepPartition of a SpiceScript, or None if the script does
+    not consist of a single sweep that can be split."""
+    lines = script.lines()
+    commands = []     # (line number, command, enclosing blocks, in .control)
+    continued = set() # Line numbers of commands continued on '+' lines
+    in_control = False
+    blocks = []
+    for n, line in enumerate(lines):
+        keyword = line.strip().lower()
+        if keyword.startswith('.control'):
+            in_control = True
+            continue
+        if keyword.startswith('.endc'):
+            in_control = False
+            continue
+        command = stripComment(line).strip()
+        if not command or command.startswith('*'):
+            continue
+        if command.startswith('+'):
+            if commands:
+                # A continued command cannot be rewritten
+                continued.add(commands[-1][0])
+                n0, text, enclosing, control = commands[-1]
+                commands[-1] = (n0, text + ' ' + command[1:].strip(), enclosing, control)
+            continue
+        word = command.split()[0].lower()
+        if in_control and word == 'end' and blocks:
+            blocks.pop()
+        commands.append((n, command, tuple(blocks), in_control))
+        if in_control and word in BLOCKS:
+            blocks.append(word)
+
+    def isAnalysis(command, control):
+        word = command.split()[0].lower()
+        return word in ANALYSES if control else word.lstrip('.') in ANALYSES and word.startswith('.')
+
+    analyses = [entry for entry in commands if isAnalysis(entry[1], entry[3])]
+    if not analyses:
+        return None
+
+    # A single sweep, run once or repeated by foreach loops (e.g. over
+    # temperatures), in which case each chunk runs all the repetitions
+    if len(analyses) == 1 and all(block == 'foreach' for block in analyses[0][2]):
+        n, command, enclosing, control = analyses[0]
+        sweep = _sweep(command, '' if control else '.')
+        if sweep is None or n in continued:
+            return None
+        kind, fields, points = sweep
+        if points is None or len(points) < 2:
+            return None
+        return SweepPartition(kind, [n], fields, points)
+
+    # A loop repeating the analyses, with no analysis outside of it
+    if any(not enclosing for n, command, enclosing, control in analyses):
+        return None
+    loops = [i for i, (n, command, enclosing, control) in enumerate(commands)\
+            if control and not enclosing and re.match(r'while\b', command, re.IGNORECASE)]
+    inside = lambda i, j: all(commands[k][2] for k in range(i + 1, j + 1))
+    loops = [i for i in loops if all(inside(i, commands.index(entry)) for entry in analyses)]
+    if len(loops) != 1 or commands[loops[0]][0] in continued:
+        return None
+    i = loops[0]
+    m = re.fullmatch(r'while\s+([a-z_][a-z0-9_]*)\s+lt\s+(.+)', commands[i][1], re.IGNORECASE)
+    if not m:
+        return None
+    variable, limit = m.group(1), m.group(2).strip()
+
+    # The index starts at zero just before the loop, after the variables of
+    # the limit have been set
+    init = None
+    for k in range(i - 1, -1, -1):
+        n, command, enclosing, control = commands[k]
+        target = re.fullmatch(r'let\s+([a-z_][a-z0-9_]*)\s*=\s*(.+)', command, re.IGNORECASE)
+        if enclosing or not target:
+            continue
+        name, value = target.group(1).lower(), target.group(2).strip()
+        if name == variable.lower():
+            if spiceNumber(value) == 0 and n not in continued:
+                init = n
+            break
+        if name in re.findall(r'[a-z_][a-z0-9_]*', limit.lower()):
+            return None # Set between the start of the index and the loop
+    if init is None:
+        return None
+    return SweepPartition('loop', [init, commands[i][0]], [variable, limit])
+
+
+def partition(script_name):
+    """Returns the SweepPartition of a script file, or None."""
+    try:
+        return findPartition(SpiceScript(script_name))
+    except OSError:
+        return None
+
+
+def submitChunks(submit, fn, sweep, count, script_name, *args, **kwargs):
+    """Submits the `count` chunks of a sweep with `submit(fn, script_name,
+    *args, (index, count), **kwargs)` and returns a Future of (data, RunDiagnostics) of
+    the stitched result, like that of a single run. The Future is running
+    from the start; the chunks are cancelled through the cancel file of the
+    RunLimits in `args`. If the results of the chunks do not add up to the
+    sweep, it is run again unsplit."""
+    combined = concurrent.futures.Future()
+    combined.set_running_or_notify_cancel()
+    futures = [submit(fn, script_name, *args, (index, count), **kwargs) for index in range(count)]
+    lock = threading.Lock()
+    remaining = [count]
+
+    def finished(future):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] > 0:
+                return
+        results = []
+        output = []
+        stages = {}
+        elapsed = 0.0
+        backend = ''
+        for future in futures:
+            try:
+                data, diagnostics = future.result()
+            except concurrent.futures.CancelledError as e:
+                combined.set_exception(e)
+                return
+            except Exception as e:
+                combined.set_exception(e)
+                return
+            results.append(data)
+            if diagnostics is not None:
+                output += diagnostics.output()
+                elapsed = max(elapsed, diagnostics.elapsed())
+                backend = diagnostics.backend()
+                # The chunks ran side by side: a stage took as long as its slowest chunk
+                for name, seconds in diagnostics.stages().items():
+                    stages[name] = max(stages.get(name, 0.0), seconds)
+        data = None
+        if all(data is not None for data in results):
+            try:
+                data = sweep.stitch(results, count)
+            except ValueError as e:
+                runUnsplit(output, f'Warning: {e}, running the sweep unsplit.')
+                return
+        combined.set_result((data, RunDiagnostics(output, elapsed, f'{backend} x{count}', stages)))
+
+    def runUnsplit(output, message):
+        try:
+            future = submit(fn, script_name, *args, None, **kwargs)
+        except Exception as e:
+            combined.set_exception(e)
+            return
+
+        def forward(future):
+            try:
+                data, diagnostics = future.result()
+            except Exception as e:
+                combined.set_exception(e)
+                return
+            if diagnostics is not None:
+                diagnostics = RunDiagnostics(output + [message] + diagnostics.output(),\
+                        diagnostics.elapsed(), diagnostics.backend(), diagnostics.stages())
+            combined.set_result((data, diagnostics))
+        future.add_done_callback(forward)
+
+    for future in futures:
+        future.add_done_callback(finished)
+    return combined
@@ -0,0 +1,322 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+from PySide6 import QtCore, QtGui, QtWidgets
+from PySide6.QtCore import Signal, Slot, Qt
+import sys, os
+from concurrent.futures.process import BrokenProcessPool
+
+import ngspice_con
+from parameter_sweep import SweepSpec, gridSamples, monteCarloSamples,\
+        GRID_DISTRIBUTIONS, RANDOM_DISTRIBUTIONS, MAX_SAMPLES
+from fit_metrics import FitEvaluator
+from result_compare import compareData
+from run_limits import SimulationError
+from simulation_scheduler import SimulationScheduler
+from ui_manager import UIManager
+
+# Columns of the parameter table
+SPEC_COLUMNS = ['Sweep', 'Name', 'Value', 'Distribution', 'Low', 'High', 'Points', 'Sigma']
+SWEEP, NAME, VALUE, DISTRIBUTION, LOW, HIGH, POINTS, SIGMA = range(len(SPEC_COLUMNS))
+
+
+class SweepWindow(QtWidgets.QMainWindow):
+    """Singleton window running a page, or all pages, over a grid or a
+    Monte Carlo sample of parameter vectors. The runs are spread over the
+    worker processes of the SimulationScheduler, and each result is drawn on
+    the page as an overlay and listed in a summary table as it arrives."""
+
+    # Signal emitted from the executor thread when a run is finished
+    runFinished = Signal(object, object)
+
+
+    _inst = None
+
+    def __new__(cls):
+        if cls._inst is None:
+            cls._inst = super(SweepWindow, cls).__new__(cls)
+            cls._inst.__initialized = False
+
+        return cls._inst
+
+
+    def __init__(self):
+        if self.__initialized:
+            return
+
+        super().__init__()
+        self.__pages = []
+        self.__batch = None # SimulationBatch of the running sweep
+        self.__references = {}
+        self.__evaluators = {} # FitEvaluator of each page
+        self.setWindowTitle('Parameter Sweep')
+        self.resize(800, 600)
+
+        # Sweep settings
+        self.__mode_combo = QtWidgets.QComboBox()
+        self.__mode_combo.addItems(['Grid', 'Monte Carlo'])
+        self.__mode_combo.currentTextChanged.connect(self.updateDistributions)
+
+        self.__samples_spin = QtWidgets.QSpinBox()
+        self.__samples_spin.setRange(1, MAX_SAMPLES)
+        self.__samples_spin.setValue(100)
+
+        self.__seed_spin = QtWidgets.QSpinBox()
+        self.__seed_spin.setRange(0, 2**31 - 1)
+        self.__seed_spin.setValue(1)
+
+        form = QtWidgets.QFormLayout()
+        form.addRow('Mode:', self.__mode_combo)
+        form.addRow('Samples:', self.__samples_spin)
+        form.addRow('Seed:', self.__seed_spin)
+
+        # Parameters to sweep
+        self.__spec_table = QtWidgets.QTableWidget(0, len(SPEC_COLUMNS))
+        self.__spec_table.setHorizontalHeaderLabels(SPEC_COLUMNS)
+        self.__spec_table.verticalHeader().setVisible(False)
+
+        # Buttons
+        self.__start_button = QtWidgets.QPushButton('Start')
+        self.__start_button.clicked.connect(self.start)
+        self.__stop_button = QtWidgets.QPushButton('Stop')
+        self.__stop_button.clicked.connect(self.stop)
+        self.__progress_bar = QtWidgets.QProgressBar()
+
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(self.__start_button)
+        buttons.addWidget(self.__stop_button)
+        buttons.addWidget(self.__progress_bar)
+
+        # Summary of the runs
+        self.__summary_table = QtWidgets.QTableWidget(0, 0)
+        self.__summary_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.__summary_table.verticalHeader().setVisible(False)
+
+        top = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(top)
+        layout.addLayout(form)
+        layout.addWidget(self.__spec_table)
+        layout.addLayout(buttons)
+
+        splitter = QtWidgets.QSplitter(Qt.Vertical)
+        splitter.addWidget(top)
+        splitter.addWidget(self.__summary_table)
+        self.setCentralWidget(splitter)
+
+        ui_manager = UIManager()
+        ui_manager.applyTheme(self)
+        ui_manager.themeChanged.connect(lambda: ui_manager.applyTheme(self))
+
+        self.updateDistributions()
+        self.runFinished.connect(self.onRunFinished, Qt.QueuedConnection)
+        self.__initialized = True
+
+
+    def setPages(self, panels):
+        """Sets the pages to sweep. The parameter table is rebuilt from their
+        parameters, keeping the settings of parameters already listed."""
+        self.__pages = list(panels)
+        titles = ', '.join(panel.windowTitle() for panel in panels)
+        self.setWindowTitle(f'Parameter Sweep - {titles}' if len(panels) == 1\
+                else 'Parameter Sweep - All Pages')
+
+        previous = {}
+        for row in range(self.__spec_table.rowCount()):
+            previous[self.__spec_table.item(row, NAME).text()] = self.__rowState(row)
+
+        param_dict = panels[0].paramDict() if panels else {}
+        self.__spec_table.setRowCount(len(param_dict))
+        for row, (key, value) in enumerate(param_dict.items()):
+            state = previous.get(key, {\
+                    'sweep': False, 'distribution': '',\
+                    'low': f'{value * 0.5:.3E}', 'high': f'{value * 1.5:.3E}',\
+                    'points': '5', 'sigma': '0.1'})
+
+            item = QtWidgets.QTableWidgetItem()
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if state['sweep'] else Qt.Unchecked)
+            self.__spec_table.setItem(row, SWEEP, item)
+            for column, text in [(NAME, key), (VALUE, f'{value:.3E}')]:
+                item = QtWidgets.QTableWidgetItem(text)
+                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+                self.__spec_table.setItem(row, column, item)
+            self.__spec_table.setCellWidget(row, DISTRIBUTION, QtWidgets.QComboBox())
+            for column, name in [(LOW, 'low'), (HIGH, 'high'), (POINTS, 'points'), (SIGMA, 'sigma')]:
+                self.__spec_table.setItem(row, column, QtWidgets.QTableWidgetItem(state[name]))
+            self.__updateDistribution(row, state['distribution'])
+
+
+    def __rowState(self, row):
+        table = self.__spec_table
+        return {\
+                'sweep'         : table.item(row, SWEEP).checkState() == Qt.Checked,\
+                'distribution'  : table.cellWidget(row, DISTRIBUTION).currentText(),\
+                'low'           : table.item(row, LOW).text(),\
+                'high'          : table.item(row, HIGH).text(),\
+                'points'        : table.item(row, POINTS).text(),\
+                'sigma'         : table.item(row, SIGMA).text(),\
+                }
+
+
+    def __updateDistribution(self, row, current):
+        combo = self.__spec_table.cellWidget(row, DISTRIBUTION)
+        distributions = GRID_DISTRIBUTIONS if self.__mode_combo.currentText() == 'Grid'\
+                else RANDOM_DISTRIBUTIONS
+        combo.clear()
+        combo.addItems(distributions)
+        if current in distributions:
+            combo.setCurrentText(current)
+
+
+    @Slot()
+    def updateDistributions(self):
+        monte_carlo = self.__mode_combo.currentText() == 'Monte Carlo'
+        self.__samples_spin.setEnabled(monte_carlo)
+        self.__seed_spin.setEnabled(monte_carlo)
+        for row in range(self.__spec_table.rowCount()):
+            self.__updateDistribution(row, '')
+
+
+    def specs(self):
+        """Returns the SweepSpec of every checked parameter.
+        Raises ValueError if a setting is invalid."""
+        specs = []
+        for row in range(self.__spec_table.rowCount()):
+            state = self.__rowState(row)
+            if not state['sweep']:
+                continue
+            name = self.__spec_table.item(row, NAME).text()
+            try:
+                low, high, sigma = float(state['low']), float(state['high']), float(state['sigma'])
+                points = int(state['points'])
+            except ValueError:
+                raise ValueError(f"'{name}': the range settings must be numbers.")
+            specs.append(SweepSpec(name, state['distribution'], low, high, points, sigma))
+        return specs
+
+
+    @Slot()
+    def start(self):
+        pages = [panel for panel in self.__pages if panel.enabled() and panel.scriptFile()]
+        if not pages:
+            QtWidgets.QMessageBox.warning(self, 'Parameter Sweep', 'No page has a script to run.')
+            return
+
+        param_dict = dict(pages[0].paramDict())
+        try:
+            specs = self.specs()
+            if not specs:
+                raise ValueError('Check at least one parameter to sweep.')
+            if self.__mode_combo.currentText() == 'Grid':
+                samples = gridSamples(param_dict, specs)
+            else:
+                samples = monteCarloSamples(param_dict, specs,\
+                        self.__samples_spin.value(), self.__seed_spin.value())
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, 'Parameter Sweep', str(e))
+            return
+
+        self.stop()
+        scheduler = SimulationScheduler()
+        batch = scheduler.submitBatch(callback=self.runFinished.emit)
+        self.__batch = batch
+
+        # Reference data of the pages, to rate each result against
+        self.__references = {}
+        self.__evaluators = {}
+        for panel in pages:
+            panel.clearOverlays()
+            if panel.dataFile():
+                self.__references[panel] = panel.graph().loadFile(panel.dataFile())
+                self.__evaluators[panel] = FitEvaluator()
+
+        # Summary table, one row per run
+        names = [spec.name() for spec in specs]
+        table = self.__summary_table
+        table.clear()
+        table.setColumnCount(len(names) + 4)
+        table.setHorizontalHeaderLabels(['#', 'Page'] + names + ['Status', 'RMS Error'])
+        table.setRowCount(len(samples) * len(pages))
+
+        self.__progress_bar.setRange(0, len(samples) * len(pages))
+        self.__progress_bar.setValue(0)
+
+        row = 0
+        for i, sample in enumerate(samples):
+            for panel in pages:
+                values = [str(i + 1), panel.windowTitle()] + [f'{sample[n]:.3E}' for n in names]
+                for column, text in enumerate(values + ['Queued', '']):
+                    table.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+
+                key = scheduler.cache().key(panel.scriptFile(), sample,\
+                        ngspice_con.BACKEND, ngspice_con.OUTPUT_FORMAT)
+                data = scheduler.cache().get(key)
+                if data is not None:
+                    self.__showResult(row, panel, data, 'Cached')
+                else:
+                    batch.submit(panel.scriptFile(), sample, panel.timeout(),\
+                            (batch, row, panel, key))
+                row += 1
+
+
+    @Slot()
+    def stop(self):
+        """Cancels the queued runs and kills the running ones."""
+        if self.__batch is not None:
+            self.__batch.cancel()
+            self.__batch = None
+
+
+    @Slot(object, object)
+    def onRunFinished(self, future, stamp):
+        batch, row, panel, key = stamp
+        if future.cancelled():
+            return
+
+        message = 'Done'
+        try:
+            data, diagnostics = future.result()
+            if data is None:
+                message = 'Failed'
+        except (SimulationError, BrokenProcessPool) as e:
+            data, message = None, str(e)
+        except Exception as e:
+            print(str(e))
+            data, message = None, 'Failed'
+
+        SimulationScheduler().cache().put(key, data)
+        if batch is not self.__batch:
+            # The sweep was stopped or restarted
+            return
+        self.__showResult(row, panel, data, message)
+
+        if self.__progress_bar.value() >= self.__progress_bar.maximum():
+            # All runs finished
+            self.__batch = None
+
+
+    def __showResult(self, row, panel, data, message):
+        table = self.__summary_table
+        table.item(row, table.columnCount() - 2).setText(message)
+
+        reference = self.__references.get(panel)
+        if data is not None and reference is not None:
+            passed, error = compareData(data, reference, float('inf'),\
+                    log_x=panel.graph().logScaleX(), log_y=panel.graph().logScaleY(),\
+                    evaluator=self.__evaluators[panel])
+            table.item(row, table.columnCount() - 1).setText(f'{error:.3E}')
+
+        panel.addOverlay(data)
+        self.__progress_bar.setValue(self.__progress_bar.value() + 1)
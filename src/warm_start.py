@@ -0,0 +1,92 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import re
+
+# Lines echoed by ngspice before and after it prints the operating point
+CAPTURE_MARKER = 'MODELNGSPICER_OP'
+CAPTURE_END_MARKER = 'MODELNGSPICER_OP_END'
+
+# Output lines showing that the simulation did not converge
+FAILURE_PATTERNS = [\
+        r'no convergence',\
+        r'iteration limit reached',\
+        r'simulation\(s\) aborted',\
+        r'singular matrix',\
+        ]
+
+# Node voltages per line of the .nodeset card
+NODES_PER_LINE = 6
+
+
+def captureCommands():
+    """Returns the control commands printing the node voltages of the
+    operating point, run at the start of the control section, before the
+    script alters anything, so that they are those of the circuit the
+    .nodeset card is written into. The plot is removed again."""
+    return [f'echo {CAPTURE_MARKER}', 'op', 'print all', f'echo {CAPTURE_END_MARKER}',\
+            'destroy all']
+
+
+def nodesetLines(nodeset):
+    """Returns the .nodeset card giving the node voltages as initial guesses
+    of the operating point."""
+    items = [f'v({node})={value:.6E}' for node, value in nodeset.items()]
+    lines = []
+    for i in range(0, len(items), NODES_PER_LINE):
+        lines.append(('.nodeset ' if i == 0 else '+ ') + ' '.join(items[i:i + NODES_PER_LINE]))
+    return lines
+
+
+def _isMarker(line, marker=CAPTURE_MARKER):
+    line = line.strip()
+    return line.endswith(marker) and not line.startswith('echo')
+
+
+def converged(lines):
+    """Returns False if the output lines of a run show that it did not
+    converge. The captured operating point is not checked."""
+    pattern = re.compile('|'.join(FAILURE_PATTERNS), re.IGNORECASE)
+    capturing = False
+    for line in lines:
+        if _isMarker(line) or _isMarker(line, CAPTURE_END_MARKER):
+            capturing = _isMarker(line)
+        elif not capturing and pattern.search(line):
+            return False
+    return True
+
+
+def operatingPoint(lines):
+    """Returns the node voltages printed between the last capture markers of
+    the output lines as a dict, or None if the operating point failed."""
+    markers = [i for i, line in enumerate(lines) if _isMarker(line)]
+    if not markers:
+        return None
+
+    pattern = re.compile('|'.join(FAILURE_PATTERNS), re.IGNORECASE)
+    nodeset = {}
+    for line in lines[markers[-1] + 1:]:
+        if _isMarker(line, CAPTURE_END_MARKER):
+            break
+        if pattern.search(line):
+            return None
+        # Branch currents and internal device nodes contain '#'
+        m = re.match(r'^\s*(?:v\()?([^\s()=#]+)\)?\s*=\s*([-+0-9.eE]+)\s*$', line, re.IGNORECASE)
+        if m and m.group(1).lower() not in ['0', 'gnd']:
+            try:
+                nodeset[m.group(1)] = float(m.group(2))
+            except ValueError:
+                pass
+    return nodeset or None
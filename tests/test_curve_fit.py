@@ -0,0 +1,90 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from curve_fit import FitParameter, LevenbergMarquardt
+
+
+def diodeResiduals(values):
+    """Residuals of an exponential a*exp(b*x) against a=1e-12, b=20."""
+    x = np.linspace(0.0, 1.0, 21)
+    a, b = values
+    return np.log(a * np.exp(b * x)) - np.log(1e-12 * np.exp(20.0 * x))
+
+
+def test_parameter_spaces():
+    assert FitParameter('is', 1e-14, lower=0.0).log()
+    assert not FitParameter('is', 1e-14).log()
+    assert not FitParameter('vto', -0.5, lower=-1.0).log()
+    assert FitParameter('n', 5.0, upper=2.0).value() == 2.0
+
+    p = FitParameter('is', 1e-14, lower=1e-16, upper=1e-12)
+    assert p.fromInternal(p.toInternal(1e-14)) == pytest.approx(1e-14)
+    assert p.fromInternal(p.toInternal(1.0)) == 1e-12
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        FitParameter('is', -1.0, log=True)
+    with pytest.raises(ValueError):
+        FitParameter('n', 1.0, lower=2.0, upper=1.0)
+
+
+def test_fit_converges():
+    parameters = [FitParameter('a', 1e-10, lower=0.0), FitParameter('b', 10.0)]
+    calls = []
+
+    def evaluate(vectors):
+        calls.append(len(vectors))
+        return [diodeResiduals(values) for values in vectors]
+
+    values, cost, message = LevenbergMarquardt(evaluate, parameters).run()
+    assert values[0] == pytest.approx(1e-12, rel=1e-4)
+    assert values[1] == pytest.approx(20.0, rel=1e-4)
+    assert cost < 1e-8
+    # The Jacobian is evaluated in one call
+    assert max(calls) >= len(parameters)
+
+
+def test_fit_respects_bounds():
+    parameters = [FitParameter('a', 1e-10, lower=0.0), FitParameter('b', 10.0, upper=15.0)]
+    evaluate = lambda vectors: [diodeResiduals(values) for values in vectors]
+    values, cost, message = LevenbergMarquardt(evaluate, parameters).run()
+    assert values[1] <= 15.0
+
+
+def test_failed_initial_point():
+    parameters = [FitParameter('a', 1.0)]
+    values, cost, message = LevenbergMarquardt(lambda vectors: [None] * len(vectors),\
+            parameters).run()
+    assert values == [1.0]
+    assert cost == np.inf
+
+
+def test_stop():
+    parameters = [FitParameter('a', 1e-10, lower=0.0), FitParameter('b', 10.0)]
+    evaluate = lambda vectors: [diodeResiduals(values) for values in vectors]
+    optimizer = LevenbergMarquardt(evaluate, parameters)
+    optimizer.stop()
+    values, cost, message = optimizer.run()
+    assert message == 'Stopped'
+    assert values[1] == pytest.approx(10.0)
@@ -0,0 +1,65 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dependency_index import DependencyIndex
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_param_card_depends_on_referenced_names(tmp_path):
+    script = write(tmp_path / 'a.spice', '* a\n.param\n.include model.txt\n'\
+            'R1 a 0 {rload}\n.end\n')
+    index = DependencyIndex()
+    assert index.dependsOn(script, 'RLOAD')
+    assert not index.dependsOn(script, 'cload')
+
+
+def test_model_card_depends_on_every_parameter(tmp_path):
+    script = write(tmp_path / 'd.spice', '* d\nD1 a 0 dmod\n.model dmod d\n'\
+            '.include model.txt\n.end\n')
+    assert DependencyIndex().dependsOn(script, 'anything')
+
+
+def test_parameters_of_nested_includes(tmp_path):
+    write(tmp_path / 'load.lib', 'C1 a 0 {cload}\n')
+    script = write(tmp_path / 'a.spice', '* a\n.include model.txt\n.include load.lib\n.end\n')
+    assert DependencyIndex().dependsOn(script, 'cload')
+
+
+def test_script_without_parameter_file(tmp_path):
+    script = write(tmp_path / 'a.spice', '* a\nR1 a 0 {rload}\n.end\n')
+    index = DependencyIndex()
+    assert not index.dependsOn(script, 'rload')
+    assert not index.dependsOn('', 'rload')
+
+
+def test_entry_is_rebuilt_when_an_include_changes(tmp_path):
+    lib = tmp_path / 'load.lib'
+    write(lib, 'C1 a 0 1p\n')
+    script = write(tmp_path / 'a.spice', '* a\n.include model.txt\n.include load.lib\n.end\n')
+    index = DependencyIndex()
+    assert not index.dependsOn(script, 'cload')
+
+    write(lib, 'C1 a 0 {cload}\n')
+    os.utime(lib, (0, os.path.getmtime(lib) + 10))
+    assert index.dependsOn(script, 'cload')
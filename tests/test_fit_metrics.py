@@ -0,0 +1,96 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fit_metrics import FitEvaluator, FitMetrics, merge
+
+
+def test_identical_curves_match():
+    x = np.linspace(0.0, 1.0, 11)
+    data = np.column_stack([x, x ** 2 + 1.0])
+    metrics = FitEvaluator().evaluate(data, data)
+    assert metrics.points() == 11
+    assert metrics.rms() == pytest.approx(0.0)
+    assert metrics.relativeRms() == pytest.approx(0.0)
+    assert metrics.logRms() == pytest.approx(0.0)
+
+
+def test_relative_and_log_errors():
+    x = np.linspace(1.0, 2.0, 5)
+    reference = np.column_stack([x, np.ones(5)])
+    data = np.column_stack([x, np.full(5, 10.0)])
+    metrics = FitEvaluator().evaluate(data, reference)
+    assert metrics.rms() == pytest.approx(9.0)
+    assert metrics.relativeRms() == pytest.approx(9.0)
+    assert metrics.logRms() == pytest.approx(1.0)
+
+
+def test_data_is_interpolated_onto_the_reference():
+    x = np.linspace(0.0, 10.0, 101)
+    data = np.column_stack([x, 2.0 * x + 1.0])
+    reference = np.array([[0.25, 1.5], [5.55, 12.1], [20.0, 0.0]])
+    metrics = FitEvaluator().evaluate(data, reference)
+    # The point outside the simulated range is not compared
+    assert metrics.points() == 2
+    assert metrics.rms() == pytest.approx(0.0, abs=1e-12)
+
+
+def test_log_axes_interpolate_geometrically():
+    x = np.geomspace(1.0, 1e6, 7)
+    data = np.column_stack([x, 1.0 / x])
+    reference = np.column_stack([np.geomspace(1.0, 1e6, 25), 1.0 / np.geomspace(1.0, 1e6, 25)])
+    assert FitEvaluator().evaluate(data, reference).relativeRms() > 0.1
+    metrics = FitEvaluator().evaluate(data, reference, log_x=True, log_y=True)
+    assert metrics.relativeRms() == pytest.approx(0.0, abs=1e-9)
+
+
+def test_residuals_match_the_relative_rms():
+    x = np.linspace(0.0, 1.0, 21)
+    reference = np.column_stack([x, x + 1.0, 2.0 - x])
+    data = np.column_stack([x, 1.1 * (x + 1.0), 2.0 - x])
+    evaluator = FitEvaluator()
+    residuals = evaluator.residuals(data, reference)
+    assert residuals.shape == (42,)
+    assert np.allclose(residuals[:21], 0.1)
+    assert np.allclose(residuals[21:], 0.0)
+    metrics = evaluator.evaluate(data, reference)
+    assert np.sqrt(np.mean(residuals ** 2)) == pytest.approx(metrics.relativeRms())
+    assert [column.points() for column in metrics.columns()] == [21, 21]
+
+
+def test_curves_that_cannot_be_compared():
+    evaluator = FitEvaluator()
+    reference = np.array([[0.0, 1.0], [1.0, 2.0]])
+    assert evaluator.evaluate(None, reference) is None
+    assert evaluator.evaluate(np.array([[0.0, 1.0]]), reference) is None
+    assert evaluator.residuals(np.array([[5.0, 1.0], [6.0, 2.0]]), reference) is None
+
+
+def test_merge_adds_the_points():
+    x = np.linspace(0.0, 1.0, 5)
+    evaluator = FitEvaluator()
+    a = evaluator.evaluate(np.column_stack([x, x + 2.0]), np.column_stack([x, x + 1.0]))
+    b = evaluator.evaluate(np.column_stack([x, x]), np.column_stack([x, x]))
+    total = merge([a, None, b])
+    assert total.points() == 10
+    assert total.rms() == pytest.approx(np.sqrt(0.5))
+    assert FitMetrics().summary() == ''
@@ -0,0 +1,65 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from parameter_sweep import SweepSpec, gridSamples, monteCarloSamples, MAX_SAMPLES
+
+
+def test_grid_is_the_cartesian_product():
+    specs = [SweepSpec('r', 'Linear', 1.0, 3.0, 3), SweepSpec('c', 'Log', 1e-12, 1e-10, 3)]
+    samples = gridSamples({'r': 0.0, 'c': 0.0, 'l': 5.0}, specs)
+    assert len(samples) == 9
+    assert [sample['r'] for sample in samples[:3]] == [1.0, 1.0, 1.0]
+    assert [sample['c'] for sample in samples[:3]] == pytest.approx([1e-12, 1e-11, 1e-10])
+    assert all(sample['l'] == 5.0 for sample in samples)
+
+
+def test_grid_too_large():
+    specs = [SweepSpec(name, 'Linear', 0.0, 1.0, 100) for name in 'abc']
+    with pytest.raises(ValueError):
+        gridSamples({}, specs)
+
+
+def test_monte_carlo_is_reproducible():
+    specs = [SweepSpec('r', 'Normal', sigma=0.1), SweepSpec('c', 'Log-uniform', 1e-12, 1e-10)]
+    param_dict = {'r': 100.0, 'c': 1e-11}
+    a = monteCarloSamples(param_dict, specs, 50, seed=1)
+    assert a == monteCarloSamples(param_dict, specs, 50, seed=1)
+    assert a != monteCarloSamples(param_dict, specs, 50, seed=2)
+    assert all(1e-12 <= sample['c'] <= 1e-10 for sample in a)
+    assert np.mean([sample['r'] for sample in a]) == pytest.approx(100.0, rel=0.1)
+
+
+def test_monte_carlo_too_many_samples():
+    with pytest.raises(ValueError):
+        monteCarloSamples({}, [SweepSpec('r', 'Uniform')], MAX_SAMPLES + 1)
+
+
+@pytest.mark.parametrize('args', [\
+        ('r', 'Gaussian'),\
+        ('r', 'Log', 0.0, 1.0),\
+        ('r', 'Linear', 0.0, 1.0, 0),\
+        ('r', 'Normal', 0.0, 1.0, 5, -0.1),\
+        ])
+def test_invalid_specs(args):
+    with pytest.raises(ValueError):
+        SweepSpec(*args)
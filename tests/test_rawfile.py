@@ -0,0 +1,82 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rawfile import RawFile
+
+
+def plot(name, flags, variables, data):
+    """Returns a plot of a binary rawfile as ngspice writes it."""
+    lines = ['Title: test', f'Plotname: {name}', f'Flags: {flags}',\
+            f'No. Variables: {len(variables)}', f'No. Points: {len(data)}', 'Variables:']
+    lines += [f'\t{i}\t{variable}\tvoltage' for i, variable in enumerate(variables)]
+    lines.append('Binary:')
+    return ('\n'.join(lines) + '\n').encode('utf-8') + np.ascontiguousarray(data).tobytes()
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_real_plot(tmp_path, mmap):
+    data = np.array([[0.0, 1.0, 2.0], [0.5, 1.5, 2.5], [1.0, 2.0, 3.0]])
+    file_name = tmp_path / 'result.raw'
+    file_name.write_bytes(plot('DC transfer characteristic', 'real',\
+            ['v-sweep', 'v(a)', 'v(b)'], data))
+
+    raw = RawFile(str(file_name), mmap)
+    plots = raw.plots()
+    assert len(plots) == 1
+    assert plots[0].name() == 'DC transfer characteristic'
+    assert [name for name, type_ in plots[0].variables()] == ['v-sweep', 'v(a)', 'v(b)']
+    assert np.array_equal(plots[0].vector('V(B)'), data[:, 2])
+    assert np.array_equal(raw.array(), data)
+    assert np.array_equal(raw.array(single_scale=False),\
+            data[:, [0, 1, 0, 2]])
+
+
+def test_complex_plot(tmp_path):
+    data = np.array([[1.0, 1.0 + 2.0j], [10.0, 3.0 - 4.0j]], dtype=complex)
+    file_name = tmp_path / 'result.raw'
+    file_name.write_bytes(plot('AC Analysis', 'complex', ['frequency', 'v(out)'], data))
+
+    raw = RawFile(str(file_name))
+    assert raw.plots()[0].isComplex()
+    assert np.array_equal(raw.array(), [[1.0, 1.0, 2.0], [10.0, 3.0, -4.0]])
+
+
+def test_several_plots(tmp_path):
+    first = np.array([[0.0, 1.0], [1.0, 2.0], [2.0, 3.0]])
+    second = np.array([[0.0, 5.0], [1.0, 6.0]])
+    file_name = tmp_path / 'result.raw'
+    file_name.write_bytes(plot('DC 1', 'real', ['v-sweep', 'v(a)'], first)\
+            + plot('DC 2', 'real', ['v-sweep', 'v(b)'], second))
+
+    raw = RawFile(str(file_name))
+    assert [p.name() for p in raw.plots()] == ['DC 1', 'DC 2']
+    # The columns are cut to the shortest plot
+    assert np.array_equal(raw.array(), [[0.0, 1.0, 5.0], [1.0, 2.0, 6.0]])
+
+
+def test_ascii_rawfile_is_rejected(tmp_path):
+    file_name = tmp_path / 'result.raw'
+    file_name.write_text('Title: test\nPlotname: op\nFlags: real\nNo. Variables: 1\n'\
+            'No. Points: 1\nVariables:\n\t0\tv(a)\tvoltage\nValues:\n0\t1.0\n')
+    with pytest.raises(ValueError):
+        RawFile(str(file_name))
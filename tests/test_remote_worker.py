@@ -0,0 +1,155 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import socket
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_worker import sendMessage, receiveMessage, parseAddress, encodeResult,\
+        decodeDiagnostics, unpackBundle, Bundle, WorkerServer, RemoteConnection, RemoteError,\
+        DEFAULT_PORT, MAX_HEADER_SIZE
+from run_diagnostics import RunDiagnostics
+
+
+@pytest.fixture
+def pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_message_round_trip(pair):
+    payloads = [b'first', b'', bytes(range(256)) * 1000]
+    # The payloads do not fit in the socket buffer, so they are sent meanwhile
+    sender = threading.Thread(target=sendMessage,\
+            args=(pair[0], {'type': 'run', 'params': {'r': 1.0}}, payloads))
+    sender.start()
+    header, received = receiveMessage(pair[1])
+    sender.join()
+    assert header['type'] == 'run'
+    assert header['params'] == {'r': 1.0}
+    assert received == payloads
+
+
+def raw(sock, header):
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(struct.pack('!I', len(data)) + data)
+
+
+@pytest.mark.parametrize('sizes', [[-1], ['1'], [True], 'abc'])
+def test_corrupt_sizes_are_rejected(pair, sizes):
+    raw(pair[0], {'type': 'run', 'sizes': sizes})
+    with pytest.raises(ConnectionError):
+        receiveMessage(pair[1])
+
+
+def test_corrupt_and_oversized_headers_are_rejected(pair):
+    pair[0].sendall(struct.pack('!I', 3) + b'{{{')
+    with pytest.raises(ConnectionError):
+        receiveMessage(pair[1])
+    pair[0].sendall(struct.pack('!I', MAX_HEADER_SIZE + 1))
+    with pytest.raises(ConnectionError):
+        receiveMessage(pair[1])
+
+
+def test_closed_connection(pair):
+    raw(pair[0], {'type': 'run', 'sizes': [10]})
+    pair[0].sendall(b'short')
+    pair[0].close()
+    with pytest.raises(ConnectionError):
+        receiveMessage(pair[1])
+
+
+def test_addresses():
+    assert parseAddress('host:1234') == (socket.AF_INET, ('host', 1234))
+    assert parseAddress('host') == (socket.AF_INET, ('host', DEFAULT_PORT))
+    assert parseAddress('[::1]:80')[1] == ('::1', 80)
+    with pytest.raises(ValueError):
+        parseAddress('host:port')
+
+
+def test_result_round_trip(pair):
+    data = np.arange(6.0).reshape(3, 2)
+    header, payloads = encodeResult(data, RunDiagnostics(['line'], 1.5, 'Subprocess'))
+    sendMessage(pair[0], header, payloads)
+    header, payloads = receiveMessage(pair[1])
+    received = np.frombuffer(payloads[0], dtype='<f8').reshape(header['shape'])
+    assert np.array_equal(received, data)
+    diagnostics = decodeDiagnostics(header, 'host:1')
+    assert diagnostics.output() == ['line']
+    assert diagnostics.backend() == 'Subprocess@host:1'
+    assert encodeResult(None, None)[0]['status'] == 'failed'
+
+
+def test_bundle_round_trip(tmp_path):
+    source = tmp_path / 'source'
+    source.mkdir()
+    (tmp_path / 'shared.lib').write_text('R2 a 0 1k\n')
+    (source / 'model.txt').write_text('.param r=1\n')
+    (source / 'test.spice').write_text('* test\n.include model.txt\n'\
+            '.include ../shared.lib\n.end\n')
+    bundle = Bundle(str(source / 'test.spice'))
+    assert 'model.txt' not in bundle.files()
+
+    target = tmp_path / 'target'
+    names = list(bundle.files())
+    unpackBundle(str(target), names, [bundle.files()[name] for name in names])
+    script = (target / bundle.script()).read_text()
+    assert 'external/0/shared.lib' in script
+    assert '../shared.lib' not in script
+    assert (target / 'external' / '0' / 'shared.lib').read_text() == 'R2 a 0 1k\n'
+
+
+def test_bundle_cannot_escape_its_folder(tmp_path):
+    with pytest.raises(ValueError):
+        unpackBundle(str(tmp_path / 'target'), ['../evil.txt'], [b''])
+    assert not (tmp_path / 'evil.txt').exists()
+    assert not (tmp_path / 'target').exists()
+
+
+def test_clients_must_show_the_token():
+    server = WorkerServer('127.0.0.1:0', jobs=2, token='secret')
+    host, port = server.listen()
+    threading.Thread(target=server.serveForever, daemon=True).start()
+    try:
+        with pytest.raises(RemoteError):
+            RemoteConnection(f'{host}:{port}', token='wrong')
+        with pytest.raises(RemoteError):
+            RemoteConnection(f'{host}:{port}', token='')
+        connection = RemoteConnection(f'{host}:{port}', token='secret')
+        assert connection.jobs() == 2
+        connection.close()
+    finally:
+        server.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='Unix sockets are not available')
+def test_unix_socket_is_private(tmp_path):
+    server = WorkerServer(f'unix:{tmp_path}/worker.sock')
+    assert server.token()
+    server.listen()
+    try:
+        assert os.stat(tmp_path / 'worker.sock').st_mode & 0o777 == 0o600
+    finally:
+        server.close()
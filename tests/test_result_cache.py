@@ -0,0 +1,93 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def script(tmp_path):
+    (tmp_path / 'model.txt').write_text('.param r=1\n')
+    (tmp_path / 'sub.lib').write_text('.subckt load a b\nR1 a b 1k\n.ends\n')
+    file_name = tmp_path / 'test.spice'
+    file_name.write_text('* test\n.include model.txt\n.include sub.lib\n'\
+            'X1 a 0 load\n.control\nop\n.endc\n.end\n')
+    return str(file_name)
+
+
+def test_key_follows_parameters_and_includes(script, tmp_path):
+    cache = ResultCache()
+    key = cache.key(script, {'r': 1.0})
+    assert key == cache.key(script, {'r': 1.0})
+    assert key != cache.key(script, {'r': 2.0})
+    assert key != cache.key(script, {'r': 1.0}, backend='Shared')
+
+    (tmp_path / 'sub.lib').write_text('.subckt load a b\nR1 a b 2k\n.ends\n')
+    assert key != cache.key(script, {'r': 1.0})
+
+
+def test_key_of_missing_script(tmp_path):
+    assert ResultCache().key(str(tmp_path / 'missing.spice'), {}) is None
+
+
+def test_get_returns_read_only_result(script):
+    cache = ResultCache()
+    key = cache.key(script, {'r': 1.0})
+    assert cache.get(key) is None
+    cache.put(key, np.arange(6.0).reshape(3, 2))
+
+    data = cache.get(key)
+    assert np.array_equal(data, np.arange(6.0).reshape(3, 2))
+    with pytest.raises(ValueError):
+        data[0, 0] = 1.0
+
+
+def test_least_recently_used_is_evicted():
+    data = np.zeros(16)
+    cache = ResultCache(max_bytes=2 * data.nbytes)
+    cache.put('a', data)
+    cache.put('b', data)
+    cache.get('a')
+    cache.put('c', data)
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+
+def test_disk_tier_survives_clear(tmp_path):
+    cache = ResultCache()
+    cache.setCacheDir(str(tmp_path / 'cache'))
+    cache.setDiskEnabled(True)
+    cache.put('key', np.ones((2, 2)))
+
+    cache.clear()
+    assert np.array_equal(cache.get('key'), np.ones((2, 2)))
+    cache.clear(disk=True)
+    assert cache.get('key') is None
+
+
+def test_setters_validate():
+    cache = ResultCache()
+    with pytest.raises(ValueError):
+        cache.setDiskEnabled(1)
+    with pytest.raises(ValueError):
+        cache.setMaxBytes(-1)
@@ -0,0 +1,67 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import pickle
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from run_diagnostics import RunDiagnostics, parseStatistics, parseWarnings,\
+        ANALYSIS_TIME, ITERATIONS, REJECTED_TIMEPOINTS
+
+# Output of 'rusage all' after a transient analysis, shortened
+OUTPUT = [\
+        'Circuit: test',\
+        'Warning: singular matrix:  check nodes out and out',\
+        'Total analysis time (seconds) = 0.125',\
+        'Total elapsed time (seconds) = 0.25 ',\
+        'Total iterations = 1234',\
+        'Rejected timepoints = 7',\
+        ]
+
+
+def test_statistics():
+    statistics = parseStatistics(OUTPUT)
+    assert statistics[ANALYSIS_TIME] == 0.125
+    assert statistics[ITERATIONS] == 1234
+    assert statistics[REJECTED_TIMEPOINTS] == 7
+
+
+def test_warnings():
+    assert parseWarnings(OUTPUT) == [OUTPUT[1]]
+
+
+def test_diagnostics():
+    diagnostics = RunDiagnostics(OUTPUT, 0.5, 'Subprocess', {'Simulate': 0.4})
+    assert diagnostics.analysisTime() == 0.125
+    assert diagnostics.iterations() == 1234
+    assert diagnostics.rejectedTimepoints() == 7
+    assert diagnostics.statistic('missing', 1.0) == 1.0
+    assert diagnostics.output()[3] == 'Total elapsed time (seconds) = 0.25'
+    assert diagnostics.summary() == '0.500 s, analysis 0.125 s, 1234 iterations, '\
+            '7 rejected timepoints, 1 warnings'
+
+
+def test_empty_diagnostics():
+    diagnostics = RunDiagnostics()
+    assert diagnostics.analysisTime() is None
+    assert diagnostics.summary() == '0.000 s'
+
+
+def test_diagnostics_are_picklable():
+    diagnostics = pickle.loads(pickle.dumps(RunDiagnostics(OUTPUT, 0.5, 'Pool')))
+    assert diagnostics.backend() == 'Pool'
+    assert diagnostics.iterations() == 1234
@@ -0,0 +1,65 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sensitivity import perturbations, curveSensitivity, fitError, errorSensitivity,\
+        UP, DOWN, DEFAULT_STEP
+
+
+def curves(function, step=DEFAULT_STEP):
+    """Returns the base, up and down curves of y = function(x, p) at p = 1."""
+    x = np.linspace(0.0, 10.0, 101)
+    return [np.column_stack([x, function(x, 1.0 + d * step)]) for d in [0, UP, DOWN]]
+
+
+def test_perturbations():
+    result = perturbations({'a': 2.0, 'b': 0.0})
+    assert [(name, direction) for name, direction, param_dict in result] == [('a', UP), ('a', DOWN)]
+    assert result[0][2] == {'a': 2.0 * (1.0 + DEFAULT_STEP), 'b': 0.0}
+
+
+def test_proportional_parameter():
+    assert curveSensitivity(*curves(lambda x, p: p * np.exp(x))) == pytest.approx(1.0)
+
+
+def test_curve_crossing_zero_stays_finite():
+    # A pointwise dy/y would blow up at the zeros of the sine
+    assert curveSensitivity(*curves(lambda x, p: p * np.sin(x))) == pytest.approx(1.0)
+    base, up, down = curves(lambda x, p: np.sin(x) + (p - 1.0))
+    assert curveSensitivity(base, up, down) == pytest.approx(1.0 / np.sqrt(np.mean(base[:, 1] ** 2)))
+
+
+def test_insensitive_and_missing_curves():
+    base, up, down = curves(lambda x, p: np.cos(x))
+    assert curveSensitivity(base, up, down) == pytest.approx(0.0)
+    assert np.isnan(curveSensitivity(base, None, down))
+    zero = np.column_stack([base[:, 0], np.zeros(len(base))])
+    assert np.isnan(curveSensitivity(zero, zero, zero))
+
+
+def test_error_sensitivity():
+    base, up, down = curves(lambda x, p: p * (x + 1.0))
+    reference = np.column_stack([base[:, 0], 1.1 * (base[:, 1])])
+    assert fitError(base, reference) == pytest.approx(0.1 / 1.1)
+    # Increasing the parameter brings the curve closer to the reference
+    assert errorSensitivity(base, up, down, reference) < 0
+    assert np.isnan(errorSensitivity(base, up, down, base))
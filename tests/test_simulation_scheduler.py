@@ -0,0 +1,112 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PySide6')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import ngspice_con
+from simulation_scheduler import SimulationScheduler
+from stage_timer import StageTimer
+
+
+class Page:
+    """Stand-in for a SimulationPanel, recording what is shown on it."""
+
+    def __init__(self, script_file=''):
+        self.script_file = script_file
+        self.results = []
+        self.statuses = []
+
+    def scriptFile(self):
+        return self.script_file
+
+    def paramDict(self):
+        return {'r': 1.0}
+
+    def timeout(self):
+        return 0.0
+
+    def enabled(self):
+        return True
+
+    def isVisible(self):
+        return True
+
+    def updateMenu(self):
+        pass
+
+    def showResult(self, data, timer=None):
+        self.results.append(data)
+
+    def setStatus(self, message):
+        self.statuses.append(message)
+
+    def addTimings(self, stages):
+        pass
+
+
+def finished(result):
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
+
+
+def test_finished_without_progressive_plotting():
+    scheduler = SimulationScheduler()
+    scheduler.setProgressive(False)
+    page = Page()
+    scheduler.run([page]) # Without a script, the page is cleared
+
+    stamp = (scheduler.version(), None, '', '', StageTimer(), 0.0) # No preview file
+    scheduler.onFinished(page, finished(('data', None)), stamp)
+    assert page.results == [None, 'data']
+    assert page.statuses == ['', '']
+
+
+def test_stale_result_is_dropped_but_cached(tmp_path):
+    scheduler = SimulationScheduler()
+    script = tmp_path / 'test.spice'
+    script.write_text('* test\n.include model.txt\nR1 a 0 1k\n.end\n')
+    page = Page()
+    scheduler.run([page])
+    scheduler.run([page])
+
+    key = scheduler.cache().key(str(script), {'r': 1.0})
+    stamp = (scheduler.version() - 1, key, '', '', StageTimer(), 0.0)
+    scheduler.onFinished(page, finished(('stale', None)), stamp)
+    assert page.results == [None, None]
+    assert scheduler.cache().get(key) == 'stale'
+
+
+def test_cached_result_is_shown_without_running(tmp_path):
+    scheduler = SimulationScheduler()
+    script = tmp_path / 'test.spice'
+    script.write_text('* test\n.include model.txt\nR1 a 0 1k\n.end\n')
+    page = Page(str(script))
+    key = scheduler.cache().key(str(script), page.paramDict(),\
+            ngspice_con.BACKEND, ngspice_con.OUTPUT_FORMAT)
+    scheduler.cache().put(key, np.ones((2, 2)))
+
+    scheduler.run([page])
+    assert np.array_equal(page.results[-1], np.ones((2, 2)))
+    assert page.statuses == ['']
+    assert scheduler.queued() == []
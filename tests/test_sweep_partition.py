@@ -0,0 +1,119 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import sweep_partition
+from run_diagnostics import RunDiagnostics
+from spice_script import SpiceScript
+
+
+def script(tmp_path, control):
+    file_name = tmp_path / 'test.spice'
+    file_name.write_text('* test\n.include model.txt\nV1 a 0 1\nR1 a 0 1k\n'\
+            '.control\n' + '\n'.join(control) + '\n.endc\n.end\n')
+    return str(file_name)
+
+
+def chunkPoints(line):
+    """Returns the points ngspice steps through for a rewritten sweep line."""
+    fields = line.split()
+    if fields[0] == 'dc':
+        return sweep_partition.sweepPoints('dc', None,\
+                *[sweep_partition.spiceNumber(text) for text in fields[2:5]])
+    number, start, stop = [sweep_partition.spiceNumber(text) for text in fields[2:5]]
+    return sweep_partition.sweepPoints(fields[0], fields[1], start, stop, int(number))
+
+
+@pytest.mark.parametrize('command, points', [\
+        ('dc V1 0 15 0.1', 151),\
+        ('dc V1 1 0 -0.01', 101),\
+        ('ac dec 10 1 1e9', 91),\
+        ('ac lin 100 1k 100k', 100),\
+        ])
+def test_chunks_step_through_the_points_of_the_sweep(tmp_path, command, points):
+    file_name = script(tmp_path, [command, 'wrdata test.txt v(a)'])
+    sweep = sweep_partition.partition(file_name)
+    assert sweep.points() == points
+
+    whole = chunkPoints(command)
+    count = 4
+    lines = SpiceScript(file_name).lines()
+    n = lines.index(command)
+    chunks = [chunkPoints(sweep.rewrite(lines, index, count)[n]) for index in range(count)]
+    assert np.array_equal(np.concatenate(chunks), whole)
+
+
+def test_chunks_are_limited_by_the_points():
+    sweep = sweep_partition.SweepPartition('dc', [0], ['', 'V1', 0.0, 1.0, '1'],\
+            np.arange(20.0))
+    assert sweep.chunks(16) == 20 // sweep_partition.MIN_CHUNK_POINTS
+    assert sweep.chunks(1) == 1
+
+
+def test_while_loop_rounds_up_its_limit(tmp_path):
+    file_name = script(tmp_path, ['let n = 10/3', 'let i = 0', 'while i lt n',\
+            'op', 'let i = i + 1', 'end'])
+    sweep = sweep_partition.partition(file_name)
+    assert sweep.kind() == 'loop'
+    lines = sweep.rewrite(SpiceScript(file_name).lines(), 1, 2)
+    assert 'let i = floor((ceil(n)*1+0.5)/2)' in lines
+    assert 'while i lt floor((ceil(n)*2+0.5)/2)' in lines
+
+
+@pytest.mark.parametrize('control', [\
+        ['op', 'dc V1 0 1 0.01'],\
+        ['tran 1n 1u'],\
+        ['dc V1 0 {vmax} 0.01'],\
+        ['dc V1 1 1 0.5'],\
+        ])
+def test_sweeps_that_cannot_be_split(tmp_path, control):
+    assert sweep_partition.partition(script(tmp_path, control)) is None
+
+
+def test_stitch_rejects_a_short_chunk():
+    sweep = sweep_partition.SweepPartition('dc', [0], ['', 'V1', 0.0, 1.0, '1'],\
+            np.arange(10.0))
+    data = np.arange(10.0)[:, None]
+    assert np.array_equal(sweep.stitch([data[:5], data[5:]], 2), data)
+    with pytest.raises(ValueError):
+        sweep.stitch([data[:5], data[5:9]], 2)
+
+
+def test_submit_chunks_runs_unsplit_when_the_chunks_do_not_add_up(tmp_path):
+    file_name = script(tmp_path, ['dc V1 0 15 0.1', 'wrdata test.txt v(a)'])
+    sweep = sweep_partition.partition(file_name)
+    runs = []
+
+    def simulate(script_name, chunk):
+        runs.append(chunk)
+        if chunk is None:
+            return np.zeros((151, 2)), RunDiagnostics(['whole'])
+        return np.zeros((10, 2)), RunDiagnostics(['chunk'])
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        future = sweep_partition.submitChunks(executor.submit, simulate, sweep, 4, file_name)
+        data, diagnostics = future.result(timeout=10)
+    assert data.shape == (151, 2)
+    assert runs[-1] is None
+    assert diagnostics.output()[-1] == 'whole'
+    assert any('unsplit' in line for line in diagnostics.output())
@@ -0,0 +1,66 @@
+# Copyright (C) 2025 ペE(neurois3)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from warm_start import captureCommands, nodesetLines, converged, operatingPoint,\
+        CAPTURE_MARKER, CAPTURE_END_MARKER, NODES_PER_LINE
+
+
+def captured(lines):
+    """Returns the output of a run printing the operating point `lines`."""
+    return ['Circuit: test', CAPTURE_MARKER] + lines + [CAPTURE_END_MARKER, 'Done']
+
+
+def test_capture_is_marked_and_removed():
+    commands = captureCommands()
+    assert commands[0] == f'echo {CAPTURE_MARKER}'
+    assert 'op' in commands
+    assert commands[-2:] == [f'echo {CAPTURE_END_MARKER}', 'destroy all']
+
+
+def test_operating_point_of_the_nodes():
+    lines = captured(['v(in) = 1.000000e+00', 'out = -2.5e-01',\
+            'v1#branch = -1.0e-03', 'q1#base = 0.7', '0 = 0'])
+    assert operatingPoint(lines) == {'in': 1.0, 'out': -0.25}
+
+
+def test_operating_point_ignores_the_echoed_commands():
+    lines = ['echo ' + CAPTURE_MARKER] + captured(['v(a) = 1.0'])
+    assert operatingPoint(lines) == {'a': 1.0}
+    assert operatingPoint(['v(a) = 1.0']) is None
+
+
+def test_failed_operating_point():
+    assert operatingPoint(captured(['Warning: singular matrix: check node a'])) is None
+    assert operatingPoint(captured([])) is None
+
+
+def test_convergence_outside_of_the_capture():
+    assert converged(captured(['v(a) = 1.0']))
+    assert not converged(captured(['v(a) = 1.0']) + ['doAnalyses: iteration limit reached'])
+    # A failure of the captured operating point is not one of the run
+    assert converged(captured(['Warning: no convergence in op']))
+
+
+def test_nodeset_card():
+    nodeset = {f'n{i}': float(i) for i in range(NODES_PER_LINE + 1)}
+    lines = nodesetLines(nodeset)
+    assert len(lines) == 2
+    assert lines[0].startswith('.nodeset v(n0)=0.000000E+00 ')
+    assert lines[1] == f'+ v(n{NODES_PER_LINE})={NODES_PER_LINE:.6E}'